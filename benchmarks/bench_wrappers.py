@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+包装器对象基准：__dict__ + 立即解析 JSON vs __slots__ + 延迟解析 JSON
+
+按数据库行构建 AsyncAgent / AsyncApiKey 包装器，比较：
+- 每个对象的内存占用（tracemalloc）：仅构建，以及访问 JSON 字段之后
+- 构建 N 个对象的耗时
+- 构建后只读取 name（不访问 config/permissions）与读取全部字段的耗时
+
+用法:
+    python benchmarks/bench_wrappers.py
+    python benchmarks/bench_wrappers.py --count 100 --rounds 2000
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from src.database.connection import AsyncAgent, AsyncApiKey  # noqa: E402
+
+
+class EagerAgent:
+    """改造前的 AsyncAgent 构建方式"""
+
+    def __init__(self, row):
+        self.id = row.id
+        self.tenant_id = row.tenant_id
+        self.name = row.name
+        self.description = row.description
+        self.template_id = row.template_id
+        self.config = json.loads(row.config) if row.config else None
+        self.status = row.status
+        self.created_at = row.created_at
+        self.updated_at = row.updated_at
+        self._agent = row
+
+
+class EagerApiKey:
+    """改造前的 AsyncApiKey 构建方式"""
+
+    def __init__(self, row):
+        self.id = row.id
+        self.tenant_id = row.tenant_id
+        self.agent_id = row.agent_id
+        self.name = row.name
+        self.description = row.description
+        self.api_key = row.api_key
+        self.permissions = json.loads(row.permissions) if row.permissions else []
+        self.status = row.status
+        self.expires_at = row.expires_at
+        self.last_used_at = row.last_used_at
+        self.usage_count = row.usage_count
+        self.created_at = row.created_at
+        self.updated_at = row.updated_at
+        self.tenant_status = getattr(row, "tenant_status", None)
+        self.agent_status = getattr(row, "agent_status", None)
+        self._api_key = row
+
+
+def agent_rows(count):
+    now = datetime.utcnow()
+    config = json.dumps({
+        "persona": {"name": "麦麦", "style": "friendly", "traits": ["curious", "helpful"] * 8},
+        "model": {"provider": "openai", "temperature": 0.7, "max_tokens": 2048},
+        "plugins": [{"name": f"plugin_{i}", "enabled": i % 2 == 0} for i in range(20)],
+    })
+    return [
+        SimpleNamespace(
+            id=f"agent_{i:012d}", tenant_id="tenant_000000000001", name=f"agent {i}",
+            description="benchmark agent", template_id=None, config=config, status="active",
+            created_at=now, updated_at=now,
+        )
+        for i in range(count)
+    ]
+
+
+def api_key_rows(count):
+    now = datetime.utcnow()
+    permissions = json.dumps(["chat:send", "chat:read", "config:read", "config:write", "plugin:*"])
+    return [
+        SimpleNamespace(
+            id=f"key_{i:012d}", tenant_id="tenant_000000000001", agent_id="agent_000000000001",
+            name=f"key {i}", description=None, api_key=f"mmc_{i:040d}", permissions=permissions,
+            status="active", expires_at=None, last_used_at=None, usage_count=0,
+            created_at=now, updated_at=now, tenant_status="active", agent_status="active",
+        )
+        for i in range(count)
+    ]
+
+
+def memory_per_object(cls, rows, json_field):
+    """平均每个对象的内存（不含数据库行本身），返回 (仅构建, 访问 JSON 字段之后)"""
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    objects = [cls(row) for row in rows]
+    built = tracemalloc.take_snapshot()
+    for obj in objects:
+        getattr(obj, json_field)
+    decoded = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    return tuple(
+        sum(stat.size_diff for stat in snapshot.compare_to(before, "filename")) / len(objects)
+        for snapshot in (built, decoded)
+    )
+
+
+def timed(fn, rounds):
+    samples = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1e6)
+    return statistics.mean(samples)
+
+
+def compare(label, eager_cls, lazy_cls, rows, json_field, rounds):
+    print(f"\n{label}（{len(rows)} 个对象）")
+    print(f"{'':<10} {'bytes/obj':>10} {'+json':>10} {'build_us':>10} {'name_us':>10} {'json_us':>10}")
+    for name, cls in (("eager", eager_cls), ("slotted", lazy_cls)):
+        memory, decoded_memory = memory_per_object(cls, rows, json_field)
+        build = timed(lambda: [cls(row) for row in rows], rounds)
+        names = timed(lambda: [cls(row).name for row in rows], rounds)
+        full = timed(lambda: [getattr(cls(row), json_field) for row in rows], rounds)
+        print(f"{name:<10} {memory:>10.0f} {decoded_memory:>10.0f} {build:>10.1f} {names:>10.1f} {full:>10.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--count", type=int, default=100)
+    parser.add_argument("--rounds", type=int, default=1000)
+    args = parser.parse_args()
+
+    compare("AsyncAgent", EagerAgent, AsyncAgent, agent_rows(args.count), "config", args.rounds)
+    compare("AsyncApiKey", EagerApiKey, AsyncApiKey, api_key_rows(args.count), "permissions", args.rounds)
+
+
+if __name__ == "__main__":
+    main()
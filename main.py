@@ -24,8 +24,23 @@ from src.api.routes import (
     usage_router,
     system_router,
 )
-from src.database.connection import init_database, close_database
+from src.database.connection import (
+    init_database, close_database, install_database_pool, point_loaders, start_native_reads
+)
+from src.database.executor import db_executor
+from src.database.key_digest import key_digest_backfill
+from src.database.native import native_reads
+from src.database.pagination import record_counts
+from src.database.pool import db_pool
+from src.database.single_flight import read_flights
 from src.database.models import create_tables
+from src.utils.auth_snapshot import auth_snapshot
+from src.common.config import settings
+from src.utils.expiry_scheduler import expiry_scheduler
+from src.utils.key_filter import api_key_filter
+from src.utils.shared_auth_cache import shared_auth_table
+from src.utils.signed_keys import signed_key_registry
+from src.utils.usage_buffer import usage_buffer
 from src.common.logger import get_logger
 
 logger = get_logger(__name__)
@@ -44,10 +59,42 @@ async def lifespan(app: FastAPI):
         init_database()
         logger.info("数据库连接初始化完成")
 
+        # maim_db 模型改用连接池数据库
+        install_database_pool()
+
         # 创建数据库表
         await create_tables()
         logger.info("数据库表创建完成")
 
+        # 热点读取使用原生 aiomysql 连接池
+        if await start_native_reads():
+            logger.info("原生数据库读取连接池已启用")
+
+        # 打开跨 worker 共享认证缓存
+        if shared_auth_table.open():
+            logger.info(f"共享认证缓存已打开: {shared_auth_table.path}")
+
+        # 加载认证快照，并启动追赶变更与定期写入任务
+        if settings.auth_snapshot_enabled:
+            if auth_snapshot.load():
+                logger.info(f"已加载认证快照: {auth_snapshot.stats()['records']} 条记录")
+            auth_snapshot.start()
+
+        # 启动API密钥使用统计写回任务
+        usage_buffer.start()
+
+        # 启动API密钥布隆过滤器同步任务
+        api_key_filter.start()
+
+        # 启动签名密钥本地校验状态同步任务
+        signed_key_registry.start()
+
+        # 启动API密钥过期调度任务
+        expiry_scheduler.start()
+
+        # 启动API密钥摘要回填任务（其他写入方插入的密钥）
+        key_digest_backfill.start()
+
         logger.info("MaiMBot API Server 启动完成")
     except Exception as e:
         logger.error(f"服务启动失败: {e}")
@@ -57,6 +104,24 @@ async def lifespan(app: FastAPI):
 
     # 关闭时执行
     logger.info("MaiMBot API Server 正在关闭...")
+    await api_key_filter.stop()
+    await signed_key_registry.stop()
+    await expiry_scheduler.stop()
+    await key_digest_backfill.stop()
+    await auth_snapshot.stop()
+    shared_auth_table.close()
+
+    try:
+        # 写回剩余的使用统计
+        await usage_buffer.stop()
+    except Exception as e:
+        logger.error(f"写回使用统计失败: {e}")
+
+    # 等待进行中的数据库调用完成
+    db_executor.shutdown()
+    await native_reads.stop()
+    db_pool.close()
+
     try:
         # 关闭数据库连接
         close_database()
@@ -133,6 +198,12 @@ def create_app() -> FastAPI:
                 "timestamp": time.time(),
                 "version": "1.0.0",
                 "services": {"database": "healthy", "api": "healthy"},
+                "database_executor": db_executor.stats(),
+                "native_reads": native_reads.stats(),
+                "database_pool": db_pool.stats(),
+                "record_counts": record_counts.stats(),
+                "single_flight": read_flights.stats(),
+                "dataloader": {name: loader.stats() for name, loader in point_loaders.items()},
             }
         except Exception as e:
             logger.error(f"健康检查失败: {e}")
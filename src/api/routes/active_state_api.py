@@ -8,7 +8,7 @@ import time
 import uuid
 from typing import List, Optional
 
-from fastapi import APIRouter, Query
+from fastapi import APIRouter, Depends, Query
 from pydantic import BaseModel, Field
 
 # 注入 maim_db 路径
@@ -20,13 +20,7 @@ sys.path.insert(
 )
 
 try:
-    from maim_db.core import (
-        AsyncAgentActiveState,
-        AsyncAgent,
-        AsyncTenant,
-        AgentStatus,
-        TenantStatus,
-    )
+    from maim_db.core import AsyncAgentActiveState
 
     MAIM_DB_AVAILABLE = True
 except ImportError:
@@ -35,20 +29,11 @@ except ImportError:
     class AsyncAgentActiveState:  # type: ignore
         pass
 
-    class AsyncAgent:  # type: ignore
-        pass
-
-    class AsyncTenant:  # type: ignore
-        pass
-
-    class AgentStatus:  # type: ignore
-        pass
-
-    class TenantStatus:  # type: ignore
-        pass
-
 
 from src.common.logger import get_logger
+from src.database.connection import list_active_agent_states
+from src.database.models import AgentStatus, TenantStatus
+from src.database.unit_of_work import UnitOfWork, get_unit_of_work
 from src.utils.response import create_error_response, create_success_response
 
 router = APIRouter()
@@ -73,20 +58,22 @@ class ActiveStateResponse(BaseModel):
     ttl_seconds: int
 
 
-async def _ensure_tenant_and_agent(tenant_id: str, agent_id: str) -> Optional[str]:
+async def _ensure_tenant_and_agent(
+    uow: UnitOfWork, tenant_id: str, agent_id: str
+) -> Optional[str]:
     """校验租户与Agent是否存在且匹配，返回错误消息字符串或None"""
     if not MAIM_DB_AVAILABLE:
         return "maim_db 未正确安装"
 
     try:
-        tenant = await AsyncTenant.get(tenant_id)
+        # 租户与Agent一次联表查询
+        tenant, agent = await uow.tenant_and_agent(tenant_id, agent_id)
         if (
             not tenant
             or getattr(tenant, "status", TenantStatus.ACTIVE) != TenantStatus.ACTIVE
         ):
             return "租户不存在或未激活"
 
-        agent = await AsyncAgent.get(agent_id)
         if not agent:
             return "Agent不存在"
         if agent.tenant_id != tenant_id:
@@ -110,7 +97,10 @@ def _to_response(record: AsyncAgentActiveState) -> ActiveStateResponse:
 
 
 @router.put("/agent-activity", summary="更新租户-Agent 的活跃TTL")
-async def upsert_agent_activity(request: ActiveStateUpdateRequest):
+async def upsert_agent_activity(
+    request: ActiveStateUpdateRequest,
+    uow: UnitOfWork = Depends(get_unit_of_work),
+):
     start_time = time.time()
     request_id = str(uuid.uuid4())
 
@@ -122,7 +112,9 @@ async def upsert_agent_activity(request: ActiveStateUpdateRequest):
             request_id=request_id,
         )
 
-    error_msg = await _ensure_tenant_and_agent(request.tenant_id, request.agent_id)
+    error_msg = await _ensure_tenant_and_agent(
+        uow, request.tenant_id, request.agent_id
+    )
     if error_msg:
         return create_error_response(
             message=error_msg,
@@ -170,9 +162,7 @@ async def list_agent_activity(
         )
 
     try:
-        records = await AsyncAgentActiveState.list_active()
-        if tenant_id:
-            records = [r for r in records if r.tenant_id == tenant_id]
+        records = await list_active_agent_states(tenant_id)
 
         payload: List[ActiveStateResponse] = [
             _to_response(record) for record in records
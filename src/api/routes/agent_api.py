@@ -2,9 +2,10 @@
 Agent管理API路由 - 使用maim_db的AgentConfig系统
 """
 
+import asyncio
 import time
 import uuid
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 from fastapi import APIRouter, Query
 from pydantic import BaseModel
 
@@ -30,7 +31,7 @@ try:
     from maim_db.core.models import AGENT_CONFIG_MODELS
     
     # Import Async wrappers from local models
-    from src.database.models import Tenant, Agent as AsyncAgent, AgentStatus
+    from src.database.models import Tenant, Agent as AsyncAgent, AgentStatus, ApiKey
 
     MAIM_DB_AVAILABLE = True
 except ImportError:
@@ -46,11 +47,25 @@ except ImportError:
     class AgentStatus:
         pass
 
+    class ApiKey:
+        pass
+
     class AgentConfigManager:
         pass
 
 
-from src.utils.response import create_success_response, create_error_response
+from src.utils.auth_cache import invalidate_auth_keys, invalidate_owner_keys
+from src.database.connection import forget_agent_configs, load_agent_configs
+from src.database.constraints import DuplicateRecordError
+from src.database.pagination import InvalidCursor
+from src.database.row_version import ConcurrentUpdateError
+from src.utils.response import (
+    BulkItemResult,
+    create_bulk_response,
+    create_success_response,
+    create_error_response,
+)
+from src.common.config import settings
 from src.common.logger import get_logger
 from src.api.routes.system_api import load_system_models_from_toml, SYSTEM_DEFAULT_PROVIDERS
 
@@ -106,6 +121,12 @@ class AgentCreateRequest(BaseModel):
     tags: Optional[list] = None
 
 
+class AgentBulkCreateRequest(BaseModel):
+    """批量创建Agent请求模型"""
+
+    items: List[AgentCreateRequest]
+
+
 class AgentUpdateRequest(BaseModel):
     """更新Agent请求模型"""
 
@@ -114,6 +135,8 @@ class AgentUpdateRequest(BaseModel):
     config: Optional[Dict[str, Any]] = None
     status: Optional[AgentStatus] = None
     tags: Optional[list] = None
+    # 读取时的版本号，提供时仅在记录未被其他请求修改的情况下更新
+    version: Optional[int] = None
 
 
 class AgentResponse(BaseModel):
@@ -129,6 +152,7 @@ class AgentResponse(BaseModel):
     created_at: str
     updated_at: str
     tags: Optional[list] = None
+    version: int = 0
 
 
 class AgentListRequest(BaseModel):
@@ -146,12 +170,11 @@ async def generate_agent_id() -> str:
 
 
 def agent_to_response(
-    agent: AsyncAgent, config_manager: AgentConfigManager = None
+    agent: AsyncAgent, config_manager: AgentConfigManager = None, config: Optional[dict] = None
 ) -> AgentResponse:
-    """将Agent模型转换为响应模型"""
+    """将Agent模型转换为响应模型；config 为已读取的配置，未提供时从 config_manager 读取"""
     # 获取配置
-    config = None
-    if config_manager:
+    if config is None and config_manager:
         try:
             config = config_manager.get_all_configs(mask_secrets=True)
         except Exception as e:
@@ -169,6 +192,7 @@ def agent_to_response(
         created_at=agent.created_at.isoformat() if agent.created_at else "",
         updated_at=agent.updated_at.isoformat() if agent.updated_at else "",
         tags=None,  # TODO: 从config中获取tags
+        version=agent.row_version,
     )
 
 
@@ -191,8 +215,16 @@ async def create_agent(request: AgentCreateRequest):
     request_id = str(uuid.uuid4())
 
     try:
+        # 租户校验与名称查重相互独立，并发执行
+        tenant_exists, name_taken = await asyncio.gather(
+            check_tenant_exists(request.tenant_id),
+            AsyncAgent.name_exists(request.tenant_id, request.name)
+            if MAIM_DB_AVAILABLE
+            else asyncio.sleep(0, result=False),
+        )
+
         # 验证租户是否存在
-        if not await check_tenant_exists(request.tenant_id):
+        if not tenant_exists:
             return create_error_response(
                 message="租户不存在",
                 error="指定的租户ID无效",
@@ -201,16 +233,13 @@ async def create_agent(request: AgentCreateRequest):
             )
 
         # 检查Agent名称是否已存在（在同一租户下）
-        if MAIM_DB_AVAILABLE:
-            existing_agents = await AsyncAgent.get_by_tenant(request.tenant_id)
-            for existing_agent in existing_agents:
-                if existing_agent.name == request.name:
-                    return create_error_response(
-                        message="Agent名称在该租户下已存在",
-                        error="Agent名称重复",
-                        error_code="AGENT_002",
-                        request_id=request_id,
-                    )
+        if name_taken:
+            return create_error_response(
+                message="Agent名称在该租户下已存在",
+                error="Agent名称重复",
+                error_code="AGENT_002",
+                request_id=request_id,
+            )
 
         # 验证配置安全性
         if request.config:
@@ -263,6 +292,15 @@ async def create_agent(request: AgentCreateRequest):
             execution_time=time.time() - start_time,
         )
 
+    except DuplicateRecordError:
+        # 并发创建同名Agent，由唯一索引拦截
+        return create_error_response(
+            message="Agent名称在该租户下已存在",
+            error="Agent名称重复",
+            error_code="AGENT_002",
+            request_id=request_id,
+            execution_time=time.time() - start_time,
+        )
     except Exception as e:
         logger.error(f"创建Agent失败: {str(e)}")
         return create_error_response(
@@ -274,6 +312,116 @@ async def create_agent(request: AgentCreateRequest):
         )
 
 
+@router.post("/agents:bulk", summary="批量创建Agent")
+async def bulk_create_agents(request: AgentBulkCreateRequest):
+    """批量创建Agent，按请求顺序返回逐项结果；未通过校验的项不影响其他项"""
+    start_time = time.time()
+    request_id = str(uuid.uuid4())
+
+    if not request.items or len(request.items) > settings.bulk_create_max_items:
+        return create_error_response(
+            message="批量创建数量超限",
+            error=f"每次需提交 1-{settings.bulk_create_max_items} 项",
+            error_code="AGENT_014",
+            request_id=request_id,
+            execution_time=time.time() - start_time,
+        )
+
+    try:
+        # 租户存在性与名称占用各用一次查询校验整批
+        tenants, taken = await asyncio.gather(
+            Tenant.get_many([item.tenant_id for item in request.items]),
+            AsyncAgent.names_taken([(item.tenant_id, item.name) for item in request.items]),
+        )
+
+        results = {}
+        records = []
+        seen = set()
+        for index, item in enumerate(request.items):
+            error = None
+            # 名称按数据库排序规则比较（MySQL 上不区分大小写），与唯一索引一致
+            name_key = AsyncAgent.name_key(item.tenant_id, item.name)
+            if item.tenant_id not in tenants:
+                error = ("AGENT_001", "指定的租户ID无效")
+            elif name_key in taken or name_key in seen:
+                error = ("AGENT_002", "Agent名称重复")
+            elif item.config:
+                try:
+                    validate_model_config_security(item.config)
+                except ValueError as e:
+                    error = ("AGENT_011", str(e))
+            if error:
+                results[index] = BulkItemResult(
+                    index=index, success=False, error=error[1], error_code=error[0]
+                )
+                continue
+            seen.add(name_key)
+            records.append((index, item, {
+                "id": await generate_agent_id(),
+                "tenant_id": item.tenant_id,
+                "name": item.name,
+                "description": item.description,
+                "template_id": item.template_id,
+                "config": item.config or {},
+                "status": AgentStatus.ACTIVE.value,
+            }))
+
+        # 通过校验的项在一个事务中批量插入，活跃状态（TTL 12 小时）与配置在同一事务中写入
+        agents, failures = await AsyncAgent.bulk_create_with_setup(
+            [record for _, _, record in records],
+            active_ttl_seconds=12 * 3600,
+            configs={record["id"]: item.config for _, item, record in records if item.config},
+        ) if records else ([], {})
+
+        # 结果不含完整配置（避免逐个读取配置），需要时通过 GET /agents/{id}/config 获取
+        for (index, _, _), agent in zip(records, agents):
+            failure = failures.get(agent.id)
+            if not failure:
+                results[index] = BulkItemResult(index=index, success=True, data=agent_to_response(agent))
+                continue
+            # Agent已创建，仅配置或活跃状态未写入，可通过 PUT /agents/{id}/config、PUT /agent-activity 重试
+            errors = []
+            if "config" in failure:
+                logger.error(f"保存Agent配置失败: {failure['config']}")
+                errors.append(f"配置保存失败: {failure['config']}")
+            if "active_state" in failure:
+                logger.warning(f"标记Agent活跃失败: {failure['active_state']}")
+                errors.append(f"标记活跃失败: {failure['active_state']}")
+            results[index] = BulkItemResult(
+                index=index, success=True, data=agent_to_response(agent),
+                error="Agent已创建，但" + "；".join(errors),
+                error_code="AGENT_015" if "config" in failure else "AGENT_016",
+            )
+
+        logger.info(f"批量创建Agent: 成功 {len(records)}，失败 {len(request.items) - len(records)}")
+
+        return create_bulk_response(
+            message="批量创建Agent完成",
+            results=[results[index] for index in range(len(request.items))],
+            request_id=request_id,
+            execution_time=time.time() - start_time,
+        )
+
+    except DuplicateRecordError:
+        # 校验后有并发请求创建了同名Agent，整批回滚
+        return create_error_response(
+            message="Agent名称在该租户下已存在",
+            error="批量创建期间出现同名Agent，本批未创建",
+            error_code="AGENT_002",
+            request_id=request_id,
+            execution_time=time.time() - start_time,
+        )
+    except Exception as e:
+        logger.error(f"批量创建Agent失败: {str(e)}")
+        return create_error_response(
+            message="批量创建Agent失败",
+            error=str(e),
+            error_code="AGENT_003",
+            request_id=request_id,
+            execution_time=time.time() - start_time,
+        )
+
+
 @router.get("/agents/{agent_id}", summary="获取Agent详情")
 async def get_agent(agent_id: str):
     """获取指定Agent的详细信息"""
@@ -290,11 +438,15 @@ async def get_agent(agent_id: str):
                 request_id=request_id,
             )
 
-        # 获取配置管理器和完整配置
-        config_manager = AgentConfigManager(agent_id)
+        # 获取完整配置（并发的相同读取合并为一次）
+        try:
+            config = await load_agent_configs(agent_id)
+        except Exception as e:
+            logger.error(f"获取Agent配置失败: {e}")
+            config = None
 
         return create_success_response(
-            data=agent_to_response(agent, config_manager),
+            data=agent_to_response(agent, config=config),
             message="获取Agent成功",
             request_id=request_id,
             execution_time=time.time() - start_time,
@@ -314,11 +466,13 @@ async def get_agent(agent_id: str):
 @router.get("/agents", summary="获取Agent列表")
 async def list_agents(
     tenant_id: str,
-    page: int = Query(1, ge=1, description="页码"),
+    page: int = Query(1, ge=1, description="页码（传入 after 时忽略）"),
     size: int = Query(20, ge=1, le=100, description="每页数量"),
     status: Optional[AgentStatus] = Query(None, description="Agent状态筛选"),
+    after: Optional[str] = Query(None, description="上一页返回的 next_cursor"),
+    include_total: bool = Query(True, description="是否返回总数"),
 ):
-    """获取Agent列表"""
+    """获取Agent列表（按创建时间倒序）"""
     start_time = time.time()
     request_id = str(uuid.uuid4())
 
@@ -332,22 +486,18 @@ async def list_agents(
                 request_id=request_id,
             )
 
-        offset = (page - 1) * size
-        agents = await AsyncAgent.get_by_tenant(tenant_id)
-
-        # 状态筛选
-        if status:
-            filtered_agents = []
-            for agent in agents:
-                if agent.status == status.value:
-                    filtered_agents.append(agent)
-            agents = filtered_agents
-
-        # 分页处理
-        total = len(agents)
-        start_idx = min(offset, total)
-        end_idx = min(offset + size, total)
-        paginated_agents = agents[start_idx:end_idx]
+        # 状态筛选、排序与分页在数据库中完成
+        status_val = status.value if status else None
+        next_cursor = None
+        if after or page == 1:
+            paginated_agents, next_cursor = await AsyncAgent.list_page(
+                tenant_id, status=status_val, limit=size, after=after
+            )
+        else:
+            paginated_agents = await AsyncAgent.list(
+                tenant_id, status=status_val, page=page, page_size=size
+            )
+        total = await AsyncAgent.count(tenant_id, status_val) if include_total else None
 
         agent_list = []
         config_manager = None
@@ -360,15 +510,24 @@ async def list_agents(
             data={
                 "items": agent_list,
                 "total": total,
-                "page": page,
+                "page": None if after else page,
                 "size": size,
-                "pages": (total + size - 1) // size,
+                "pages": (total + size - 1) // size if total is not None else None,
+                "next_cursor": next_cursor,
             },
             message="获取Agent列表成功",
             request_id=request_id,
             execution_time=time.time() - start_time,
         )
 
+    except InvalidCursor as e:
+        return create_error_response(
+            message="分页游标无效",
+            error=str(e),
+            error_code="AGENT_013",
+            request_id=request_id,
+            execution_time=time.time() - start_time,
+        )
     except Exception as e:
         logger.error(f"获取Agent列表失败: {str(e)}")
         return create_error_response(
@@ -396,6 +555,16 @@ async def update_agent(agent_id: str, request: AgentUpdateRequest):
                 request_id=request_id,
             )
 
+        # 如果更新Agent名称，检查名称是否重复
+        if request.name and request.name != agent.name:
+            if await AsyncAgent.name_exists(agent.tenant_id, request.name, exclude_id=agent_id):
+                return create_error_response(
+                    message="Agent名称在该租户下已存在",
+                    error="Agent名称重复",
+                    error_code="AGENT_002",
+                    request_id=request_id,
+                )
+
         # 准备更新数据
         update_data = {}
         if request.name is not None:
@@ -419,7 +588,11 @@ async def update_agent(agent_id: str, request: AgentUpdateRequest):
             update_data["config"] = request.config
 
         # 执行更新
-        await agent.update(**update_data)
+        await agent.update(expected_version=request.version, **update_data)
+
+        # Agent状态冗余在认证记录中，状态变更后失效其下密钥
+        if request.status is not None:
+            await invalidate_owner_keys(agent_id=agent_id)
 
         # 更新配置
         if request.config is not None:
@@ -429,6 +602,7 @@ async def update_agent(agent_id: str, request: AgentUpdateRequest):
             except Exception as e:
                 logger.error(f"更新Agent配置失败: {e}")
                 # 配置更新失败不影响基本信息更新
+            forget_agent_configs(agent_id)
 
         logger.info(f"更新Agent成功: {agent_id}")
 
@@ -442,6 +616,22 @@ async def update_agent(agent_id: str, request: AgentUpdateRequest):
             execution_time=time.time() - start_time,
         )
 
+    except DuplicateRecordError:
+        return create_error_response(
+            message="Agent名称在该租户下已存在",
+            error="Agent名称重复",
+            error_code="AGENT_002",
+            request_id=request_id,
+            execution_time=time.time() - start_time,
+        )
+    except ConcurrentUpdateError as e:
+        return create_error_response(
+            message="Agent已被其他请求修改，请重新获取后再更新",
+            error=str(e),
+            error_code="AGENT_012",
+            request_id=request_id,
+            execution_time=time.time() - start_time,
+        )
     except Exception as e:
         logger.error(f"更新Agent失败: {str(e)}")
         return create_error_response(
@@ -476,9 +666,12 @@ async def delete_agent(agent_id: str):
         except Exception as e:
             logger.error(f"删除Agent配置失败: {e}")
             # 配置删除失败不影响Agent删除
+        forget_agent_configs(agent_id)
 
-        # 删除Agent
+        # 删除Agent（删除前记录其下密钥，删除后失效它们的认证状态）
+        api_key_ids = await ApiKey.list_ids_by_owner(agent_id=agent_id)
         await agent.delete()
+        invalidate_auth_keys(api_key_ids)
 
         logger.info(f"删除Agent成功: {agent_id}")
 
@@ -517,9 +710,8 @@ async def get_agent_config(agent_id: str):
                 request_id=request_id,
             )
 
-        # 获取完整配置
-        config_manager = AgentConfigManager(agent_id)
-        config = config_manager.get_all_configs(mask_secrets=True)
+        # 获取完整配置（并发的相同读取合并为一次）
+        config = await load_agent_configs(agent_id)
 
         return create_success_response(
             data=config,
@@ -570,6 +762,7 @@ async def update_agent_config(agent_id: str, config_data: Dict[str, Any]):
         # 更新配置
         config_manager = AgentConfigManager(agent_id)
         config_manager.update_config_from_json(config_data)
+        forget_agent_configs(agent_id)
 
         logger.info(f"更新Agent配置成功: {agent_id}")
 
@@ -2,6 +2,7 @@
 API密钥管理API路由
 """
 
+import asyncio
 import time
 import uuid
 import base64
@@ -11,8 +12,20 @@ from fastapi import APIRouter, Query, Depends
 from pydantic import BaseModel
 
 # Remove SQLAlchemy dependencies and get_db
-from src.database.models import ApiKey, Agent, Tenant, ApiKeyStatus
+from src.database.constraints import DuplicateRecordError
+from src.database.models import Agent, ApiKey, ApiKeyStatus, Tenant
+from src.database.pagination import InvalidCursor
+from src.database.row_version import ConcurrentUpdateError
+from src.database.unit_of_work import UnitOfWork, get_unit_of_work
+from src.utils.auth_cache import agent_status_available, api_key_cache, tenant_status_available
+from src.utils.auth_snapshot import auth_snapshot
+from src.utils.expiry_scheduler import expiry_scheduler
+from src.utils.key_filter import api_key_filter
+from src.utils.signed_keys import SIGNED_KEY_VERSION, generate_signed_api_key, issue_format_version, signed_key_registry
+from src.common.config import settings
 from src.utils.response import (
+    BulkItemResult,
+    create_bulk_response,
     create_success_response,
     create_error_response,
     calculate_pagination
@@ -33,16 +46,33 @@ class ApiKeyCreateRequest(BaseModel):
     expires_at: Optional[datetime] = None
 
 
+class ApiKeyBulkCreateRequest(BaseModel):
+    """批量创建API密钥请求模型"""
+    items: List[ApiKeyCreateRequest]
+
+
 class ApiKeyUpdateRequest(BaseModel):
     """更新API密钥请求模型"""
     name: Optional[str] = None
     description: Optional[str] = None
     permissions: Optional[List[str]] = None
     expires_at: Optional[datetime] = None
+    # 读取时的版本号，提供时仅在记录未被其他请求修改的情况下更新
+    version: Optional[int] = None
 
 
-async def generate_api_key(tenant_id: str, agent_id: str, version: str = "v1") -> str:
-    """生成API密钥"""
+async def generate_api_key(
+    tenant_id: str,
+    agent_id: str,
+    version: str = "v1",
+    key_id: Optional[str] = None,
+    expires_at: Optional[datetime] = None,
+    permissions: Optional[List[str]] = None
+) -> str:
+    """生成API密钥，v2格式需要提供 key_id，并将过期时间与权限摘要写入签名"""
+    if version == SIGNED_KEY_VERSION:
+        return generate_signed_api_key(tenant_id, agent_id, key_id, expires_at, permissions)
+
     random_hash = uuid.uuid4().hex[:16]
     key_data = f"{tenant_id}_{agent_id}_{random_hash}_{version}"
     encoded_key = base64.b64encode(key_data.encode()).decode()
@@ -54,17 +84,73 @@ async def generate_api_key_id() -> str:
     return f"key_{uuid.uuid4().hex[:12]}"
 
 
+async def new_api_key_record(request: ApiKeyCreateRequest) -> dict:
+    """为创建请求生成密钥ID与密钥值，返回 ApiKey.create 的参数"""
+    api_key_id = await generate_api_key_id()
+    api_key_value = await generate_api_key(
+        request.tenant_id,
+        request.agent_id,
+        version=issue_format_version(),
+        key_id=api_key_id,
+        expires_at=request.expires_at,
+        permissions=request.permissions
+    )
+    return {
+        "id": api_key_id,
+        "tenant_id": request.tenant_id,
+        "agent_id": request.agent_id,
+        "name": request.name,
+        "description": request.description,
+        "api_key": api_key_value,
+        "permissions": request.permissions,
+        "status": ApiKeyStatus.ACTIVE.value,
+        "expires_at": request.expires_at
+    }
+
+
+def register_created_key(api_key, tenant, agent) -> None:
+    """新密钥加入布隆过滤器、签名密钥登记与过期调度"""
+    api_key_filter.add(api_key.api_key)
+    signed_key_registry.observe(
+        api_key.api_key, api_key.id, api_key.status, api_key.expires_at, api_key.permissions,
+        owners_available=tenant_status_available(tenant.status) and agent_status_available(agent.status)
+    )
+    expiry_scheduler.schedule(api_key.id, api_key.expires_at)
+
+
+def created_key_data(api_key) -> dict:
+    """创建接口返回的密钥数据"""
+    return {
+        "api_key_id": api_key.id,
+        "tenant_id": api_key.tenant_id,
+        "agent_id": api_key.agent_id,
+        "name": api_key.name,
+        "description": api_key.description,
+        "api_key": api_key.api_key,
+        "permissions": api_key.permissions,
+        "status": api_key.status,
+        "expires_at": api_key.expires_at.isoformat() if api_key.expires_at else None,
+        "created_at": api_key.created_at.isoformat() if api_key.created_at else None
+    }
+
+
 @router.post("/api-keys", summary="创建API密钥")
 async def create_api_key(
-    request: ApiKeyCreateRequest
+    request: ApiKeyCreateRequest,
+    uow: UnitOfWork = Depends(get_unit_of_work)
 ):
     """为指定Agent创建新的API密钥"""
     start_time = time.time()
     request_id = str(uuid.uuid4())
 
     try:
+        # 租户与Agent一次联表查询，名称查重与之并发执行
+        (tenant, agent), name_taken = await asyncio.gather(
+            uow.tenant_and_agent(request.tenant_id, request.agent_id),
+            ApiKey.name_exists(request.tenant_id, request.name)
+        )
+
         # 验证租户是否存在
-        tenant = await Tenant.get(request.tenant_id)
         if not tenant:
             return create_error_response(
                 message="租户不存在",
@@ -74,7 +160,6 @@ async def create_api_key(
             )
 
         # 验证Agent是否存在且属于指定租户
-        agent = await Agent.get(request.agent_id)
         if not agent or agent.tenant_id != request.tenant_id:
             return create_error_response(
                 message="Agent不存在或不属于指定租户",
@@ -84,8 +169,7 @@ async def create_api_key(
             )
 
         # 检查API密钥名称是否在租户内重复
-        existing_key = await ApiKey.get_by_tenant_and_name(request.tenant_id, request.name)
-        if existing_key:
+        if name_taken:
             return create_error_response(
                 message="API密钥名称在租户内已存在",
                 error="API密钥名称重复",
@@ -93,42 +177,27 @@ async def create_api_key(
                 request_id=request_id
             )
 
-        # 生成API密钥
-        api_key_value = await generate_api_key(request.tenant_id, request.agent_id)
-
-        # 创建API密钥记录
-        api_key = await ApiKey.create(
-            id=await generate_api_key_id(),
-            tenant_id=request.tenant_id,
-            agent_id=request.agent_id,
-            name=request.name,
-            description=request.description,
-            api_key=api_key_value,
-            permissions=request.permissions,
-            status=ApiKeyStatus.ACTIVE.value,
-            expires_at=request.expires_at
-        )
+        # 生成并创建API密钥记录
+        api_key = await ApiKey.create(**await new_api_key_record(request))
+        register_created_key(api_key, tenant, agent)
 
         execution_time = time.time() - start_time
         return create_success_response(
             message="API密钥创建成功",
-            data={
-                "api_key_id": api_key.id,
-                "tenant_id": api_key.tenant_id,
-                "agent_id": api_key.agent_id,
-                "name": api_key.name,
-                "description": api_key.description,
-                "api_key": api_key.api_key,
-                "permissions": api_key.permissions,
-                "status": api_key.status,
-                "expires_at": api_key.expires_at.isoformat() if api_key.expires_at else None,
-                "created_at": api_key.created_at.isoformat() if api_key.created_at else None
-            },
+            data=created_key_data(api_key),
             tenant_id=api_key.tenant_id,
             execution_time=execution_time,
             request_id=request_id
         )
 
+    except DuplicateRecordError:
+        # 并发创建同名密钥，由唯一索引拦截
+        return create_error_response(
+            message="API密钥名称在租户内已存在",
+            error="API密钥名称重复",
+            error_code="KEY_002",
+            request_id=request_id
+        )
     except Exception as e:
         logger.error(f"创建API密钥失败: {e}")
         return create_error_response(
@@ -139,28 +208,119 @@ async def create_api_key(
         )
 
 
+@router.post("/api-keys:bulk", summary="批量创建API密钥")
+async def bulk_create_api_keys(
+    request: ApiKeyBulkCreateRequest
+):
+    """批量创建API密钥，按请求顺序返回逐项结果；未通过校验的项不影响其他项"""
+    start_time = time.time()
+    request_id = str(uuid.uuid4())
+
+    if not request.items or len(request.items) > settings.bulk_create_max_items:
+        return create_error_response(
+            message="批量创建数量超限",
+            error=f"每次需提交 1-{settings.bulk_create_max_items} 项",
+            error_code="KEY_008",
+            request_id=request_id
+        )
+
+    try:
+        # 租户、Agent 与名称占用各用一次查询校验整批
+        tenants, agents, taken = await asyncio.gather(
+            Tenant.get_many([item.tenant_id for item in request.items]),
+            Agent.get_many([item.agent_id for item in request.items]),
+            ApiKey.names_taken([(item.tenant_id, item.name) for item in request.items])
+        )
+
+        results = {}
+        records = []
+        seen = set()
+        for index, item in enumerate(request.items):
+            agent = agents.get(item.agent_id)
+            error = None
+            # 名称按数据库排序规则比较（MySQL 上不区分大小写），与唯一索引一致
+            name_key = ApiKey.name_key(item.tenant_id, item.name)
+            if item.tenant_id not in tenants:
+                error = ("TENANT_001", "指定的租户ID不存在")
+            elif not agent or agent.tenant_id != item.tenant_id:
+                error = ("AGENT_001", "指定的Agent ID不存在或权限不匹配")
+            elif name_key in taken or name_key in seen:
+                error = ("KEY_002", "API密钥名称重复")
+            if error:
+                results[index] = BulkItemResult(
+                    index=index, success=False, error=error[1], error_code=error[0]
+                )
+                continue
+            seen.add(name_key)
+            records.append((index, await new_api_key_record(item)))
+
+        # 通过校验的项在一个事务中批量插入
+        api_keys = await ApiKey.bulk_create([record for _, record in records]) if records else []
+        for (index, _), api_key in zip(records, api_keys):
+            register_created_key(api_key, tenants[api_key.tenant_id], agents[api_key.agent_id])
+            results[index] = BulkItemResult(index=index, success=True, data=created_key_data(api_key))
+
+        logger.info(f"批量创建API密钥: 成功 {len(records)}，失败 {len(request.items) - len(records)}")
+
+        return create_bulk_response(
+            message="批量创建API密钥完成",
+            results=[results[index] for index in range(len(request.items))],
+            execution_time=time.time() - start_time,
+            request_id=request_id
+        )
+
+    except DuplicateRecordError:
+        # 校验后有并发请求创建了同名密钥，整批回滚
+        return create_error_response(
+            message="API密钥名称在租户内已存在",
+            error="批量创建期间出现同名API密钥，本批未创建",
+            error_code="KEY_002",
+            request_id=request_id
+        )
+    except Exception as e:
+        logger.error(f"批量创建API密钥失败: {e}")
+        return create_error_response(
+            message="批量创建API密钥失败",
+            error=str(e),
+            error_code="KEY_CREATE_ERROR",
+            request_id=request_id
+        )
+
+
 @router.get("/api-keys", summary="获取API密钥列表")
 async def list_api_keys(
     tenant_id: str = Query(..., description="租户ID (必需)"),
     agent_id: Optional[str] = Query(None, description="Agent ID (可选)"),
-    page: int = Query(1, ge=1, description="页码"),
+    page: int = Query(1, ge=1, description="页码（传入 after 时忽略）"),
     page_size: int = Query(20, ge=1, le=100, description="每页数量"),
-    status: Optional[ApiKeyStatus] = Query(None, description="密钥状态过滤")
+    status: Optional[ApiKeyStatus] = Query(None, description="密钥状态过滤"),
+    after: Optional[str] = Query(None, description="上一页返回的 next_cursor"),
+    include_total: bool = Query(True, description="是否返回总数与页码信息")
 ):
-    """获取指定租户的API密钥列表"""
+    """获取指定租户的API密钥列表（按创建时间倒序）"""
     start_time = time.time()
     request_id = str(uuid.uuid4())
 
     try:
-        # Use new list method
         status_val = status.value if status else None
-        api_keys, total = await ApiKey.list(
-            tenant_id=tenant_id,
-            agent_id=agent_id,
-            status=status_val,
-            page=page,
-            page_size=page_size
-        )
+        next_cursor = None
+        # 第一页与游标翻页走 keyset 查询，指定页码时保留 OFFSET 分页
+        if after or page == 1:
+            api_keys, next_cursor = await ApiKey.list_page(
+                tenant_id=tenant_id,
+                agent_id=agent_id,
+                status=status_val,
+                limit=page_size,
+                after=after
+            )
+        else:
+            api_keys, _ = await ApiKey.list(
+                tenant_id=tenant_id,
+                agent_id=agent_id,
+                status=status_val,
+                page=page,
+                page_size=page_size
+            )
 
         # 构建响应数据
         items = []
@@ -178,23 +338,35 @@ async def list_api_keys(
                 "last_used_at": key.last_used_at.isoformat() if key.last_used_at else None,
                 "usage_count": key.usage_count,
                 "created_at": key.created_at.isoformat() if key.created_at else None,
-                "updated_at": key.updated_at.isoformat() if key.updated_at else None
+                "updated_at": key.updated_at.isoformat() if key.updated_at else None,
+                "version": key.row_version
             })
 
-        pagination = calculate_pagination(page, page_size, total)
+        pagination = None
+        if include_total and not after:
+            total = await ApiKey.count(tenant_id, agent_id, status_val)
+            pagination = calculate_pagination(page, page_size, total).model_dump()
         execution_time = time.time() - start_time
 
         return create_success_response(
             message="获取API密钥列表成功",
             data={
                 "items": items,
-                "pagination": pagination.model_dump()
+                "pagination": pagination,
+                "next_cursor": next_cursor
             },
             tenant_id=tenant_id,
             execution_time=execution_time,
             request_id=request_id
         )
 
+    except InvalidCursor as e:
+        return create_error_response(
+            message="分页游标无效",
+            error=str(e),
+            error_code="KEY_007",
+            request_id=request_id
+        )
     except Exception as e:
         logger.error(f"获取API密钥列表失败: {e}")
         return create_error_response(
@@ -240,7 +412,8 @@ async def get_api_key(
                 "last_used_at": api_key.last_used_at.isoformat() if api_key.last_used_at else None,
                 "usage_count": api_key.usage_count,
                 "created_at": api_key.created_at.isoformat() if api_key.created_at else None,
-                "updated_at": api_key.updated_at.isoformat() if api_key.updated_at else None
+                "updated_at": api_key.updated_at.isoformat() if api_key.updated_at else None,
+                "version": api_key.row_version
             },
             tenant_id=api_key.tenant_id,
             execution_time=execution_time,
@@ -279,8 +452,7 @@ async def update_api_key(
 
         # 如果更新API密钥名称，检查名称是否重复
         if request.name and request.name != api_key.name:
-            existing_key = await ApiKey.get_by_tenant_and_name(api_key.tenant_id, request.name)
-            if existing_key and existing_key.id != api_key_id:
+            if await ApiKey.name_exists(api_key.tenant_id, request.name, exclude_id=api_key_id):
                 return create_error_response(
                     message="API密钥名称在租户内已存在",
                     error="API密钥名称重复",
@@ -300,20 +472,41 @@ async def update_api_key(
             update_data['expires_at'] = request.expires_at
 
         # 执行更新
-        await api_key.update(**update_data)
+        await api_key.update(expected_version=request.version, **update_data)
+        api_key_cache.invalidate(api_key.api_key, api_key.id)
+        auth_snapshot.discard(api_key.id)
+        # 下次验证回退到数据库，连同所属租户/Agent状态重新判断
+        signed_key_registry.revoke(api_key.id)
+        if request.expires_at is not None:
+            expiry_scheduler.schedule(api_key.id, request.expires_at)
 
         execution_time = time.time() - start_time
         return create_success_response(
             message="API密钥更新成功",
             data={
                 "api_key_id": api_key.id,
-                "updated_at": api_key.updated_at.isoformat() if api_key.updated_at else None
+                "updated_at": api_key.updated_at.isoformat() if api_key.updated_at else None,
+                "version": api_key.row_version
             },
             tenant_id=api_key.tenant_id,
             execution_time=execution_time,
             request_id=request_id
         )
 
+    except DuplicateRecordError:
+        return create_error_response(
+            message="API密钥名称在租户内已存在",
+            error="API密钥名称重复",
+            error_code="KEY_002",
+            request_id=request_id
+        )
+    except ConcurrentUpdateError as e:
+        return create_error_response(
+            message="API密钥已被其他请求修改，请重新获取后再更新",
+            error=str(e),
+            error_code="KEY_006",
+            request_id=request_id
+        )
     except Exception as e:
         logger.error(f"更新API密钥失败: {e}")
         return create_error_response(
@@ -345,6 +538,9 @@ async def delete_api_key(
 
         # 删除API密钥
         await api_key.delete()
+        api_key_cache.invalidate(api_key.api_key, api_key.id)
+        auth_snapshot.discard(api_key.id)
+        signed_key_registry.revoke(api_key.id)
 
         execution_time = time.time() - start_time
         return create_success_response(
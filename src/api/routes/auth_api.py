@@ -2,16 +2,24 @@
 API密钥认证路由
 """
 
+import asyncio
 import time
 import uuid
 from datetime import datetime
-from typing import Optional
+from typing import Optional, List
 from fastapi import APIRouter
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 # Remove SQLAlchemy dependencies and get_db
 # from src.database.connection import get_db
 from src.database.models import ApiKey, ApiKeyStatus
+from src.utils.auth_cache import ApiKeyAuthRecord, api_key_cache
+from src.utils.auth_snapshot import auth_snapshot
+from src.utils.expiry_scheduler import expiry_scheduler
+from src.utils.key_filter import api_key_filter
+from src.utils.permissions import permission_matrix
+from src.utils.signed_keys import is_signed_api_key, signed_key_registry
+from src.utils.usage_buffer import usage_buffer
 from src.utils.response import create_success_response, create_error_response
 from src.common.logger import get_logger
 
@@ -28,9 +36,24 @@ class ApiKeyValidateRequest(BaseModel):
     """API密钥验证请求模型"""
     api_key: str
     required_permission: Optional[str] = None
+    required_permissions: Optional[List[str]] = None
     check_rate_limit: Optional[bool] = True
 
 
+class ApiKeyBatchValidateRequest(BaseModel):
+    """API密钥批量验证请求模型"""
+    api_keys: List[str] = Field(..., min_length=1, max_length=1000)
+    required_permission: Optional[str] = None
+    required_permissions: Optional[List[str]] = None
+    check_rate_limit: Optional[bool] = True
+
+
+class ApiKeyPermissionMatrixRequest(BaseModel):
+    """API密钥权限矩阵请求模型"""
+    api_keys: List[str] = Field(..., min_length=1, max_length=1000)
+    permissions: List[str] = Field(..., min_length=1, max_length=200)
+
+
 class ApiKeyPermissionRequest(BaseModel):
     """API密钥权限检查请求模型"""
     api_key: str
@@ -42,7 +65,30 @@ async def parse_api_key(api_key: str) -> Optional[dict]:
     
     API Key格式（解码后）: tenant_{tenant_hash}_agent_{agent_hash}_{random_hash}_v{version}
     例如: tenant_f42de8499dd7_agent_ff1678bfa633_54cb0fc31423_v1
+    v2签名密钥（mmc2.前缀）需通过签名校验，见 src.utils.signed_keys
     """
+    if is_signed_api_key(api_key):
+        return parse_signed_claims(signed_key_registry.verify(api_key))
+    return parse_legacy_api_key(api_key)
+
+
+def parse_signed_claims(claims: Optional[dict]) -> Optional[dict]:
+    """将已验签的v2密钥声明转换为解析结果，签名无效（None）时返回None"""
+    if not claims:
+        return None
+    return {
+        "tenant_id": claims["tenant_id"],
+        "agent_id": claims["agent_id"],
+        "api_key_id": claims["key_id"],
+        "random_hash": claims["random_hash"],
+        "version": claims["version"],
+        "expires_at": claims["expires_at"].isoformat() if claims["expires_at"] else None,
+        "format_valid": True
+    }
+
+
+def parse_legacy_api_key(api_key: str) -> Optional[dict]:
+    """解析v1密钥"""
     try:
         import base64
 
@@ -84,6 +130,137 @@ async def parse_api_key(api_key: str) -> Optional[dict]:
     return None
 
 
+def lookup_snapshot_record(api_key: str, parsed_info: dict) -> Optional[ApiKeyAuthRecord]:
+    """启动预热期间从认证快照读取记录并写入认证缓存"""
+    record = auth_snapshot.lookup(api_key)
+    if (
+        record is None
+        or record.tenant_id != parsed_info["tenant_id"]
+        or record.agent_id != parsed_info["agent_id"]
+    ):
+        return None
+    api_key_cache.put(api_key, record)
+    return record
+
+
+async def fetch_auth_record(api_key: str, parsed_info: dict) -> Optional[ApiKeyAuthRecord]:
+    """从数据库查询API密钥并写入认证缓存，近期已确认不存在的密钥直接拒绝"""
+    if not await api_key_filter.might_exist(api_key):
+        return None
+
+    record = lookup_snapshot_record(api_key, parsed_info)
+    if record is not None:
+        return record
+
+    api_key_obj = await ApiKey.get_by_key_value(
+        api_key=api_key,
+        tenant_id=parsed_info["tenant_id"],
+        agent_id=parsed_info["agent_id"]
+    )
+    if not api_key_obj:
+        api_key_filter.record_miss(api_key)
+        return None
+
+    api_key_filter.record_found(api_key)
+    record = ApiKeyAuthRecord.from_api_key(api_key_obj)
+    api_key_cache.put(api_key, record)
+    if is_signed_api_key(api_key):
+        signed_key_registry.observe(
+            api_key, record.id, record.status, record.expires_at, record.permissions,
+            owners_available=record.tenant_available() and record.agent_available()
+        )
+    return record
+
+
+def resolve_signed_record(api_key: str, claims: dict) -> Optional[ApiKeyAuthRecord]:
+    """对已验签的v2密钥做本地校验，可确定时写入认证缓存"""
+    record = signed_key_registry.resolve(claims)
+    if record:
+        api_key_cache.put(api_key, record)
+    return record
+
+
+def parse_uncached_api_key(api_key: str):
+    """认证缓存未命中时解析密钥，返回 (记录, 解析结果)；v2密钥只验签一次，签名声明同时用于本地校验"""
+    if not is_signed_api_key(api_key):
+        return None, parse_legacy_api_key(api_key)
+    claims = signed_key_registry.verify(api_key)
+    parsed_info = parse_signed_claims(claims)
+    if parsed_info is None:
+        return None, None
+    return resolve_signed_record(api_key, claims), parsed_info
+
+
+async def resolve_auth_records(api_keys: List[str]):
+    """批量解析认证记录，返回 (密钥值->记录, 格式无效的密钥集合)；本地未命中的密钥合并为一次数据库查询"""
+    records = {}
+    candidates = {}
+    invalid_format = set()
+    for key_value in api_keys:
+        if key_value in records or key_value in candidates or key_value in invalid_format:
+            continue
+        record = api_key_cache.get(key_value)
+        if record is None:
+            record, parsed_info = parse_uncached_api_key(key_value)
+        if record is not None:
+            records[key_value] = record
+        elif not parsed_info:
+            invalid_format.add(key_value)
+        else:
+            candidates[key_value] = parsed_info
+
+    # 并发过滤，布隆过滤器未命中的密钥共享同一次确认同步
+    exists = await asyncio.gather(*(api_key_filter.might_exist(key_value) for key_value in candidates))
+    to_fetch = {}
+    for (key_value, parsed_info), might_exist in zip(candidates.items(), exists):
+        if not might_exist:
+            continue
+        record = lookup_snapshot_record(key_value, parsed_info)
+        if record is not None:
+            records[key_value] = record
+        else:
+            to_fetch[key_value] = parsed_info
+
+    # 一次 IN 查询获取所有未命中缓存的密钥
+    if to_fetch:
+        fetched = await ApiKey.get_by_key_values(list(to_fetch.keys()))
+        for key_value, parsed_info in to_fetch.items():
+            api_key_obj = fetched.get(key_value)
+            if (
+                api_key_obj
+                and api_key_obj.tenant_id == parsed_info["tenant_id"]
+                and api_key_obj.agent_id == parsed_info["agent_id"]
+            ):
+                api_key_filter.record_found(key_value)
+                record = ApiKeyAuthRecord.from_api_key(api_key_obj)
+                api_key_cache.put(key_value, record)
+                if is_signed_api_key(key_value):
+                    signed_key_registry.observe(
+                        key_value, record.id, record.status, record.expires_at, record.permissions,
+                        owners_available=record.tenant_available() and record.agent_available()
+                    )
+                records[key_value] = record
+            else:
+                api_key_filter.record_miss(key_value)
+
+    return records, invalid_format
+
+
+async def resolve_auth_record(api_key: str):
+    """解析认证记录，返回 (记录, 格式是否有效)；本地无法确定时查询数据库"""
+    record = api_key_cache.get(api_key)
+    if record is not None:
+        return record, True
+
+    record, parsed_info = parse_uncached_api_key(api_key)
+    if record is not None:
+        return record, True
+    if not parsed_info:
+        return None, False
+
+    return await fetch_auth_record(api_key, parsed_info), True
+
+
 @router.post("/auth/parse-api-key", summary="解析API密钥")
 async def parse_api_key_endpoint(
     request: ApiKeyParseRequest
@@ -130,10 +307,10 @@ async def validate_api_key(
     request_id = str(uuid.uuid4())
 
     try:
-        # 解析API密钥
-        parsed_info = await parse_api_key(request.api_key)
+        # 优先在进程内解析，无法确定时查询数据库
+        api_key, format_valid = await resolve_auth_record(request.api_key)
 
-        if not parsed_info:
+        if not format_valid:
             return create_error_response(
                 message="API密钥格式无效",
                 error="API密钥格式不正确",
@@ -141,14 +318,6 @@ async def validate_api_key(
                 request_id=request_id
             )
 
-        # 查询API密钥
-        # 使用 AsyncApiKey wrapper
-        api_key = await ApiKey.get_by_key_value(
-            api_key=request.api_key,
-            tenant_id=parsed_info["tenant_id"],
-            agent_id=parsed_info["agent_id"]
-        )
-
         if not api_key:
             return create_error_response(
                 message="API密钥不存在",
@@ -174,11 +343,8 @@ async def validate_api_key(
                 request_id=request_id
             )
 
-        # 检查过期时间
-        if api_key.expires_at and api_key.expires_at < datetime.utcnow():
-            # 更新状态为已过期
-            await api_key.update(status=ApiKeyStatus.EXPIRED.value)
-
+        # 检查过期时间（状态由后台过期调度更新，请求内只读）
+        if api_key.is_expired():
             return create_error_response(
                 message="API密钥已过期",
                 error="API密钥已过期",
@@ -186,17 +352,33 @@ async def validate_api_key(
                 request_id=request_id
             )
 
+        # 检查所属租户与Agent状态（已冗余在认证记录中，无需额外查询）
+        if not api_key.tenant_available():
+            return create_error_response(
+                message="租户不可用",
+                error="API密钥所属租户已暂停或不存在",
+                error_code="AUTH_006",
+                request_id=request_id
+            )
+
+        if not api_key.agent_available():
+            return create_error_response(
+                message="Agent不可用",
+                error="API密钥所属Agent已归档或不存在",
+                error_code="AUTH_007",
+                request_id=request_id
+            )
+
         # 检查权限
         has_permission = True
         if request.required_permission:
-            has_permission = request.required_permission in api_key.permissions
+            has_permission = api_key.has_permission(request.required_permission)
+        if request.required_permissions:
+            has_permission = has_permission and api_key.has_permissions(request.required_permissions)
 
-        # 更新使用统计
+        # 更新使用统计（内存累加，由后台任务批量写回）
         if request.check_rate_limit:
-            await api_key.update(
-                last_used_at=datetime.utcnow(),
-                usage_count=api_key.usage_count + 1
-            )
+            usage_buffer.record(api_key.id, datetime.utcnow())
 
         execution_time = time.time() - start_time
         return create_success_response(
@@ -225,6 +407,142 @@ async def validate_api_key(
         )
 
 
+@router.post("/auth/validate-api-keys", summary="批量验证API密钥")
+async def validate_api_keys(
+    request: ApiKeyBatchValidateRequest
+):
+    """批量验证API密钥，未命中缓存的密钥合并为一次数据库查询，结果按输入顺序返回"""
+    start_time = time.time()
+    request_id = str(uuid.uuid4())
+
+    try:
+        records, invalid_format = await resolve_auth_records(request.api_keys)
+
+        now = datetime.utcnow()
+        items = []
+        for index, key_value in enumerate(request.api_keys):
+            result = {"index": index, "valid": False}
+            api_key = records.get(key_value)
+
+            if key_value in invalid_format:
+                result.update(error="API密钥格式不正确", error_code="AUTH_001")
+            elif not api_key:
+                result.update(error="指定的API密钥不存在", error_code="AUTH_005")
+            elif api_key.status == ApiKeyStatus.DISABLED.value:
+                result.update(error="API密钥已被禁用", error_code="AUTH_004")
+            elif api_key.status == ApiKeyStatus.EXPIRED.value:
+                result.update(error="API密钥已过期", error_code="AUTH_002")
+            elif api_key.is_expired(now):
+                result.update(error="API密钥已过期", error_code="AUTH_002")
+            elif not api_key.tenant_available():
+                result.update(error="API密钥所属租户已暂停或不存在", error_code="AUTH_006")
+            elif not api_key.agent_available():
+                result.update(error="API密钥所属Agent已归档或不存在", error_code="AUTH_007")
+            else:
+                has_permission = True
+                if request.required_permission:
+                    has_permission = api_key.has_permission(request.required_permission)
+                if request.required_permissions:
+                    has_permission = has_permission and api_key.has_permissions(request.required_permissions)
+
+                if request.check_rate_limit:
+                    usage_buffer.record(api_key.id, now)
+
+                result.update(
+                    valid=True,
+                    tenant_id=api_key.tenant_id,
+                    agent_id=api_key.agent_id,
+                    api_key_id=api_key.id,
+                    permissions=api_key.permissions,
+                    has_permission=has_permission,
+                    status=api_key.status
+                )
+            items.append(result)
+
+        execution_time = time.time() - start_time
+        return create_success_response(
+            message="API密钥批量验证完成",
+            data={
+                "items": items,
+                "count": len(items)
+            },
+            execution_time=execution_time,
+            request_id=request_id
+        )
+
+    except Exception as e:
+        logger.error(f"批量验证API密钥失败: {e}")
+        return create_error_response(
+            message="批量验证API密钥失败",
+            error=str(e),
+            error_code="AUTH_VALIDATE_ERROR",
+            request_id=request_id
+        )
+
+
+@router.post("/auth/permission-matrix", summary="批量权限矩阵")
+async def get_permission_matrix(
+    request: ApiKeyPermissionMatrixRequest
+):
+    """计算 密钥×权限 的布尔矩阵，未命中缓存的密钥合并为一次数据库查询（不自增计数）"""
+    start_time = time.time()
+    request_id = str(uuid.uuid4())
+
+    try:
+        records, invalid_format = await resolve_auth_records(request.api_keys)
+
+        now = datetime.utcnow()
+        items = []
+        grants = []
+        for index, key_value in enumerate(request.api_keys):
+            result = {"index": index, "valid": False}
+            api_key = records.get(key_value)
+
+            if key_value in invalid_format:
+                result.update(error="API密钥格式不正确", error_code="AUTH_001")
+            elif not api_key:
+                result.update(error="指定的API密钥不存在", error_code="AUTH_005")
+            elif api_key.status == ApiKeyStatus.DISABLED.value:
+                result.update(error="API密钥已被禁用", error_code="AUTH_004")
+            elif api_key.status == ApiKeyStatus.EXPIRED.value or api_key.is_expired(now):
+                result.update(error="API密钥已过期", error_code="AUTH_002")
+            elif not api_key.tenant_available():
+                result.update(error="API密钥所属租户已暂停或不存在", error_code="AUTH_006")
+            elif not api_key.agent_available():
+                result.update(error="API密钥所属Agent已归档或不存在", error_code="AUTH_007")
+            else:
+                result.update(
+                    valid=True,
+                    tenant_id=api_key.tenant_id,
+                    agent_id=api_key.agent_id,
+                    api_key_id=api_key.id
+                )
+            items.append(result)
+            # 不可用的密钥整行为 False
+            grants.append((api_key.permission_mask, api_key.permission_trie) if result["valid"] else (0, None))
+
+        execution_time = time.time() - start_time
+        return create_success_response(
+            message="权限矩阵计算完成",
+            data={
+                "permissions": request.permissions,
+                "items": items,
+                "matrix": permission_matrix(grants, request.permissions)
+            },
+            execution_time=execution_time,
+            request_id=request_id
+        )
+
+    except Exception as e:
+        logger.error(f"计算权限矩阵失败: {e}")
+        return create_error_response(
+            message="计算权限矩阵失败",
+            error=str(e),
+            error_code="AUTH_PERMISSION_ERROR",
+            request_id=request_id
+        )
+
+
 @router.post("/auth/check-permission", summary="检查权限")
 async def check_permission(
     request: ApiKeyPermissionRequest
@@ -234,10 +552,10 @@ async def check_permission(
     request_id = str(uuid.uuid4())
 
     try:
-        # 解析API密钥
-        parsed_info = await parse_api_key(request.api_key)
+        # 优先在进程内解析，无法确定时查询数据库
+        api_key, format_valid = await resolve_auth_record(request.api_key)
 
-        if not parsed_info:
+        if not format_valid:
             return create_error_response(
                 message="API密钥格式无效",
                 error="API密钥格式不正确",
@@ -245,13 +563,6 @@ async def check_permission(
                 request_id=request_id
             )
 
-        # 查询API密钥
-        api_key = await ApiKey.get_by_key_value(
-            api_key=request.api_key,
-            tenant_id=parsed_info["tenant_id"],
-            agent_id=parsed_info["agent_id"]
-        )
-
         if not api_key:
             return create_error_response(
                 message="API密钥不存在",
@@ -276,7 +587,7 @@ async def check_permission(
             )
 
         # 检查过期时间
-        if api_key.expires_at and api_key.expires_at < datetime.utcnow():
+        if api_key.is_expired():
             return create_error_response(
                 message="API密钥已过期",
                 error="API密钥已过期",
@@ -284,8 +595,25 @@ async def check_permission(
                 request_id=request_id
             )
 
+        # 检查所属租户与Agent状态
+        if not api_key.tenant_available():
+            return create_error_response(
+                message="租户不可用",
+                error="API密钥所属租户已暂停或不存在",
+                error_code="AUTH_006",
+                request_id=request_id
+            )
+
+        if not api_key.agent_available():
+            return create_error_response(
+                message="Agent不可用",
+                error="API密钥所属Agent已归档或不存在",
+                error_code="AUTH_007",
+                request_id=request_id
+            )
+
         # 检查权限
-        has_permission = request.permission in api_key.permissions
+        has_permission = api_key.has_permission(request.permission)
 
         execution_time = time.time() - start_time
         return create_success_response(
@@ -310,4 +638,25 @@ async def check_permission(
             error=str(e),
             error_code="AUTH_PERMISSION_ERROR",
             request_id=request_id
-        )
\ No newline at end of file
+        )
+
+
+@router.get("/auth/metrics", summary="认证指标")
+async def get_auth_metrics():
+    """获取认证缓存、密钥过滤器、签名密钥本地校验、过期调度、认证快照与使用统计写回缓冲的指标"""
+    start_time = time.time()
+    request_id = str(uuid.uuid4())
+
+    return create_success_response(
+        message="获取认证指标成功",
+        data={
+            "api_key_cache": api_key_cache.stats(),
+            "usage_buffer": usage_buffer.stats(),
+            "key_filter": api_key_filter.stats(),
+            "signed_keys": signed_key_registry.stats(),
+            "expiry_scheduler": expiry_scheduler.stats(),
+            "auth_snapshot": auth_snapshot.stats()
+        },
+        execution_time=time.time() - start_time,
+        request_id=request_id
+    )
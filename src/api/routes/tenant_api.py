@@ -8,8 +8,15 @@ from typing import Optional, List
 from fastapi import APIRouter, Query
 from pydantic import BaseModel
 
-from src.database.models import Tenant, TenantType, TenantStatus
+from src.database.constraints import DuplicateRecordError
+from src.database.models import ApiKey, Tenant, TenantType, TenantStatus
+from src.database.pagination import InvalidCursor
+from src.database.row_version import ConcurrentUpdateError
+from src.utils.auth_cache import invalidate_auth_keys, invalidate_owner_keys
+from src.common.config import settings
 from src.utils.response import (
+    BulkItemResult,
+    create_bulk_response,
     create_success_response,
     create_error_response
 )
@@ -36,6 +43,13 @@ class TenantUpdateRequest(BaseModel):
     contact_email: Optional[str] = None
     tenant_config: Optional[dict] = None
     status: Optional[TenantStatus] = None
+    # 读取时的版本号，提供时仅在记录未被其他请求修改的情况下更新
+    version: Optional[int] = None
+
+
+class TenantBulkCreateRequest(BaseModel):
+    """批量创建租户请求模型"""
+    items: List[TenantCreateRequest]
 
 
 class TenantResponse(BaseModel):
@@ -50,6 +64,7 @@ class TenantResponse(BaseModel):
     owner_id: Optional[str] = None
     created_at: str
     updated_at: str
+    version: int = 0
 
 
 async def generate_tenant_id() -> str:
@@ -69,7 +84,8 @@ def tenant_to_response(tenant: Tenant) -> TenantResponse:
         status=tenant.status,
         owner_id=tenant.owner_id,
         created_at=tenant.created_at.isoformat() if tenant.created_at else "",
-        updated_at=tenant.updated_at.isoformat() if tenant.updated_at else ""
+        updated_at=tenant.updated_at.isoformat() if tenant.updated_at else "",
+        version=tenant.row_version
     )
 
 
@@ -81,8 +97,7 @@ async def create_tenant(request: TenantCreateRequest):
 
     try:
         # 检查租户名称是否已存在
-        existing_tenant = await Tenant.get_by_name(request.tenant_name)
-        if existing_tenant:
+        if await Tenant.name_exists(request.tenant_name):
             return create_error_response(
                 message="租户名称已存在",
                 error="租户名称重复",
@@ -111,6 +126,15 @@ async def create_tenant(request: TenantCreateRequest):
             execution_time=time.time() - start_time
         )
 
+    except DuplicateRecordError:
+        # 并发创建同名租户，由唯一索引拦截
+        return create_error_response(
+            message="租户名称已存在",
+            error="租户名称重复",
+            error_code="TENANT_002",
+            request_id=request_id,
+            execution_time=time.time() - start_time
+        )
     except Exception as e:
         logger.error(f"创建租户失败: {str(e)}")
         return create_error_response(
@@ -122,6 +146,82 @@ async def create_tenant(request: TenantCreateRequest):
         )
 
 
+@router.post("/tenants:bulk", summary="批量创建租户")
+async def bulk_create_tenants(request: TenantBulkCreateRequest):
+    """批量创建租户，按请求顺序返回逐项结果；未通过校验的项不影响其他项"""
+    start_time = time.time()
+    request_id = str(uuid.uuid4())
+
+    if not request.items or len(request.items) > settings.bulk_create_max_items:
+        return create_error_response(
+            message="批量创建数量超限",
+            error=f"每次需提交 1-{settings.bulk_create_max_items} 项",
+            error_code="TENANT_010",
+            request_id=request_id,
+            execution_time=time.time() - start_time
+        )
+
+    try:
+        # 一次查询校验整批名称，批内重名时保留第一项
+        taken = await Tenant.names_taken([item.tenant_name for item in request.items])
+        results = {}
+        records = []
+        seen = set()
+        for index, item in enumerate(request.items):
+            # 按数据库排序规则比较（MySQL 上不区分大小写），与唯一索引一致
+            name_key = Tenant.name_key(item.tenant_name)
+            if name_key in taken or name_key in seen:
+                results[index] = BulkItemResult(
+                    index=index, success=False, error="租户名称重复", error_code="TENANT_002"
+                )
+                continue
+            seen.add(name_key)
+            records.append((index, {
+                "id": await generate_tenant_id(),
+                "tenant_name": item.tenant_name,
+                "tenant_type": item.tenant_type.value,
+                "description": item.description,
+                "contact_email": item.contact_email,
+                "tenant_config": item.tenant_config,
+                "owner_id": item.owner_id,
+                "status": TenantStatus.ACTIVE.value
+            }))
+
+        # 通过校验的项在一个事务中批量插入
+        if records:
+            tenants = await Tenant.bulk_create([record for _, record in records])
+            for (index, _), tenant in zip(records, tenants):
+                results[index] = BulkItemResult(index=index, success=True, data=tenant_to_response(tenant))
+
+        logger.info(f"批量创建租户: 成功 {len(records)}，失败 {len(request.items) - len(records)}")
+
+        return create_bulk_response(
+            message="批量创建租户完成",
+            results=[results[index] for index in range(len(request.items))],
+            request_id=request_id,
+            execution_time=time.time() - start_time
+        )
+
+    except DuplicateRecordError:
+        # 校验后有并发请求创建了同名租户，整批回滚
+        return create_error_response(
+            message="租户名称已存在",
+            error="批量创建期间出现同名租户，本批未创建",
+            error_code="TENANT_002",
+            request_id=request_id,
+            execution_time=time.time() - start_time
+        )
+    except Exception as e:
+        logger.error(f"批量创建租户失败: {str(e)}")
+        return create_error_response(
+            message="批量创建租户失败",
+            error=str(e),
+            error_code="TENANT_001",
+            request_id=request_id,
+            execution_time=time.time() - start_time
+        )
+
+
 @router.get("/tenants/{tenant_id}", summary="获取租户详情")
 async def get_tenant(tenant_id: str):
     """获取指定租户的详细信息"""
@@ -158,17 +258,22 @@ async def get_tenant(tenant_id: str):
 
 @router.get("/tenants", summary="获取租户列表")
 async def list_tenants(
-    page: int = Query(1, ge=1, description="页码"),
-    size: int = Query(20, ge=1, le=100, description="每页数量")
+    page: int = Query(1, ge=1, description="页码（传入 after 时忽略）"),
+    size: int = Query(20, ge=1, le=100, description="每页数量"),
+    after: Optional[str] = Query(None, description="上一页返回的 next_cursor"),
+    include_total: bool = Query(True, description="是否返回总数")
 ):
-    """获取租户列表"""
+    """获取租户列表（按创建时间倒序）"""
     start_time = time.time()
     request_id = str(uuid.uuid4())
 
     try:
-        offset = (page - 1) * size
-        tenants = await Tenant.get_all(limit=size, offset=offset)
-        total = await Tenant.count()
+        next_cursor = None
+        if after or page == 1:
+            tenants, next_cursor = await Tenant.list_page(limit=size, after=after)
+        else:
+            tenants = await Tenant.get_all(limit=size, offset=(page - 1) * size)
+        total = await Tenant.count() if include_total else None
 
         tenant_list = [tenant_to_response(tenant) for tenant in tenants]
 
@@ -176,15 +281,24 @@ async def list_tenants(
             data={
                 "items": tenant_list,
                 "total": total,
-                "page": page,
+                "page": None if after else page,
                 "size": size,
-                "pages": (total + size - 1) // size
+                "pages": (total + size - 1) // size if total is not None else None,
+                "next_cursor": next_cursor
             },
             message="获取租户列表成功",
             request_id=request_id,
             execution_time=time.time() - start_time
         )
 
+    except InvalidCursor as e:
+        return create_error_response(
+            message="分页游标无效",
+            error=str(e),
+            error_code="TENANT_009",
+            request_id=request_id,
+            execution_time=time.time() - start_time
+        )
     except Exception as e:
         logger.error(f"获取租户列表失败: {str(e)}")
         return create_error_response(
@@ -215,6 +329,16 @@ async def update_tenant(
                 request_id=request_id
             )
 
+        # 如果更新租户名称，检查名称是否重复
+        if request.tenant_name and request.tenant_name != tenant.tenant_name:
+            if await Tenant.name_exists(request.tenant_name, exclude_id=tenant_id):
+                return create_error_response(
+                    message="租户名称已存在",
+                    error="租户名称重复",
+                    error_code="TENANT_002",
+                    request_id=request_id
+                )
+
         # 准备更新数据
         update_data = {}
         if request.tenant_name is not None:
@@ -229,7 +353,11 @@ async def update_tenant(
             update_data['status'] = request.status.value
 
         # 执行更新
-        await tenant.update(**update_data)
+        await tenant.update(expected_version=request.version, **update_data)
+
+        # 租户状态冗余在认证记录中，状态变更后失效其下密钥
+        if request.status is not None:
+            await invalidate_owner_keys(tenant_id=tenant_id)
 
         logger.info(f"更新租户成功: {tenant_id}")
 
@@ -240,6 +368,22 @@ async def update_tenant(
             execution_time=time.time() - start_time
         )
 
+    except DuplicateRecordError:
+        return create_error_response(
+            message="租户名称已存在",
+            error="租户名称重复",
+            error_code="TENANT_002",
+            request_id=request_id,
+            execution_time=time.time() - start_time
+        )
+    except ConcurrentUpdateError as e:
+        return create_error_response(
+            message="租户已被其他请求修改，请重新获取后再更新",
+            error=str(e),
+            error_code="TENANT_008",
+            request_id=request_id,
+            execution_time=time.time() - start_time
+        )
     except Exception as e:
         logger.error(f"更新租户失败: {str(e)}")
         return create_error_response(
@@ -267,7 +411,10 @@ async def delete_tenant(tenant_id: str):
                 request_id=request_id
             )
 
+        # 删除前记录其下密钥，删除后失效它们的认证状态
+        api_key_ids = await ApiKey.list_ids_by_owner(tenant_id=tenant_id)
         await tenant.delete()
+        invalidate_auth_keys(api_key_ids)
 
         logger.info(f"删除租户成功: {tenant_id}")
 
@@ -50,6 +50,81 @@ class Settings(BaseSettings):
         env="ACCESS_TOKEN_EXPIRE_MINUTES"
     )
 
+    # 数据库线程池配置（线程数应与数据库连接上限一致；饱和策略 queue / fail_fast）
+    db_executor_max_workers: int = Field(default=10, env="DB_EXECUTOR_MAX_WORKERS")
+    db_executor_max_queue: int = Field(default=100, env="DB_EXECUTOR_MAX_QUEUE")
+    db_executor_queue_timeout_seconds: float = Field(default=5.0, env="DB_EXECUTOR_QUEUE_TIMEOUT_SECONDS")
+    db_executor_saturation_policy: str = Field(default="queue", env="DB_EXECUTOR_SATURATION_POLICY")
+
+    # Peewee 数据库连接池配置（仅 MySQL / PostgreSQL 生效；上限应不小于数据库线程池线程数）
+    db_pool_enabled: bool = Field(default=True, env="DB_POOL_ENABLED")
+    db_pool_max_connections: int = Field(default=10, env="DB_POOL_MAX_CONNECTIONS")
+    db_pool_stale_timeout_seconds: int = Field(default=300, env="DB_POOL_STALE_TIMEOUT_SECONDS")
+    db_pool_wait_timeout_seconds: float = Field(default=5.0, env="DB_POOL_WAIT_TIMEOUT_SECONDS")
+    db_pool_pre_ping: bool = Field(default=True, env="DB_POOL_PRE_PING")
+
+    # 列表总数缓存（秒，写入时按条件失效，多 worker 间最长滞后该时长）
+    count_cache_ttl_seconds: float = Field(default=30.0, env="COUNT_CACHE_TTL_SECONDS")
+
+    # 并发相同读取合并（按ID获取租户/Agent/API密钥与Agent配置）
+    single_flight_enabled: bool = Field(default=True, env="SINGLE_FLIGHT_ENABLED")
+
+    # 主键查询微批（默认关闭；窗口内的点查询合并为一次 IN 查询，单次查询最多增加一个窗口的延迟）
+    dataloader_enabled: bool = Field(default=False, env="DATALOADER_ENABLED")
+    dataloader_window_ms: float = Field(default=2.0, env="DATALOADER_WINDOW_MS")
+    dataloader_max_batch: int = Field(default=100, env="DATALOADER_MAX_BATCH")
+
+    # 热点读取的原生 aiomysql 连接池配置（仅 MySQL 生效）
+    native_reads_enabled: bool = Field(default=True, env="NATIVE_READS_ENABLED")
+    native_pool_min_size: int = Field(default=1, env="NATIVE_POOL_MIN_SIZE")
+    native_pool_max_size: int = Field(default=10, env="NATIVE_POOL_MAX_SIZE")
+
+    # 批量创建接口单次请求的最大条数
+    bulk_create_max_items: int = Field(default=500, env="BULK_CREATE_MAX_ITEMS")
+
+    # API密钥认证缓存配置
+    auth_cache_max_size: int = Field(default=10000, env="AUTH_CACHE_MAX_SIZE")
+    auth_cache_ttl_seconds: float = Field(default=60.0, env="AUTH_CACHE_TTL_SECONDS")
+
+    # 跨 worker 共享认证缓存配置（内存映射文件，留空路径时按端口放在 /dev/shm 下）
+    auth_shared_cache_enabled: bool = Field(default=True, env="AUTH_SHARED_CACHE_ENABLED")
+    auth_shared_cache_path: str = Field(default="", env="AUTH_SHARED_CACHE_PATH")
+    auth_shared_cache_slots: int = Field(default=16384, env="AUTH_SHARED_CACHE_SLOTS")
+    auth_shared_cache_slot_size: int = Field(default=512, env="AUTH_SHARED_CACHE_SLOT_SIZE")
+
+    # API密钥认证快照配置（重启后在缓存预热前直接从快照提供验证）
+    auth_snapshot_enabled: bool = Field(default=True, env="AUTH_SNAPSHOT_ENABLED")
+    auth_snapshot_path: str = Field(default="data/auth_snapshot.bin", env="AUTH_SNAPSHOT_PATH")
+    auth_snapshot_interval_seconds: float = Field(default=300.0, env="AUTH_SNAPSHOT_INTERVAL_SECONDS")
+    auth_snapshot_max_age_seconds: float = Field(default=900.0, env="AUTH_SNAPSHOT_MAX_AGE_SECONDS")
+    auth_snapshot_warmup_seconds: float = Field(default=60.0, env="AUTH_SNAPSHOT_WARMUP_SECONDS")
+
+    # API密钥负缓存与布隆过滤器配置
+    auth_negative_cache_max_size: int = Field(default=100000, env="AUTH_NEGATIVE_CACHE_MAX_SIZE")
+    auth_negative_cache_ttl_seconds: float = Field(default=30.0, env="AUTH_NEGATIVE_CACHE_TTL_SECONDS")
+    auth_bloom_filter_enabled: bool = Field(default=True, env="AUTH_BLOOM_FILTER_ENABLED")
+    auth_bloom_false_positive_rate: float = Field(default=0.01, env="AUTH_BLOOM_FALSE_POSITIVE_RATE")
+    auth_bloom_sync_interval_seconds: float = Field(default=5.0, env="AUTH_BLOOM_SYNC_INTERVAL_SECONDS")
+    auth_bloom_rebuild_interval_seconds: float = Field(default=600.0, env="AUTH_BLOOM_REBUILD_INTERVAL_SECONDS")
+    auth_bloom_confirm_interval_seconds: float = Field(default=0.1, env="AUTH_BLOOM_CONFIRM_INTERVAL_SECONDS")
+
+    # API密钥格式与签名配置（v2为自校验签名格式）
+    api_key_format_version: str = Field(default="v2", env="API_KEY_FORMAT_VERSION")
+    api_key_signing_secret: str = Field(default="", env="API_KEY_SIGNING_SECRET")
+    signed_key_sync_interval_seconds: float = Field(default=10.0, env="SIGNED_KEY_SYNC_INTERVAL_SECONDS")
+    signed_key_rebuild_interval_seconds: float = Field(default=600.0, env="SIGNED_KEY_REBUILD_INTERVAL_SECONDS")
+    signed_key_max_tracked: int = Field(default=100000, env="SIGNED_KEY_MAX_TRACKED")
+
+    # API密钥摘要回填间隔（其他写入方插入的密钥没有摘要，0 表示只在启动时回填）
+    key_digest_backfill_interval_seconds: float = Field(default=60.0, env="KEY_DIGEST_BACKFILL_INTERVAL_SECONDS")
+
+    # API密钥过期调度配置
+    expiry_scheduler_refresh_seconds: float = Field(default=60.0, env="EXPIRY_SCHEDULER_REFRESH_SECONDS")
+
+    # API密钥使用统计写回配置
+    usage_flush_interval_seconds: float = Field(default=5.0, env="USAGE_FLUSH_INTERVAL_SECONDS")
+    usage_buffer_max_keys: int = Field(default=10000, env="USAGE_BUFFER_MAX_KEYS")
+
     # 应用配置
     app_name: str = Field(default="MaiMBot API", env="APP_NAME")
     app_version: str = Field(default="1.0.0", env="APP_VERSION")
@@ -0,0 +1,50 @@
+"""
+批量写入
+批量创建接口先以集合查询校验整批数据，再在一个事务中以 insert_many 分批插入通过校验的行。
+行数据先构建为模型实例，字段默认值（created_at、row_version 等）与逐条 save() 时一致。
+创建后的附属行（如 Agent 活跃状态）以 upsert_rows 在同一事务中批量写入。
+"""
+
+from typing import Dict, List
+
+# 每条 INSERT 的行数（兼顾 SQLite 的绑定参数上限）
+INSERT_BATCH_SIZE = 100
+
+
+def insert_rows(model, rows: List[Dict], batch_size: int = INSERT_BATCH_SIZE) -> List:
+    """在一个事务中批量插入，返回已填充默认值的模型实例；失败时整批回滚"""
+    from peewee import chunked
+
+    instances = [model(**row) for row in rows]
+    with model._meta.database.atomic():
+        for batch in chunked(instances, batch_size):
+            model.insert_many([instance.__data__ for instance in batch]).execute()
+    return instances
+
+
+def upsert_rows(model, rows: List[Dict], preserve: List[str], batch_size: int = INSERT_BATCH_SIZE) -> int:
+    """批量插入，唯一键冲突时以新值覆盖 preserve 中的字段，返回行数
+
+    MySQL 为 INSERT ... ON DUPLICATE KEY UPDATE；SQLite/PostgreSQL 为以模型第一个唯一索引（没有时为主键）
+    为冲突目标的 ON CONFLICT DO UPDATE。在调用方的事务中执行时随之提交或回滚
+    """
+    from peewee import MySQLDatabase, chunked
+
+    database = model._meta.database
+    # 连接池安装后数据库可能是代理对象
+    target = None if isinstance(getattr(database, 'obj', None) or database, MySQLDatabase) else _unique_key(model)
+    preserve = [model._meta.fields[name] for name in preserve]
+    instances = [model(**row) for row in rows]
+    with database.atomic():
+        for batch in chunked(instances, batch_size):
+            model.insert_many([instance.__data__ for instance in batch]).on_conflict(
+                conflict_target=target, preserve=preserve
+            ).execute()
+    return len(instances)
+
+
+def _unique_key(model):
+    for index in model._meta.fields_to_index():
+        if index._unique:
+            return tuple(index._expressions)
+    return (model._meta.primary_key,)
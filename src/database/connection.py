@@ -2,12 +2,33 @@
 数据库连接管理 - 使用maim_db
 """
 
+import asyncio
 import sys
 import os
-import asyncio
 import json
+import unicodedata
+from datetime import datetime, timedelta
 from typing import AsyncGenerator
 
+try:
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:
+    _json_loads = json.loads
+
+from src.common.config import settings
+from .constraints import duplicate_error
+from .bulk import insert_rows, upsert_rows
+from .dataloader import BatchLoader
+from .executor import db_executor, run_db
+from .pagination import keyset_page, record_counts
+from .single_flight import read_flights
+from .row_version import ROW_VERSION_FIELD, ConcurrentUpdateError, register_row_version_field
+from .native import native_reads
+from .pool import db_pool
+from .key_digest import compute_key_digest
+from .tombstones import ApiKeyTombstone, bind_tombstones, deleted_since, prune_tombstones, record_deleted
+
 # 添加maim_db路径
 maim_db_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..', 'maim_db', 'src'))
 if maim_db_path not in sys.path:
@@ -30,13 +51,23 @@ try:
         AgentStatus,
         ApiKeyStatus
     )
-    from maim_db.core import init_database, close_database, get_database, AsyncAgentActiveState
+    from maim_db.core import init_database, close_database, get_database, AsyncAgentActiveState, AgentConfigManager
+    from peewee import IntegrityError
     from .enums import (
         TenantType as LocalTenantType,
         TenantStatus as LocalTenantStatus,
         AgentStatus as LocalAgentStatus,
         ApiKeyStatus as LocalApiKeyStatus
     )
+    from .key_digest import register_key_digest_field
+
+    # 密钥按定长摘要索引查询
+    register_key_digest_field(MaimDbApiKey)
+    # 乐观并发控制的行版本号
+    for _model in (MaimDbTenant, MaimDbAgent, MaimDbApiKey):
+        register_row_version_field(_model)
+    # 密钥删除记录与密钥表使用同一数据库
+    bind_tombstones(MaimDbApiKey._meta.database)
 
     MAIM_DB_AVAILABLE = True
     print("✅ maim_db 导入成功")
@@ -66,44 +97,198 @@ except ImportError as e:
     class LocalApiKeyStatus: pass
 
     class AsyncAgentActiveState: pass
+    class AgentConfigManager: pass
+
+    class IntegrityError(Exception): pass
 
     async def init_database(): pass
     async def close_database(): pass
     def get_database(): return None
 
+# 活跃状态的 Peewee 模型（原生读取按模型生成查询；缺失时活跃状态列表走 maim_db 的线程池路径）
+try:
+    from maim_db.core.models.system_v2 import AgentActiveState as MaimDbAgentActiveState
+except ImportError:
+    MaimDbAgentActiveState = None
+
 
 # Alias for compatibility
 get_db = get_database
 
 
-# 创建异步包装器类
+_UNDECODED = object()
+
+
+class _LazyJson:
+    """首次访问时才解析的 JSON 列：原始字符串存放在 _raw_<name> 槽位，解析结果缓存在 _<name> 槽位"""
+
+    def __init__(self, parser: str = '_parse_json'):
+        self.parser = parser
+
+    def __set_name__(self, owner, name):
+        self.raw_slot = f'_raw_{name}'
+        self.value_slot = f'_{name}'
+
+    def __get__(self, instance, owner=None):
+        if instance is None:
+            return self
+        value = getattr(instance, self.value_slot)
+        if value is _UNDECODED:
+            value = getattr(instance, self.parser)(getattr(instance, self.raw_slot))
+            setattr(instance, self.value_slot, value)
+            setattr(instance, self.raw_slot, None)
+        return value
+
+    def __set__(self, instance, value):
+        setattr(instance, self.value_slot, value)
+
+
+def _changed_fields(wrapper, model, kwargs):
+    """过滤出属于模型字段且与当前值不同的更新"""
+    return {
+        field: value
+        for field, value in kwargs.items()
+        if field in model._meta.fields and not (hasattr(wrapper, field) and getattr(wrapper, field) == value)
+    }
+
+
+def _versioned_update(model, record_id, expected_version, columns):
+    """只写入给定的列并递增版本号；版本号不一致（已被其他请求修改或删除）时抛出 ConcurrentUpdateError"""
+    version = getattr(model, ROW_VERSION_FIELD)
+    values = {model._meta.fields[field]: value for field, value in columns.items()}
+    values[version] = version + 1
+    try:
+        updated = (
+            model.update(values)
+            .where((model.id == record_id) & (version == expected_version))
+            .execute()
+        )
+    except IntegrityError as e:
+        raise duplicate_error(e) or e
+    if not updated:
+        raise ConcurrentUpdateError(record_id, expected_version)
+
+
+async def _fetch_many(model, ids):
+    """按主键批量查询，返回 {id: 行}"""
+    query = model.select().where(model.id.in_(ids))
+    if native_reads.enabled:
+        rows = await native_reads.fetch_all(query)
+    else:
+        rows = await run_db(lambda: list(query))
+    return {row.id: row for row in rows}
+
+
+def _owned_key_ids(condition):
+    """租户/Agent删除前，其下的密钥ID"""
+    return [row[0] for row in MaimDbApiKey.select(MaimDbApiKey.id).where(condition).tuples()]
+
+
+def _upsert_active_states(agents, ttl_seconds):
+    """批量标记Agent活跃（与 AsyncAgentActiveState.upsert 写入相同的字段）"""
+    now = datetime.utcnow()
+    values = {
+        'last_seen_at': now,
+        'expires_at': now + timedelta(seconds=ttl_seconds),
+        'ttl_seconds': ttl_seconds,
+    }
+    preserve = [name for name in values if name in MaimDbAgentActiveState._meta.fields]
+    rows = [
+        {'tenant_id': agent.tenant_id, 'agent_id': agent.id, **{name: values[name] for name in preserve}}
+        for agent in agents
+    ]
+    return upsert_rows(MaimDbAgentActiveState, rows, preserve)
+
+
+def _collation_key(model, value):
+    """与数据库比较主键、名称等字符串列的规则一致的键
+
+    按 MySQL 8 的默认排序规则 utf8mb4_0900_ai_ci 处理：不区分大小写与重音，尾部空格有效（NO PAD）。
+    其他数据库按原值比较
+    """
+    from peewee import MySQLDatabase
+
+    database = model._meta.database
+    # 连接池安装后数据库可能是代理对象
+    database = getattr(database, 'obj', None) or database
+    if isinstance(value, str) and isinstance(database, MySQLDatabase):
+        decomposed = unicodedata.normalize('NFKD', value.casefold())
+        return ''.join(char for char in decomposed if not unicodedata.combining(char))
+    return value
+
+
+def _point_loader(model_getter):
+    return BatchLoader(
+        lambda ids: _fetch_many(model_getter(), ids),
+        enabled=settings.dataloader_enabled,
+        window_seconds=settings.dataloader_window_ms / 1000,
+        max_batch=settings.dataloader_max_batch,
+        normalize=lambda value: _collation_key(model_getter(), value),
+    )
+
+
+# 按ID获取租户/Agent/API密钥的微批加载器（DATALOADER_ENABLED 开启时生效）
+point_loaders = {
+    'tenant': _point_loader(lambda: MaimDbTenant),
+    'agent': _point_loader(lambda: MaimDbAgent),
+    'api_key': _point_loader(lambda: MaimDbApiKey),
+}
+
+
+# 创建异步包装器类（__slots__ 存放字段，JSON 列延迟解析）
 class AsyncTenant:
+    __slots__ = (
+        'id', 'tenant_name', 'tenant_type', 'description', 'contact_email', '_raw_tenant_config',
+        '_tenant_config', 'status', 'owner_id', 'created_at', 'updated_at', 'row_version', '_tenant',
+    )
+
+    tenant_config = _LazyJson()
+
     @classmethod
     async def create(cls, **kwargs):
         def _create():
-            data = {
-                'tenant_name': kwargs.get('tenant_name'),
-                'tenant_type': kwargs.get('tenant_type', 'personal'),
-                'description': kwargs.get('description'),
-                'contact_email': kwargs.get('contact_email'),
-                'tenant_config': json.dumps(kwargs.get('tenant_config', {})),
-                'status': kwargs.get('status', 'active'),
-                'owner_id': kwargs.get('owner_id'),
-            }
-
-            if 'id' not in kwargs:
-                import uuid
-                data['id'] = f"tenant_{uuid.uuid4().hex[:12]}"
-            else:
-                data['id'] = kwargs['id']
-
-            tenant = MaimDbTenant(**data)
-            tenant.save(force_insert=True)
+            tenant = MaimDbTenant(**cls._row_data(kwargs))
+            try:
+                tenant.save(force_insert=True)
+            except IntegrityError as e:
+                raise duplicate_error(e) or e
             return tenant
 
-        tenant = await asyncio.get_event_loop().run_in_executor(None, _create)
+        tenant = await run_db(_create)
+        record_counts.invalidate('tenants')
         return cls(tenant)
 
+    @classmethod
+    async def bulk_create(cls, records: list):
+        """在一个事务中批量创建（insert_many），记录格式同 create；违反唯一约束时整批回滚并抛出 DuplicateRecordError"""
+        def _insert():
+            try:
+                return insert_rows(MaimDbTenant, [cls._row_data(record) for record in records])
+            except IntegrityError as e:
+                raise duplicate_error(e) or e
+
+        rows = await run_db(_insert)
+        record_counts.invalidate('tenants')
+        return [cls(row) for row in rows]
+
+    @staticmethod
+    def _row_data(kwargs):
+        data = {
+            'tenant_name': kwargs.get('tenant_name'),
+            'tenant_type': kwargs.get('tenant_type', 'personal'),
+            'description': kwargs.get('description'),
+            'contact_email': kwargs.get('contact_email'),
+            'tenant_config': json.dumps(kwargs.get('tenant_config', {})),
+            'status': kwargs.get('status', 'active'),
+            'owner_id': kwargs.get('owner_id'),
+        }
+        if 'id' not in kwargs:
+            import uuid
+            data['id'] = f"tenant_{uuid.uuid4().hex[:12]}"
+        else:
+            data['id'] = kwargs['id']
+        return data
+
     def __init__(self, maim_db_tenant=None):
         if maim_db_tenant:
             self.id = maim_db_tenant.id
@@ -111,31 +296,64 @@ class AsyncTenant:
             self.tenant_type = maim_db_tenant.tenant_type
             self.description = maim_db_tenant.description
             self.contact_email = maim_db_tenant.contact_email
-            self.tenant_config = self._parse_json(maim_db_tenant.tenant_config)
+            self._raw_tenant_config = maim_db_tenant.tenant_config
+            self._tenant_config = _UNDECODED
             self.status = maim_db_tenant.status
             self.owner_id = maim_db_tenant.owner_id
             self.created_at = maim_db_tenant.created_at
             self.updated_at = maim_db_tenant.updated_at
+            self.row_version = getattr(maim_db_tenant, ROW_VERSION_FIELD, 0) or 0
             self._tenant = maim_db_tenant
 
-    def _parse_json(self, json_str):
+    @staticmethod
+    def _parse_json(json_str):
         if not json_str:
             return None
         try:
-            return json.loads(json_str)
+            return _json_loads(json_str)
         except:
             return None
 
     @classmethod
     async def get(cls, tenant_id):
+        # 并发的相同读取共享一次查询，每个调用方各自构建包装器（包装器可变，不共享）
+        tenant = await read_flights.do(('tenant', tenant_id), lambda: cls._fetch(tenant_id))
+        return cls(tenant) if tenant else None
+
+    @staticmethod
+    async def _fetch(tenant_id):
+        if point_loaders['tenant'].enabled:
+            return await point_loaders['tenant'].load(tenant_id)
+        if native_reads.enabled:
+            return await native_reads.fetch_one(MaimDbTenant.select().where(MaimDbTenant.id == tenant_id))
+
         def _get():
             try:
                 return MaimDbTenant.get_by_id(tenant_id)
             except MaimDbTenant.DoesNotExist:
                 return None
 
-        tenant = await asyncio.get_event_loop().run_in_executor(None, _get)
-        return cls(tenant) if tenant else None
+        return await run_db(_get)
+
+    @classmethod
+    async def get_with_agent(cls, tenant_id, agent_id):
+        """一次左连接查询租户与Agent，返回 (租户, Agent)；Agent 按ID匹配、不要求属于该租户，租户不存在时均为None"""
+        from peewee import JOIN
+
+        query = (
+            MaimDbTenant.select(MaimDbTenant, MaimDbAgent)
+            .join(MaimDbAgent, JOIN.LEFT_OUTER, on=(MaimDbAgent.id == agent_id), attr='_joined_agent')
+            .where(MaimDbTenant.id == tenant_id)
+        )
+        if native_reads.enabled:
+            tenant = await native_reads.fetch_one(query)
+        else:
+            tenant = await run_db(lambda: query.first())
+        if tenant is None:
+            return None, None
+        # 左连接未匹配到Agent时不设置该属性
+        agent = getattr(tenant, '_joined_agent', None)
+        return cls(tenant), AsyncAgent(agent) if agent else None
 
     @classmethod
     async def get_by_name(cls, tenant_name):
@@ -145,82 +363,211 @@ class AsyncTenant:
             except MaimDbTenant.DoesNotExist:
                 return None
 
-        tenant = await asyncio.get_event_loop().run_in_executor(None, _get)
+        tenant = await run_db(_get)
         return cls(tenant) if tenant else None
 
+    @classmethod
+    async def get_many(cls, tenant_ids) -> dict:
+        """按ID批量获取租户（一次 IN 查询），返回 {id: 租户}，不存在的ID不出现在结果中"""
+        rows = await _fetch_many(MaimDbTenant, list(set(tenant_ids)))
+        return {tenant_id: cls(row) for tenant_id, row in rows.items()}
+
+    @staticmethod
+    def name_key(tenant_name):
+        """按数据库排序规则比较租户名称的键（names_taken 的结果与批内查重均使用）"""
+        return _collation_key(MaimDbTenant, tenant_name)
+
+    @classmethod
+    async def names_taken(cls, tenant_names) -> set:
+        """返回给定名称中已被占用者的 name_key（一次 IN 查询，由数据库按排序规则比较）"""
+        def _taken():
+            query = MaimDbTenant.select(MaimDbTenant.tenant_name).where(
+                MaimDbTenant.tenant_name.in_(list(set(tenant_names)))
+            )
+            return {cls.name_key(name) for (name,) in query.tuples()}
+
+        return await run_db(_taken)
+
+    @classmethod
+    async def name_exists(cls, tenant_name, exclude_id=None) -> bool:
+        """租户名称是否已被占用（唯一索引上的 EXISTS 查询）"""
+        def _exists():
+            query = MaimDbTenant.select(MaimDbTenant.id).where(MaimDbTenant.tenant_name == tenant_name)
+            if exclude_id:
+                query = query.where(MaimDbTenant.id != exclude_id)
+            return query.exists()
+
+        return await run_db(_exists)
+
     @classmethod
     async def get_all(cls, limit=None, offset=0):
         def _get_all():
-            query = MaimDbTenant.select()
+            query = MaimDbTenant.select().order_by(MaimDbTenant.created_at.desc(), MaimDbTenant.id.desc())
             if limit:
                 query = query.limit(limit).offset(offset)
             return list(query)
 
-        tenants = await asyncio.get_event_loop().run_in_executor(None, _get_all)
+        tenants = await run_db(_get_all)
         return [cls(tenant) for tenant in tenants]
 
+    @classmethod
+    async def list_page(cls, limit: int, after: str = None):
+        """按创建时间倒序游标分页，返回 (租户列表, 下一页游标)"""
+        tenants, next_cursor = await run_db(lambda: keyset_page(MaimDbTenant.select(), MaimDbTenant, limit, after))
+        return [cls(tenant) for tenant in tenants], next_cursor
+
     @classmethod
     async def count(cls):
+        """租户总数（缓存）"""
         def _count():
             return MaimDbTenant.select().count()
 
-        return await asyncio.get_event_loop().run_in_executor(None, _count)
+        return await record_counts.get(('tenants',), lambda: run_db(_count))
 
-    async def update(self, **kwargs):
-        def _update():
-            for field, value in kwargs.items():
-                if hasattr(self._tenant, field):
-                    if field == 'tenant_config' and value is not None:
-                        value = json.dumps(value)
-                    setattr(self._tenant, field, value)
-            self._tenant.save()
-            return self._tenant
+    async def update(self, expected_version=None, **kwargs):
+        """只写入变化的列；expected_version 为客户端读取时的版本号，不一致时抛出 ConcurrentUpdateError"""
+        if expected_version is not None and expected_version != self.row_version:
+            raise ConcurrentUpdateError(self.id, expected_version)
+        changes = _changed_fields(self, MaimDbTenant, kwargs)
+        if not changes:
+            return self
 
-        await asyncio.get_event_loop().run_in_executor(None, _update)
+        columns = dict(changes)
+        if columns.get('tenant_config') is not None:
+            columns['tenant_config'] = json.dumps(columns['tenant_config'])
+        # 认证记录中的租户状态按 updated_at 增量同步
+        columns['updated_at'] = datetime.utcnow()
+        await run_db(lambda: _versioned_update(MaimDbTenant, self.id, self.row_version, columns))
+        read_flights.forget(('tenant', self.id))
 
         # 更新本地属性
-        for field, value in kwargs.items():
-            if hasattr(self, field):
-                if field == 'tenant_config':
-                    value = self._parse_json(json.dumps(value)) if value else None
-                setattr(self, field, value)
+        for field, value in changes.items():
+            if field == 'tenant_config':
+                value = self._parse_json(json.dumps(value)) if value else None
+            setattr(self, field, value)
+        self.updated_at = columns['updated_at']
+        self.row_version += 1
 
         return self
 
     async def delete(self):
         def _delete():
-            self._tenant.delete_instance()
+            # 其下密钥写入删除记录，各实例的签名密钥本地校验据此吊销
+            with MaimDbTenant._meta.database.atomic():
+                record_deleted(_owned_key_ids(MaimDbApiKey.tenant_id == self.id))
+                self._tenant.delete_instance()
 
-        await asyncio.get_event_loop().run_in_executor(None, _delete)
+        await run_db(_delete)
+        read_flights.forget(('tenant', self.id))
+        record_counts.invalidate('tenants')
+        record_counts.invalidate('agents', self.id)
+        record_counts.invalidate('api_keys', self.id)
 
 
 # 简化的Agent和ApiKey类
 class AsyncAgent:
+    __slots__ = (
+        'id', 'tenant_id', 'name', 'description', 'template_id', '_raw_config', '_config',
+        'status', 'created_at', 'updated_at', 'row_version', '_agent',
+    )
+
+    config = _LazyJson()
+
     @classmethod
     async def create(cls, **kwargs):
         def _create():
-            data = {
-                'tenant_id': kwargs.get('tenant_id'),
-                'name': kwargs.get('name'),
-                'description': kwargs.get('description'),
-                'template_id': kwargs.get('template_id'),
-                'config': json.dumps(kwargs.get('config', {})),
-                'status': kwargs.get('status', 'active'),
-            }
-
-            if 'id' not in kwargs:
-                import uuid
-                data['id'] = f"agent_{uuid.uuid4().hex[:12]}"
-            else:
-                data['id'] = kwargs['id']
-
-            agent = MaimDbAgent(**data)
-            agent.save(force_insert=True)
+            agent = MaimDbAgent(**cls._row_data(kwargs))
+            try:
+                agent.save(force_insert=True)
+            except IntegrityError as e:
+                raise duplicate_error(e) or e
             return agent
 
-        agent = await asyncio.get_event_loop().run_in_executor(None, _create)
+        agent = await run_db(_create)
+        record_counts.invalidate('agents', agent.tenant_id)
         return cls(agent)
 
+    @classmethod
+    async def bulk_create(cls, records: list):
+        """在一个事务中批量创建（insert_many），记录格式同 create；违反唯一约束时整批回滚并抛出 DuplicateRecordError"""
+        def _insert():
+            try:
+                return insert_rows(MaimDbAgent, [cls._row_data(record) for record in records])
+            except IntegrityError as e:
+                raise duplicate_error(e) or e
+
+        rows = await run_db(_insert)
+        for tenant_id in {row.tenant_id for row in rows}:
+            record_counts.invalidate('agents', tenant_id)
+        return [cls(row) for row in rows]
+
+    @classmethod
+    async def bulk_create_with_setup(cls, records: list, active_ttl_seconds: int, configs: dict):
+        """批量创建并完成创建后的写入，返回 (Agent列表, {agent_id: {'active_state'|'config': 错误信息}})
+
+        与插入在同一事务中：活跃状态以 upsert_rows 批量写入，configs（{agent_id: 配置}）逐个保存。
+        每类写入在各自的保存点中执行（配置按单个Agent），失败只回滚该部分，Agent 照常创建；
+        插入违反唯一约束时整批回滚并抛出 DuplicateRecordError
+        """
+        def _create():
+            failures = {}
+            database = MaimDbAgent._meta.database
+            with database.atomic():
+                try:
+                    rows = insert_rows(MaimDbAgent, [cls._row_data(record) for record in records])
+                except IntegrityError as e:
+                    raise duplicate_error(e) or e
+                if MaimDbAgentActiveState is not None:
+                    try:
+                        with database.atomic():
+                            _upsert_active_states(rows, active_ttl_seconds)
+                    except Exception as e:
+                        for row in rows:
+                            failures.setdefault(row.id, {})['active_state'] = str(e)
+                for row in rows:
+                    if not configs.get(row.id):
+                        continue
+                    try:
+                        with database.atomic():
+                            AgentConfigManager(row.id).update_config_from_json(configs[row.id])
+                    except Exception as e:
+                        failures.setdefault(row.id, {})['config'] = str(e)
+            return rows, failures
+
+        rows, failures = await run_db(_create)
+        for tenant_id in {row.tenant_id for row in rows}:
+            record_counts.invalidate('agents', tenant_id)
+        if MaimDbAgentActiveState is None:
+            # maim_db 未提供活跃状态模型时逐个写入，并发数不超过线程池的线程数
+            db_slots = asyncio.Semaphore(db_executor.max_workers)
+
+            async def _upsert(row):
+                try:
+                    async with db_slots:
+                        await AsyncAgentActiveState.upsert(row.tenant_id, row.id, ttl_seconds=active_ttl_seconds)
+                except Exception as e:
+                    failures.setdefault(row.id, {})['active_state'] = str(e)
+
+            await asyncio.gather(*(_upsert(row) for row in rows))
+        return [cls(row) for row in rows], failures
+
+    @staticmethod
+    def _row_data(kwargs):
+        data = {
+            'tenant_id': kwargs.get('tenant_id'),
+            'name': kwargs.get('name'),
+            'description': kwargs.get('description'),
+            'template_id': kwargs.get('template_id'),
+            'config': json.dumps(kwargs.get('config', {})),
+            'status': kwargs.get('status', 'active'),
+        }
+        if 'id' not in kwargs:
+            import uuid
+            data['id'] = f"agent_{uuid.uuid4().hex[:12]}"
+        else:
+            data['id'] = kwargs['id']
+        return data
+
     def __init__(self, maim_db_agent=None):
         if maim_db_agent:
             self.id = maim_db_agent.id
@@ -228,30 +575,43 @@ class AsyncAgent:
             self.name = maim_db_agent.name
             self.description = maim_db_agent.description
             self.template_id = maim_db_agent.template_id
-            self.config = self._parse_json(maim_db_agent.config)
+            self._raw_config = maim_db_agent.config
+            self._config = _UNDECODED
             self.status = maim_db_agent.status
             self.created_at = maim_db_agent.created_at
             self.updated_at = maim_db_agent.updated_at
+            self.row_version = getattr(maim_db_agent, ROW_VERSION_FIELD, 0) or 0
             self._agent = maim_db_agent
 
-    def _parse_json(self, json_str):
+    @staticmethod
+    def _parse_json(json_str):
         if not json_str:
             return None
         try:
-            return json.loads(json_str)
+            return _json_loads(json_str)
         except:
             return None
 
     @classmethod
     async def get(cls, agent_id):
+        # 并发的相同读取共享一次查询，每个调用方各自构建包装器（包装器可变，不共享）
+        agent = await read_flights.do(('agent', agent_id), lambda: cls._fetch(agent_id))
+        return cls(agent) if agent else None
+
+    @staticmethod
+    async def _fetch(agent_id):
+        if point_loaders['agent'].enabled:
+            return await point_loaders['agent'].load(agent_id)
+        if native_reads.enabled:
+            return await native_reads.fetch_one(MaimDbAgent.select().where(MaimDbAgent.id == agent_id))
+
         def _get():
             try:
                 return MaimDbAgent.get_by_id(agent_id)
             except MaimDbAgent.DoesNotExist:
                 return None
 
-        agent = await asyncio.get_event_loop().run_in_executor(None, _get)
-        return cls(agent) if agent else None
+        return await run_db(_get)
 
     @classmethod
     async def get_by_tenant(cls, tenant_id):
@@ -259,65 +619,181 @@ class AsyncAgent:
             agents = MaimDbAgent.select().where(MaimDbAgent.tenant_id == tenant_id)
             return list(agents)
 
-        agents = await asyncio.get_event_loop().run_in_executor(None, _get_by_tenant)
+        agents = await run_db(_get_by_tenant)
         return [cls(agent) for agent in agents]
 
-    async def delete(self):
-        def _delete():
-            self._agent.delete_instance()
+    @classmethod
+    async def list(cls, tenant_id: str, status: str = None, page: int = 1, page_size: int = 20):
+        """按页码分页（深分页请使用 list_page），返回 Agent 列表"""
+        def _list():
+            query = cls._filtered(tenant_id, status)
+            query = query.order_by(MaimDbAgent.created_at.desc(), MaimDbAgent.id.desc())
+            return list(query.offset((page - 1) * page_size).limit(page_size))
+
+        agents = await run_db(_list)
+        return [cls(agent) for agent in agents]
+
+    @classmethod
+    async def list_page(cls, tenant_id: str, status: str = None, limit: int = 20, after: str = None):
+        """按创建时间倒序游标分页，返回 (Agent列表, 下一页游标)"""
+        agents, next_cursor = await run_db(
+            lambda: keyset_page(cls._filtered(tenant_id, status), MaimDbAgent, limit, after)
+        )
+        return [cls(agent) for agent in agents], next_cursor
+
+    @classmethod
+    async def count(cls, tenant_id: str, status: str = None) -> int:
+        """租户下的 Agent 数（缓存）"""
+        return await record_counts.get(
+            ('agents', tenant_id, status),
+            lambda: run_db(lambda: cls._filtered(tenant_id, status).count()),
+        )
+
+    @staticmethod
+    def _filtered(tenant_id: str, status: str = None):
+        query = MaimDbAgent.select().where(MaimDbAgent.tenant_id == tenant_id)
+        if status:
+            query = query.where(MaimDbAgent.status == status)
+        return query
 
-        await asyncio.get_event_loop().run_in_executor(None, _delete)
+    @classmethod
+    async def get_many(cls, agent_ids) -> dict:
+        """按ID批量获取Agent（一次 IN 查询），返回 {id: Agent}，不存在的ID不出现在结果中"""
+        rows = await _fetch_many(MaimDbAgent, list(set(agent_ids)))
+        return {agent_id: cls(row) for agent_id, row in rows.items()}
+
+    @staticmethod
+    def name_key(tenant_id, name):
+        """按数据库排序规则比较 (tenant_id, name) 的键（names_taken 的结果与批内查重均使用）"""
+        return _collation_key(MaimDbAgent, tenant_id), _collation_key(MaimDbAgent, name)
+
+    @classmethod
+    async def names_taken(cls, pairs) -> set:
+        """pairs 为 (tenant_id, name)，返回其中在租户内已被占用者的 name_key（一次查询）
+
+        IN 条件由数据库按排序规则比较，查出的行再按 name_key 与请求的组合配对
+        """
+        keys = {cls.name_key(tenant_id, name) for tenant_id, name in pairs}
 
-    async def update(self, **kwargs):
-        def _update():
-            for field, value in kwargs.items():
-                if hasattr(self._agent, field):
-                    if field == 'config' and value is not None:
-                        value = json.dumps(value)
-                    setattr(self._agent, field, value)
-            self._agent.save()
-            return self._agent
+        def _taken():
+            query = MaimDbAgent.select(MaimDbAgent.tenant_id, MaimDbAgent.name).where(
+                (MaimDbAgent.tenant_id.in_(list({tenant_id for tenant_id, _ in pairs})))
+                & (MaimDbAgent.name.in_(list({name for _, name in pairs})))
+            )
+            return {cls.name_key(tenant_id, name) for tenant_id, name in query.tuples()} & keys
 
-        await asyncio.get_event_loop().run_in_executor(None, _update)
+        return await run_db(_taken)
+
+    @classmethod
+    async def name_exists(cls, tenant_id, name, exclude_id=None) -> bool:
+        """Agent名称在租户下是否已被占用（唯一索引上的 EXISTS 查询）"""
+        def _exists():
+            query = MaimDbAgent.select(MaimDbAgent.id).where(
+                (MaimDbAgent.tenant_id == tenant_id) & (MaimDbAgent.name == name)
+            )
+            if exclude_id:
+                query = query.where(MaimDbAgent.id != exclude_id)
+            return query.exists()
+
+        return await run_db(_exists)
+
+    async def delete(self):
+        def _delete():
+            with MaimDbAgent._meta.database.atomic():
+                record_deleted(_owned_key_ids(MaimDbApiKey.agent_id == self.id))
+                self._agent.delete_instance()
+
+        await run_db(_delete)
+        read_flights.forget(('agent', self.id))
+        record_counts.invalidate('agents', self.tenant_id)
+        record_counts.invalidate('api_keys', self.tenant_id)
+
+    async def update(self, expected_version=None, **kwargs):
+        """只写入变化的列；expected_version 为客户端读取时的版本号，不一致时抛出 ConcurrentUpdateError"""
+        if expected_version is not None and expected_version != self.row_version:
+            raise ConcurrentUpdateError(self.id, expected_version)
+        changes = _changed_fields(self, MaimDbAgent, kwargs)
+        if not changes:
+            return self
+
+        columns = dict(changes)
+        if columns.get('config') is not None:
+            columns['config'] = json.dumps(columns['config'])
+        # 认证记录中的Agent状态按 updated_at 增量同步
+        columns['updated_at'] = datetime.utcnow()
+        await run_db(lambda: _versioned_update(MaimDbAgent, self.id, self.row_version, columns))
+        read_flights.forget(('agent', self.id))
+        if 'status' in changes:
+            record_counts.invalidate('agents', self.tenant_id)
 
         # Update local attributes
-        for field, value in kwargs.items():
-            if hasattr(self, field):
-                if field == 'config':
-                    value = self._parse_json(json.dumps(value)) if value else {}
-                setattr(self, field, value)
+        for field, value in changes.items():
+            if field == 'config':
+                value = self._parse_json(json.dumps(value)) if value else {}
+            setattr(self, field, value)
+        self.updated_at = columns['updated_at']
+        self.row_version += 1
 
         return self
 
 
 class AsyncApiKey:
+    __slots__ = (
+        'id', 'tenant_id', 'agent_id', 'name', 'description', 'api_key', '_raw_permissions',
+        '_permissions', 'status', 'expires_at', 'last_used_at', 'usage_count', 'created_at',
+        'updated_at', 'row_version', 'tenant_status', 'agent_status', '_api_key',
+    )
+
+    permissions = _LazyJson()
+
     @classmethod
     async def create(cls, **kwargs):
         def _create():
-            data = {
-                'tenant_id': kwargs.get('tenant_id'),
-                'agent_id': kwargs.get('agent_id'),
-                'name': kwargs.get('name'),
-                'description': kwargs.get('description'),
-                'api_key': kwargs.get('api_key'),
-                'permissions': json.dumps(kwargs.get('permissions', [])),
-                'status': kwargs.get('status', 'active'),
-                'expires_at': kwargs.get('expires_at'),
-            }
-
-            if 'id' not in kwargs:
-                import uuid
-                data['id'] = f"key_{uuid.uuid4().hex[:12]}"
-            else:
-                data['id'] = kwargs['id']
-
-            api_key = MaimDbApiKey(**data)
-            api_key.save(force_insert=True)
+            api_key = MaimDbApiKey(**cls._row_data(kwargs))
+            try:
+                api_key.save(force_insert=True)
+            except IntegrityError as e:
+                raise duplicate_error(e) or e
             return api_key
 
-        api_key = await asyncio.get_event_loop().run_in_executor(None, _create)
+        api_key = await run_db(_create)
+        record_counts.invalidate('api_keys', api_key.tenant_id)
         return cls(api_key)
 
+    @classmethod
+    async def bulk_create(cls, records: list):
+        """在一个事务中批量创建（insert_many），记录格式同 create；违反唯一约束时整批回滚并抛出 DuplicateRecordError"""
+        def _insert():
+            try:
+                return insert_rows(MaimDbApiKey, [cls._row_data(record) for record in records])
+            except IntegrityError as e:
+                raise duplicate_error(e) or e
+
+        rows = await run_db(_insert)
+        for tenant_id in {row.tenant_id for row in rows}:
+            record_counts.invalidate('api_keys', tenant_id)
+        return [cls(row) for row in rows]
+
+    @staticmethod
+    def _row_data(kwargs):
+        data = {
+            'tenant_id': kwargs.get('tenant_id'),
+            'agent_id': kwargs.get('agent_id'),
+            'name': kwargs.get('name'),
+            'description': kwargs.get('description'),
+            'api_key': kwargs.get('api_key'),
+            'key_digest': compute_key_digest(kwargs.get('api_key')),
+            'permissions': json.dumps(kwargs.get('permissions', [])),
+            'status': kwargs.get('status', 'active'),
+            'expires_at': kwargs.get('expires_at'),
+        }
+        if 'id' not in kwargs:
+            import uuid
+            data['id'] = f"key_{uuid.uuid4().hex[:12]}"
+        else:
+            data['id'] = kwargs['id']
+        return data
+
     def __init__(self, maim_db_api_key=None):
         if maim_db_api_key:
             self.id = maim_db_api_key.id
@@ -326,34 +802,73 @@ class AsyncApiKey:
             self.name = maim_db_api_key.name
             self.description = maim_db_api_key.description
             self.api_key = maim_db_api_key.api_key
-            self.permissions = self._parse_json(maim_db_api_key.permissions)
+            self._raw_permissions = maim_db_api_key.permissions
+            self._permissions = _UNDECODED
             self.status = maim_db_api_key.status
             self.expires_at = maim_db_api_key.expires_at
             self.last_used_at = maim_db_api_key.last_used_at
             self.usage_count = maim_db_api_key.usage_count
             self.created_at = maim_db_api_key.created_at
             self.updated_at = maim_db_api_key.updated_at
+            self.row_version = getattr(maim_db_api_key, ROW_VERSION_FIELD, 0) or 0
+            # 仅在连接查询租户/Agent时存在，租户或Agent已删除时为None
+            self.tenant_status = getattr(maim_db_api_key, 'tenant_status', None)
+            self.agent_status = getattr(maim_db_api_key, 'agent_status', None)
             self._api_key = maim_db_api_key
 
-    def _parse_json(self, json_str):
+    @staticmethod
+    def _join_owners(query):
+        """左连接租户与Agent，在同一查询中读取所属租户/Agent的状态"""
+        from peewee import JOIN
+
+        return (
+            query.join(MaimDbTenant, JOIN.LEFT_OUTER, on=(MaimDbTenant.id == MaimDbApiKey.tenant_id))
+            .switch(MaimDbApiKey)
+            .join(MaimDbAgent, JOIN.LEFT_OUTER, on=(MaimDbAgent.id == MaimDbApiKey.agent_id))
+            .switch(MaimDbApiKey)
+        )
+
+    @classmethod
+    def _select_with_owners(cls):
+        """查询完整的密钥行，并附带 tenant_status / agent_status"""
+        return cls._join_owners(
+            MaimDbApiKey.select(
+                MaimDbApiKey,
+                MaimDbTenant.status.alias('tenant_status'),
+                MaimDbAgent.status.alias('agent_status'),
+            )
+        )
+
+    @staticmethod
+    def _parse_json(json_str):
         if not json_str:
             return []
         try:
-            result = json.loads(json_str)
+            result = _json_loads(json_str)
             return result if isinstance(result, list) else [str(result)]
         except:
             return []
 
     @classmethod
     async def get(cls, api_key_id):
+        # 并发的相同读取共享一次查询，每个调用方各自构建包装器（包装器可变，不共享）
+        api_key = await read_flights.do(('api_key', api_key_id), lambda: cls._fetch(api_key_id))
+        return cls(api_key) if api_key else None
+
+    @staticmethod
+    async def _fetch(api_key_id):
+        if point_loaders['api_key'].enabled:
+            return await point_loaders['api_key'].load(api_key_id)
+        if native_reads.enabled:
+            return await native_reads.fetch_one(MaimDbApiKey.select().where(MaimDbApiKey.id == api_key_id))
+
         def _get():
             try:
                 return MaimDbApiKey.get_by_id(api_key_id)
             except MaimDbApiKey.DoesNotExist:
                 return None
 
-        api_key = await asyncio.get_event_loop().run_in_executor(None, _get)
-        return cls(api_key) if api_key else None
+        return await run_db(_get)
 
     @classmethod
     async def get_by_tenant_and_name(cls, tenant_id: str, name: str):
@@ -365,74 +880,418 @@ class AsyncApiKey:
             except MaimDbApiKey.DoesNotExist:
                 return None
         
-        api_key = await asyncio.get_event_loop().run_in_executor(None, _get)
+        api_key = await run_db(_get)
         return cls(api_key) if api_key else None
 
+    @staticmethod
+    def name_key(tenant_id, name):
+        """按数据库排序规则比较 (tenant_id, name) 的键（names_taken 的结果与批内查重均使用）"""
+        return _collation_key(MaimDbApiKey, tenant_id), _collation_key(MaimDbApiKey, name)
+
+    @classmethod
+    async def names_taken(cls, pairs) -> set:
+        """pairs 为 (tenant_id, name)，返回其中在租户内已被占用者的 name_key（一次查询）
+
+        IN 条件由数据库按排序规则比较，查出的行再按 name_key 与请求的组合配对
+        """
+        keys = {cls.name_key(tenant_id, name) for tenant_id, name in pairs}
+
+        def _taken():
+            query = MaimDbApiKey.select(MaimDbApiKey.tenant_id, MaimDbApiKey.name).where(
+                (MaimDbApiKey.tenant_id.in_(list({tenant_id for tenant_id, _ in pairs})))
+                & (MaimDbApiKey.name.in_(list({name for _, name in pairs})))
+            )
+            return {cls.name_key(tenant_id, name) for tenant_id, name in query.tuples()} & keys
+
+        return await run_db(_taken)
+
+    @classmethod
+    async def name_exists(cls, tenant_id: str, name: str, exclude_id: str = None) -> bool:
+        """API密钥名称在租户内是否已被占用（唯一索引上的 EXISTS 查询）"""
+        def _exists():
+            query = MaimDbApiKey.select(MaimDbApiKey.id).where(
+                (MaimDbApiKey.tenant_id == tenant_id) & (MaimDbApiKey.name == name)
+            )
+            if exclude_id:
+                query = query.where(MaimDbApiKey.id != exclude_id)
+            return query.exists()
+
+        return await run_db(_exists)
+
     @classmethod
     async def list(cls, tenant_id: str, agent_id: str = None, status: str = None, page: int = 1, page_size: int = 20):
+        """按页码分页（深分页请使用 list_page），返回 (密钥列表, 总数)"""
         def _list():
-            query = MaimDbApiKey.select().where(MaimDbApiKey.tenant_id == tenant_id)
-            if agent_id:
-                query = query.where(MaimDbApiKey.agent_id == agent_id)
-            if status:
-                query = query.where(MaimDbApiKey.status == status)
-            
-            # Count total
-            total = query.count()
-            
-            # Pagination
-            query = query.order_by(MaimDbApiKey.created_at.desc())
+            query = cls._filtered(tenant_id, agent_id, status)
+            query = query.order_by(MaimDbApiKey.created_at.desc(), MaimDbApiKey.id.desc())
             query = query.offset((page - 1) * page_size).limit(page_size)
-            
-            return list(query), total
+            return list(query)
 
-        result = await asyncio.get_event_loop().run_in_executor(None, _list)
-        keys, total = result
+        keys = await run_db(_list)
+        total = await cls.count(tenant_id, agent_id, status)
         return [cls(k) for k in keys], total
 
-    async def update(self, **kwargs):
-        def _update():
-            for field, value in kwargs.items():
-                if hasattr(self._api_key, field):
-                    if field == 'permissions' and value is not None:
-                        value = json.dumps(value)
-                    setattr(self._api_key, field, value)
-            self._api_key.save()
-            return self._api_key
+    @classmethod
+    async def list_page(cls, tenant_id: str, agent_id: str = None, status: str = None, limit: int = 20, after: str = None):
+        """按创建时间倒序游标分页，返回 (密钥列表, 下一页游标)"""
+        keys, next_cursor = await run_db(
+            lambda: keyset_page(cls._filtered(tenant_id, agent_id, status), MaimDbApiKey, limit, after)
+        )
+        return [cls(k) for k in keys], next_cursor
 
-        await asyncio.get_event_loop().run_in_executor(None, _update)
+    @classmethod
+    async def count(cls, tenant_id: str, agent_id: str = None, status: str = None) -> int:
+        """租户下的密钥数（缓存）"""
+        return await record_counts.get(
+            ('api_keys', tenant_id, agent_id, status),
+            lambda: run_db(lambda: cls._filtered(tenant_id, agent_id, status).count()),
+        )
+
+    @staticmethod
+    def _filtered(tenant_id: str, agent_id: str = None, status: str = None):
+        query = MaimDbApiKey.select().where(MaimDbApiKey.tenant_id == tenant_id)
+        if agent_id:
+            query = query.where(MaimDbApiKey.agent_id == agent_id)
+        if status:
+            query = query.where(MaimDbApiKey.status == status)
+        return query
+
+    async def update(self, expected_version=None, **kwargs):
+        """只写入变化的列；expected_version 为客户端读取时的版本号，不一致时抛出 ConcurrentUpdateError"""
+        if expected_version is not None and expected_version != self.row_version:
+            raise ConcurrentUpdateError(self.id, expected_version)
+        changes = _changed_fields(self, MaimDbApiKey, kwargs)
+        if not changes:
+            return self
+
+        columns = dict(changes)
+        if columns.get('permissions') is not None:
+            columns['permissions'] = json.dumps(columns['permissions'])
+        # 签名密钥本地校验按 updated_at 增量同步
+        columns['updated_at'] = datetime.utcnow()
+        await run_db(lambda: _versioned_update(MaimDbApiKey, self.id, self.row_version, columns))
+        read_flights.forget(('api_key', self.id))
+        if 'status' in changes:
+            record_counts.invalidate('api_keys', self.tenant_id)
 
         # Update local attributes
-        for field, value in kwargs.items():
-            if hasattr(self, field):
-                if field == 'permissions':
-                    value = self._parse_json(json.dumps(value)) if value else []
-                setattr(self, field, value)
+        for field, value in changes.items():
+            if field == 'permissions':
+                value = self._parse_json(json.dumps(value)) if value else []
+            setattr(self, field, value)
+        self.updated_at = columns['updated_at']
+        self.row_version += 1
 
         return self
 
     @classmethod
     async def get_by_key_value(cls, api_key: str, tenant_id: str = None, agent_id: str = None):
-        def _get():
-            try:
-                query = (MaimDbApiKey.api_key == api_key)
-                if tenant_id:
-                    query &= (MaimDbApiKey.tenant_id == tenant_id)
-                if agent_id:
-                    query &= (MaimDbApiKey.agent_id == agent_id)
-                
-                return MaimDbApiKey.get(query)
-            except MaimDbApiKey.DoesNotExist:
-                return None
-        
-        api_key_obj = await asyncio.get_event_loop().run_in_executor(None, _get)
+        # 通过摘要唯一索引定位，再比对明文排除摘要碰撞
+        condition = (MaimDbApiKey.api_key == api_key)
+        if tenant_id:
+            condition &= (MaimDbApiKey.tenant_id == tenant_id)
+        if agent_id:
+            condition &= (MaimDbApiKey.agent_id == agent_id)
+        by_digest = condition & (MaimDbApiKey.key_digest == compute_key_digest(api_key))
+
+        if native_reads.enabled:
+            api_key_obj = await native_reads.fetch_one(cls._select_with_owners().where(by_digest).objects())
+        else:
+            def _get():
+                try:
+                    return cls._select_with_owners().where(by_digest).objects().get()
+                except MaimDbApiKey.DoesNotExist:
+                    return None
+
+            api_key_obj = await run_db(_get)
+
+        if api_key_obj is None:
+            # 其他写入方插入的行尚无摘要：按明文回退查询一次并回填
+            rows = await cls._get_undigested(condition)
+            api_key_obj = rows[0] if rows else None
         return cls(api_key_obj) if api_key_obj else None
 
+    @classmethod
+    async def get_by_key_values(cls, api_keys: list):
+        """通过单条 IN 查询批量获取API密钥，返回 {密钥值: AsyncApiKey}"""
+        values = list(dict.fromkeys(api_keys))
+        if not values:
+            return {}
+
+        def _get():
+            digests = [compute_key_digest(value) for value in values]
+            return list(cls._select_with_owners().where(MaimDbApiKey.key_digest.in_(digests)).objects())
+
+        rows = await run_db(_get)
+        wanted = set(values)
+        found = {row.api_key: cls(row) for row in rows if row.api_key in wanted}
+        missing = [value for value in values if value not in found]
+        if missing:
+            for row in await cls._get_undigested(MaimDbApiKey.api_key.in_(missing)):
+                found[row.api_key] = cls(row)
+        return found
+
+    @classmethod
+    async def _get_undigested(cls, condition):
+        """查询摘要为空且满足条件的密钥，命中的行立即回填摘要"""
+        def _get():
+            rows = list(
+                cls._select_with_owners()
+                .where(condition & MaimDbApiKey.key_digest.is_null())
+                .objects()
+            )
+            for row in rows:
+                try:
+                    MaimDbApiKey.update(key_digest=compute_key_digest(row.api_key)).where(
+                        (MaimDbApiKey.id == row.id) & MaimDbApiKey.key_digest.is_null()
+                    ).execute()
+                except IntegrityError:
+                    # 摘要碰撞：保持为空，之后仍按明文回退查询
+                    pass
+            return rows
+
+        return await run_db(_get)
+
+    @classmethod
+    async def backfill_key_digests(cls) -> int:
+        """回填摘要为空的密钥，返回回填行数"""
+        from .key_digest import backfill_key_digests
+
+        return await run_db(lambda: backfill_key_digests(MaimDbApiKey))
+
+    @classmethod
+    async def list_key_values(cls, created_after: datetime = None):
+        """只查询密钥值与创建时间列，可按创建时间增量获取，返回 [(api_key, created_at)]"""
+        def _list():
+            query = MaimDbApiKey.select(MaimDbApiKey.api_key, MaimDbApiKey.created_at)
+            if created_after:
+                query = query.where(MaimDbApiKey.created_at >= created_after)
+            return list(query.tuples())
+
+        return await run_db(_list)
+
+    @classmethod
+    async def list_key_states(cls, key_prefix: str = None, updated_after: datetime = None):
+        """查询密钥的认证状态列，返回 [(id, api_key, status, expires_at, permissions, tenant_status, agent_status)]
+
+        updated_after 同时匹配密钥本身或其所属租户/Agent的更新时间：分为三条各自走 updated_at 索引的查询
+        （变更的密钥、变更租户下的密钥、变更Agent下的密钥），按密钥ID合并，避免 OR 条件导致的联表全扫描
+        """
+        def _query():
+            query = cls._join_owners(
+                MaimDbApiKey.select(
+                    MaimDbApiKey.id,
+                    MaimDbApiKey.api_key,
+                    MaimDbApiKey.status,
+                    MaimDbApiKey.expires_at,
+                    MaimDbApiKey.permissions,
+                    MaimDbTenant.status,
+                    MaimDbAgent.status,
+                )
+            )
+            if key_prefix:
+                query = query.where(MaimDbApiKey.api_key.startswith(key_prefix))
+            return query
+
+        def _list():
+            if not updated_after:
+                return list(_query().tuples())
+            rows = {}
+            for changed in (MaimDbApiKey.updated_at, MaimDbTenant.updated_at, MaimDbAgent.updated_at):
+                for row in _query().where(changed >= updated_after).tuples():
+                    rows[row[0]] = row
+            return list(rows.values())
+
+        rows = await run_db(_list)
+        return [
+            (api_key_id, api_key, status, expires_at, cls._parse_json(permissions), tenant_status, agent_status)
+            for api_key_id, api_key, status, expires_at, permissions, tenant_status, agent_status in rows
+        ]
+
+    @classmethod
+    async def list_ids_by_owner(cls, tenant_id: str = None, agent_id: str = None):
+        """查询租户或Agent下全部密钥的ID"""
+        def _list():
+            query = MaimDbApiKey.select(MaimDbApiKey.id)
+            if tenant_id:
+                query = query.where(MaimDbApiKey.tenant_id == tenant_id)
+            if agent_id:
+                query = query.where(MaimDbApiKey.agent_id == agent_id)
+            return [row[0] for row in query.tuples()]
+
+        return await run_db(_list)
+
+    @classmethod
+    async def list_auth_rows(cls):
+        """查询全部active密钥的认证列
+
+        返回 [(id, key_digest, tenant_id, agent_id, status, expires_at, tenant_status, agent_status, permissions)]
+        """
+        def _list():
+            query = (
+                cls._join_owners(
+                    MaimDbApiKey.select(
+                        MaimDbApiKey.id,
+                        MaimDbApiKey.key_digest,
+                        MaimDbApiKey.tenant_id,
+                        MaimDbApiKey.agent_id,
+                        MaimDbApiKey.status,
+                        MaimDbApiKey.expires_at,
+                        MaimDbTenant.status,
+                        MaimDbAgent.status,
+                        MaimDbApiKey.permissions,
+                    )
+                )
+                .where(
+                    (MaimDbApiKey.status == LocalApiKeyStatus.ACTIVE.value)
+                    & (MaimDbApiKey.key_digest.is_null(False))
+                )
+            )
+            return list(query.tuples())
+
+        rows = await run_db(_list)
+        return [row[:8] + (cls._parse_json(row[8]),) for row in rows]
+
+    @classmethod
+    async def deleted_ids(cls, deleted_after: datetime):
+        """返回在指定时间之后经本服务删除的密钥ID（按删除记录的时间索引读取）"""
+        return await run_db(lambda: deleted_since(deleted_after))
+
+    @classmethod
+    async def prune_deleted(cls) -> int:
+        """清理超过保留期的删除记录"""
+        return await run_db(prune_tombstones)
+
+    @classmethod
+    async def existing_ids(cls, api_key_ids: list, chunk_size: int = 1000):
+        """返回仍存在的API密钥ID集合"""
+        def _existing():
+            existing = set()
+            for i in range(0, len(api_key_ids), chunk_size):
+                chunk = api_key_ids[i:i + chunk_size]
+                query = MaimDbApiKey.select(MaimDbApiKey.id).where(MaimDbApiKey.id.in_(chunk))
+                existing.update(row[0] for row in query.tuples())
+            return existing
+
+        return await run_db(_existing)
+
+    @classmethod
+    async def bulk_record_usage(cls, usage: dict):
+        """批量累加使用统计
+
+        usage: {api_key_id: (increment, last_used_at)}
+        以单条 UPDATE 原子地执行 usage_count = usage_count + n，
+        last_used_at 仅在新时间更晚时覆盖
+        """
+        if not usage:
+            return 0
+
+        def _record():
+            from peewee import Case
+
+            items = list(usage.items())
+            increment = Case(MaimDbApiKey.id, [(key_id, n) for key_id, (n, _) in items], 0)
+            used_at = Case(MaimDbApiKey.id, [(key_id, ts) for key_id, (_, ts) in items])
+            last_used_at = Case(
+                None,
+                [((MaimDbApiKey.last_used_at.is_null()) | (MaimDbApiKey.last_used_at < used_at), used_at)],
+                MaimDbApiKey.last_used_at,
+            )
+            return (
+                MaimDbApiKey.update(
+                    usage_count=MaimDbApiKey.usage_count + increment,
+                    last_used_at=last_used_at,
+                )
+                .where(MaimDbApiKey.id.in_([key_id for key_id, _ in items]))
+                .execute()
+            )
+
+        return await run_db(_record)
+
+    @classmethod
+    async def mark_expired(cls, api_key_ids: list, expired_before: datetime = None):
+        """将仍为active的API密钥批量标记为已过期，可限定过期时间不晚于 expired_before"""
+        if not api_key_ids:
+            return 0
+
+        def _mark():
+            version = getattr(MaimDbApiKey, ROW_VERSION_FIELD)
+            query = (
+                MaimDbApiKey.update({
+                    MaimDbApiKey.status: LocalApiKeyStatus.EXPIRED.value,
+                    MaimDbApiKey.updated_at: datetime.utcnow(),
+                    version: version + 1,
+                })
+                .where(
+                    (MaimDbApiKey.id.in_(list(api_key_ids)))
+                    & (MaimDbApiKey.status == LocalApiKeyStatus.ACTIVE.value)
+                )
+            )
+            if expired_before:
+                query = query.where(MaimDbApiKey.expires_at <= expired_before)
+            return query.execute()
+
+        updated = await run_db(_mark)
+        if updated:
+            for api_key_id in api_key_ids:
+                read_flights.forget(('api_key', api_key_id))
+            record_counts.invalidate('api_keys')
+        return updated
+
+    @classmethod
+    async def list_expiring(cls, before: datetime):
+        """查询过期时间早于 before 的活跃密钥，返回 [(id, expires_at)]"""
+        def _list():
+            query = (
+                MaimDbApiKey.select(MaimDbApiKey.id, MaimDbApiKey.expires_at)
+                .where(
+                    (MaimDbApiKey.status == LocalApiKeyStatus.ACTIVE.value)
+                    & (MaimDbApiKey.expires_at.is_null(False))
+                    & (MaimDbApiKey.expires_at <= before)
+                )
+            )
+            return list(query.tuples())
+
+        return await run_db(_list)
+
     async def delete(self):
         def _delete():
-            self._api_key.delete_instance()
+            with MaimDbApiKey._meta.database.atomic():
+                record_deleted([self.id])
+                self._api_key.delete_instance()
+
+        await run_db(_delete)
+        read_flights.forget(('api_key', self.id))
+        record_counts.invalidate('api_keys', self.tenant_id)
+
 
-        await asyncio.get_event_loop().run_in_executor(None, _delete)
+def install_database_pool() -> bool:
+    """将 maim_db 模型改绑到连接池数据库（仅 MySQL / PostgreSQL）"""
+    if not MAIM_DB_AVAILABLE:
+        return False
+    return db_pool.install([MaimDbTenant, MaimDbAgent, MaimDbApiKey, ApiKeyTombstone])
+
+
+async def start_native_reads() -> bool:
+    """为热点读取创建 aiomysql 连接池（仅 MySQL）"""
+    if not MAIM_DB_AVAILABLE:
+        return False
+    return await native_reads.start(MaimDbApiKey._meta.database)
+
+
+async def list_active_agent_states(tenant_id: str = None):
+    """查询仍活跃的租户-Agent 对，启用原生连接池时不经过线程池"""
+    if native_reads.enabled and MaimDbAgentActiveState is not None:
+        # 与 AsyncAgentActiveState.list_active 相同的条件：过期时间晚于当前时间
+        query = MaimDbAgentActiveState.select().where(MaimDbAgentActiveState.expires_at > datetime.utcnow())
+        if tenant_id:
+            query = query.where(MaimDbAgentActiveState.tenant_id == tenant_id)
+        return await native_reads.fetch_all(query)
+
+    records = await AsyncAgentActiveState.list_active()
+    if tenant_id:
+        records = [r for r in records if r.tenant_id == tenant_id]
+    return records
 
 
 # 导出本地枚举（用于Pydantic）
@@ -443,16 +1302,34 @@ ApiKeyStatus = LocalApiKeyStatus
 
 
 # 导出maim_db的异步模型和函数
+async def load_agent_configs(agent_id: str) -> dict:
+    """读取Agent的完整配置（敏感字段脱敏）；并发的相同读取合并为一次，返回的字典由合并的调用方共享，只读使用"""
+    return await read_flights.do(
+        ('agent_config', agent_id),
+        lambda: run_db(lambda: AgentConfigManager(agent_id).get_all_configs(mask_secrets=True)),
+    )
+
+
+def forget_agent_configs(agent_id: str) -> None:
+    """Agent配置写入后调用，之后的读取不再加入写入前发起的查询"""
+    read_flights.forget(('agent_config', agent_id))
+
+
 __all__ = [
     'AsyncTenant',
     'AsyncAgent',
     'AsyncApiKey', 
     'AsyncAgentActiveState',
+    'start_native_reads',
+    'list_active_agent_states',
+    'load_agent_configs',
+    'forget_agent_configs',
     'TenantType', 
     'TenantStatus', 
     'AgentStatus', 
     'ApiKeyStatus',
     'init_database',
+    'install_database_pool',
     'close_database', 
     'get_database', 
     'get_db'
@@ -0,0 +1,97 @@
+"""
+唯一约束
+租户名称、同一租户下的Agent名称与API密钥名称由数据库唯一索引保证不重复。
+maim_db 的模型未声明这些索引，这里在启动时补齐；存量数据已有重复时跳过该索引并记录警告。
+写入违反唯一约束时，数据库的 IntegrityError 被映射为 DuplicateRecordError，由路由返回各自的重复错误码。
+"""
+
+import re
+from typing import Dict, List, Optional
+
+from src.common.logger import get_logger
+
+logger = get_logger(__name__)
+
+# 约束名 -> (模型, 列)
+UNIQUE_CONSTRAINTS = {
+    "tenant_name": ("tenant", ("tenant_name",)),
+    "agent_name": ("agent", ("tenant_id", "name")),
+    "api_key_name": ("api_key", ("tenant_id", "name")),
+}
+
+# 以下映射在启动时填充，用于从数据库错误信息识别约束
+# 约束名 -> 表名（SQLite 的错误信息按 表.列 给出）
+_table_names: Dict[str, str] = {}
+# 数据库中实际生效的索引名 -> 约束名（MySQL / PostgreSQL 的错误信息给出索引名）
+_index_names: Dict[str, str] = {}
+
+
+class DuplicateRecordError(Exception):
+    """写入违反唯一约束"""
+
+    def __init__(self, constraint: str, message: str = ""):
+        super().__init__(message or f"违反唯一约束: {constraint}")
+        self.constraint = constraint
+
+
+def ensure_unique_indexes(models: Dict[str, object]) -> List[str]:
+    """确保各唯一约束存在对应的唯一索引，返回本次新建的约束名；models 形如 {"tenant": 模型, ...}"""
+    from peewee import SQL, fn
+    from playhouse.migrate import SchemaMigrator, migrate
+
+    created = []
+    for constraint, (model_name, columns) in UNIQUE_CONSTRAINTS.items():
+        model = models[model_name]
+        database = model._meta.database
+        table_name = model._meta.table_name
+        _table_names[constraint] = table_name
+        if not database.table_exists(table_name):
+            continue
+
+        existing = next(
+            (
+                index.name
+                for index in database.get_indexes(table_name)
+                if index.unique and tuple(index.columns) == columns
+            ),
+            None,
+        )
+        if existing:
+            _index_names[existing] = constraint
+            continue
+
+        fields = [getattr(model, column) for column in columns]
+        duplicate = (
+            model.select(*fields)
+            .group_by(*fields)
+            .having(fn.COUNT(SQL("*")) > 1)
+            .tuples()
+            .first()
+        )
+        if duplicate:
+            logger.warning(f"{table_name}{columns} 存在重复数据 {duplicate}，跳过唯一索引，仅依赖写入前检查")
+            continue
+
+        migrate(SchemaMigrator.from_database(database).add_index(table_name, columns, unique=True))
+        index_name = next(
+            index.name
+            for index in database.get_indexes(table_name)
+            if index.unique and tuple(index.columns) == columns
+        )
+        _index_names[index_name] = constraint
+        created.append(constraint)
+    return created
+
+
+def duplicate_error(exc: Exception) -> Optional[DuplicateRecordError]:
+    """将唯一约束冲突的 IntegrityError 映射为 DuplicateRecordError，其他错误返回None"""
+    message = str(exc)
+    for index_name, constraint in _index_names.items():
+        if re.search(rf"\b{re.escape(index_name)}\b", message):
+            return DuplicateRecordError(constraint, message)
+    # SQLite: "UNIQUE constraint failed: agents.tenant_id, agents.name"
+    for constraint, table_name in _table_names.items():
+        columns = UNIQUE_CONSTRAINTS[constraint][1]
+        if ", ".join(f"{table_name}.{column}" for column in columns) in message:
+            return DuplicateRecordError(constraint, message)
+    return None
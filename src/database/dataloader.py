@@ -0,0 +1,92 @@
+"""
+主键查询微批（dataloader）
+不同请求对不同ID的点查询在一个很短的时间窗口内收集起来，合并为一次 WHERE id IN (...) 查询，
+再按ID分别完成各自的 future。窗口从一批中的第一个查询开始计时，达到批量上限时立即发出。
+以窗口时长换取数据库查询次数：单个请求的延迟最多增加一个窗口，高并发下每秒的查询数按批量大小成倍下降。
+默认关闭（DATALOADER_ENABLED），按ID获取租户/Agent/API密钥时使用；并发的相同ID已由 single-flight 先行合并。
+结果按 normalize 后的键分发，与数据库比较主键的规则一致（如 MySQL 不区分大小写）；批量查询失败或被取消时，
+同批次的调用方都会收到异常，不会一直等待。
+"""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Set
+
+
+class BatchLoader:
+    """在时间窗口内收集点查询，批量加载后按键分发结果"""
+
+    def __init__(
+        self,
+        load_many: Callable[[List[Hashable]], Awaitable[Dict[Hashable, Any]]],
+        enabled: bool = False,
+        window_seconds: float = 0.002,
+        max_batch: int = 100,
+        normalize: Optional[Callable[[Hashable], Hashable]] = None,
+    ):
+        self.load_many = load_many
+        self.normalize = normalize
+        self.enabled = enabled
+        self.window_seconds = window_seconds
+        self.max_batch = max_batch
+        self._pending: Dict[Hashable, asyncio.Future] = {}
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks: Set[asyncio.Task] = set()
+        self.loads = 0
+        self.batches = 0
+
+    async def load(self, key: Hashable) -> Optional[Any]:
+        """加载单个键，不存在时返回None"""
+        self.loads += 1
+        future = self._pending.get(key)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = self._pending[key] = loop.create_future()
+            if len(self._pending) >= self.max_batch:
+                self._dispatch()
+            elif self._timer is None:
+                self._timer = loop.call_later(self.window_seconds, self._dispatch)
+        # 单个调用方被取消不影响同批次的其他调用方
+        return await asyncio.shield(future)
+
+    def _dispatch(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, {}
+        if not batch:
+            return
+        task = asyncio.ensure_future(self._resolve(batch))
+        # 保留引用，避免任务在完成前被回收
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _resolve(self, batch: Dict[Hashable, asyncio.Future]) -> None:
+        self.batches += 1
+        try:
+            rows = await self.load_many(list(batch))
+        except Exception as e:
+            for future in batch.values():
+                if not future.done():
+                    future.set_exception(e)
+            return
+        except BaseException:
+            # 批量查询被取消（如事件循环关闭）：取消未完成的调用方，而不是让其一直等待
+            for future in batch.values():
+                future.cancel()
+            raise
+
+        normalize = self.normalize
+        if normalize is not None:
+            rows = {normalize(key): row for key, row in rows.items()}
+        for key, future in batch.items():
+            if not future.done():
+                future.set_result(rows.get(normalize(key) if normalize is not None else key))
+
+    def stats(self) -> Dict[str, float]:
+        """批量统计信息"""
+        return {
+            "enabled": self.enabled,
+            "loads": self.loads,
+            "batches": self.batches,
+            "mean_batch_size": self.loads / self.batches if self.batches else 0.0,
+        }
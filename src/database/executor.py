@@ -0,0 +1,146 @@
+"""
+数据库专用线程池
+所有同步 Peewee 调用经由该线程池执行：线程数与数据库连接上限一致，不与默认执行器共享，
+并统计排队深度、排队等待时间与活跃线程数。线程池饱和时可配置为快速失败，而不是无限排队。
+每次调用结束后归还线程持有的数据库连接（见 pool.py）。
+"""
+
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Optional, TypeVar
+
+from src.common.config import settings
+
+from .pool import db_pool
+
+T = TypeVar("T")
+
+# 饱和策略：queue 在队列上限内排队，超过上限快速失败；fail_fast 无空闲线程时立即失败
+SATURATION_POLICIES = ("queue", "fail_fast")
+
+
+class DatabasePoolSaturated(Exception):
+    """数据库线程池已饱和"""
+
+
+class DatabaseExecutor:
+    """固定大小的数据库线程池"""
+
+    def __init__(
+        self,
+        max_workers: int = 10,
+        max_queue: int = 100,
+        queue_timeout_seconds: float = 5.0,
+        policy: str = "queue",
+        release: Optional[Callable[[], None]] = None,
+    ):
+        if policy not in SATURATION_POLICIES:
+            raise ValueError(f"未知的数据库线程池饱和策略: {policy}")
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.queue_timeout_seconds = queue_timeout_seconds
+        self.policy = policy
+        self.release = release
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._active = 0
+        self.peak_queued = 0
+        self.submitted = 0
+        self.completed = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self._total_wait = 0.0
+        self.max_wait = 0.0
+
+    async def run(self, fn: Callable[[], T]) -> T:
+        """在线程池中执行同步调用"""
+        with self._lock:
+            queued = self._pending - self._active
+            limit = 0 if self.policy == "fail_fast" else self.max_queue
+            if self._pending >= self.max_workers and queued >= limit:
+                self.rejected += 1
+                raise DatabasePoolSaturated(
+                    f"数据库线程池已饱和（活跃 {self._active}/{self.max_workers}，排队 {queued}）"
+                )
+            self._pending += 1
+            self.submitted += 1
+            self.peak_queued = max(self.peak_queued, self._pending - self._active)
+
+        submitted_at = time.monotonic()
+        try:
+            return await asyncio.get_event_loop().run_in_executor(
+                self._get_executor(), self._call, fn, submitted_at
+            )
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def _call(self, fn: Callable[[], T], submitted_at: float) -> T:
+        waited = time.monotonic() - submitted_at
+        with self._lock:
+            self._active += 1
+            self._total_wait += waited
+            self.max_wait = max(self.max_wait, waited)
+        try:
+            # 排队超时的调用不再执行，调用方早已等待过久
+            if self.queue_timeout_seconds and waited > self.queue_timeout_seconds:
+                with self._lock:
+                    self.timed_out += 1
+                raise DatabasePoolSaturated(f"数据库调用排队 {waited:.2f} 秒，超过上限")
+            return fn()
+        finally:
+            if self.release is not None:
+                self.release()
+            with self._lock:
+                self._active -= 1
+                self.completed += 1
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_workers, thread_name_prefix="maimconfig-db"
+            )
+        return self._executor
+
+    def shutdown(self) -> None:
+        """关闭线程池，等待进行中的调用完成"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def stats(self) -> Dict[str, float]:
+        """线程池统计信息"""
+        with self._lock:
+            started = self.completed + self._active
+            return {
+                "max_workers": self.max_workers,
+                "policy": self.policy,
+                "active": self._active,
+                "queued": self._pending - self._active,
+                "peak_queued": self.peak_queued,
+                "max_queue": self.max_queue,
+                "submitted": self.submitted,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "timed_out": self.timed_out,
+                "avg_wait_ms": self._total_wait / started * 1000 if started else 0.0,
+                "max_wait_ms": self.max_wait * 1000,
+            }
+
+
+# 全局数据库线程池
+db_executor = DatabaseExecutor(
+    max_workers=settings.db_executor_max_workers,
+    max_queue=settings.db_executor_max_queue,
+    queue_timeout_seconds=settings.db_executor_queue_timeout_seconds,
+    policy=settings.db_executor_saturation_policy,
+    release=db_pool.release,
+)
+
+
+async def run_db(fn: Callable[[], T]) -> T:
+    """在数据库线程池中执行同步数据库调用"""
+    return await db_executor.run(fn)
@@ -0,0 +1,41 @@
+"""
+列表查询与增量同步索引
+租户、Agent、API密钥列表按 (created_at, id) 倒序游标分页，需要以 (created_at, id) 结尾的组合索引（租户内的列表以 tenant_id 开头），
+使 WHERE created_at < ? OR (created_at = ? AND id < ?) 的定位与排序都在索引上完成。
+Agent 列表常按状态筛选，另建 (tenant_id, status, created_at, id) 索引，筛选、排序与计数都不触及其他状态的行。
+密钥认证状态的增量同步分别按三张表的 updated_at 定位变更的行，变更的 Agent 再按 agent_id 找到其下的密钥。
+maim_db 的模型未声明这些索引，这里在启动时补齐（已存在相同列顺序的索引时跳过）。
+"""
+
+from typing import Dict, List
+
+# 索引名 -> (模型, 列)
+LIST_INDEXES = {
+    "tenant_list": ("tenant", ("created_at", "id")),
+    "agent_list": ("agent", ("tenant_id", "created_at", "id")),
+    "agent_status_list": ("agent", ("tenant_id", "status", "created_at", "id")),
+    "api_key_list": ("api_key", ("tenant_id", "created_at", "id")),
+    "api_key_updated": ("api_key", ("updated_at",)),
+    "api_key_agent": ("api_key", ("agent_id",)),
+    "tenant_updated": ("tenant", ("updated_at",)),
+    "agent_updated": ("agent", ("updated_at",)),
+}
+
+
+def ensure_list_indexes(models: Dict[str, object]) -> List[str]:
+    """确保列表查询与增量同步所需的索引存在，返回本次新建的索引名；models 形如 {"tenant": 模型, ...}"""
+    from playhouse.migrate import SchemaMigrator, migrate
+
+    created = []
+    for name, (model_name, columns) in LIST_INDEXES.items():
+        model = models[model_name]
+        database = model._meta.database
+        table_name = model._meta.table_name
+        if not database.table_exists(table_name):
+            continue
+        if any(tuple(index.columns) == columns for index in database.get_indexes(table_name)):
+            continue
+
+        migrate(SchemaMigrator.from_database(database).add_index(table_name, columns))
+        created.append(name)
+    return created
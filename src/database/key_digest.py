@@ -0,0 +1,125 @@
+"""
+API密钥摘要列
+以定长摘要（SHA-256 截断为 32 位十六进制）存储并索引密钥，替代对变长明文密钥列的查询
+maim_db 的 ApiKey 模型未定义该列，这里在运行时注册字段，并在启动时补齐列、唯一索引与存量数据。
+其他写入方（如 maim_db 的其他服务）插入的行没有摘要：查询在摘要未命中时按 key_digest IS NULL AND api_key = ?
+回退一次并顺带回填，后台任务另外每 KEY_DIGEST_BACKFILL_INTERVAL_SECONDS 回填一次
+"""
+
+import asyncio
+import hashlib
+from typing import Optional
+
+from src.common.config import settings
+from src.common.logger import get_logger
+
+logger = get_logger(__name__)
+
+KEY_DIGEST_FIELD = "key_digest"
+KEY_DIGEST_LENGTH = 32
+BACKFILL_BATCH_SIZE = 1000
+
+
+def compute_key_digest(api_key: str) -> str:
+    """计算密钥摘要"""
+    return hashlib.sha256(api_key.encode()).hexdigest()[:KEY_DIGEST_LENGTH]
+
+
+def register_key_digest_field(model) -> None:
+    """在 Peewee 模型上注册摘要字段（建表时会一并创建唯一索引）"""
+    from peewee import CharField
+
+    if KEY_DIGEST_FIELD in model._meta.fields:
+        return
+    model._meta.add_field(
+        KEY_DIGEST_FIELD,
+        CharField(max_length=KEY_DIGEST_LENGTH, null=True, unique=True),
+    )
+
+
+def ensure_key_digest_column(model) -> int:
+    """确保数据库中存在摘要列与唯一索引，并回填存量数据，返回回填行数"""
+    from playhouse.migrate import SchemaMigrator, migrate
+
+    database = model._meta.database
+    table_name = model._meta.table_name
+    columns = {column.name for column in database.get_columns(table_name)}
+    if KEY_DIGEST_FIELD not in columns:
+        migrator = SchemaMigrator.from_database(database)
+        migrate(migrator.add_column(table_name, KEY_DIGEST_FIELD, model._meta.fields[KEY_DIGEST_FIELD]))
+
+    return backfill_key_digests(model)
+
+
+def backfill_key_digests(model) -> int:
+    """为摘要为空的行计算并写入摘要，返回回填行数"""
+    database = model._meta.database
+    digest_field = model._meta.fields[KEY_DIGEST_FIELD]
+    backfilled = 0
+    while True:
+        rows = list(
+            model.select(model.id, model.api_key)
+            .where(digest_field.is_null() & model.api_key.is_null(False))
+            .limit(BACKFILL_BATCH_SIZE)
+            .tuples()
+        )
+        if not rows:
+            break
+        with database.atomic():
+            for api_key_id, api_key in rows:
+                model.update({digest_field: compute_key_digest(api_key)}).where(
+                    (model.id == api_key_id) & digest_field.is_null()
+                ).execute()
+        backfilled += len(rows)
+    return backfilled
+
+
+class KeyDigestBackfill:
+    """定期回填其他写入方插入的、没有摘要的密钥"""
+
+    def __init__(self, interval_seconds: float = 60.0):
+        self.interval_seconds = interval_seconds
+        self._task: Optional[asyncio.Task] = None
+        self.backfilled = 0
+        self.runs = 0
+
+    async def run_once(self) -> int:
+        from src.database.models import ApiKey
+
+        backfilled = await ApiKey.backfill_key_digests()
+        self.runs += 1
+        self.backfilled += backfilled
+        if backfilled:
+            logger.info(f"已回填 {backfilled} 条API密钥摘要")
+        return backfilled
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval_seconds)
+            try:
+                await self.run_once()
+            except Exception as e:
+                logger.error(f"回填API密钥摘要失败: {e}")
+
+    def start(self) -> None:
+        """启动后台回填任务"""
+        if self.interval_seconds > 0 and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """停止后台回填任务"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self):
+        """回填统计信息"""
+        return {"runs": self.runs, "backfilled": self.backfilled}
+
+
+# 全局回填任务
+key_digest_backfill = KeyDigestBackfill(interval_seconds=settings.key_digest_backfill_interval_seconds)
@@ -10,6 +10,9 @@ from contextlib import asynccontextmanager
 import json
 from datetime import datetime
 
+from .key_digest import compute_key_digest
+from .pool import db_pool
+
 # 添加maim_db路径
 maim_db_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), '..', 'maim_db')
 if maim_db_path not in sys.path:
@@ -64,16 +67,19 @@ class MaimDbAdapter:
 
     @asynccontextmanager
     async def get_session(self):
-        """获取数据库会话上下文管理器"""
+        """获取数据库会话上下文管理器，启用连接池时从连接池取连接并在结束时归还"""
+        database = db_pool.database or self.database
+        opened = False
         try:
-            self.database.connect()
-            yield self.database
+            opened = database.connect(reuse_if_open=True)
+            yield database
         except Exception as e:
             print(f"❌ 数据库会话错误: {e}")
             raise
         finally:
-            if self.database.is_connection_usable():
-                self.database.close()
+            # 仅关闭本次会话打开的连接，嵌套会话与进行中的事务不受影响
+            if opened and not database.in_transaction():
+                database.close()
 
 
 # 创建全局适配器实例
@@ -397,6 +403,9 @@ class ApiKey:
                 'status': kwargs.get('status', ApiKeyStatus.ACTIVE.value),
                 'expires_at': kwargs.get('expires_at'),
             }
+            # 连接模块注册了摘要列时一并写入，否则由查询回退与后台回填补齐
+            if 'key_digest' in MaimDbApiKey._meta.fields and data['api_key']:
+                data['key_digest'] = compute_key_digest(data['api_key'])
 
             if 'id' not in kwargs:
                 import uuid
@@ -28,6 +28,49 @@ async def create_tables() -> None:
             db_manager.create_tables(ALL_MODELS)
             print("✅ 数据库表初始化成功（Peewee/ALL_MODELS）")
 
+            # 补齐API密钥摘要列与唯一索引，并回填存量密钥
+            from maim_db.core.models.system_v2 import (
+                Agent as MaimDbAgent,
+                ApiKey as MaimDbApiKey,
+                Tenant as MaimDbTenant,
+            )
+            from .key_digest import ensure_key_digest_column
+
+            backfilled = ensure_key_digest_column(MaimDbApiKey)
+            if backfilled:
+                print(f"✅ 已回填 {backfilled} 条API密钥摘要")
+
+            # 创建API密钥删除记录表
+            from .tombstones import ensure_tombstone_table
+
+            if ensure_tombstone_table():
+                print("✅ 已创建API密钥删除记录表")
+
+            # 补齐乐观并发控制的行版本号列
+            from .row_version import ensure_row_version_column
+
+            for model in (MaimDbTenant, MaimDbAgent, MaimDbApiKey):
+                if ensure_row_version_column(model):
+                    print(f"✅ 已为 {model._meta.table_name} 添加行版本号列")
+
+            # 补齐名称唯一索引，写入冲突映射为 DuplicateRecordError
+            from .constraints import ensure_unique_indexes
+
+            created = ensure_unique_indexes(
+                {"tenant": MaimDbTenant, "agent": MaimDbAgent, "api_key": MaimDbApiKey}
+            )
+            if created:
+                print(f"✅ 已创建唯一索引: {', '.join(created)}")
+
+            # 补齐列表游标分页与认证状态增量同步使用的索引
+            from .indexes import ensure_list_indexes
+
+            created = ensure_list_indexes(
+                {"tenant": MaimDbTenant, "agent": MaimDbAgent, "api_key": MaimDbApiKey}
+            )
+            if created:
+                print(f"✅ 已创建索引: {', '.join(created)}")
+
             # 同时也初始化 SQLAlchemy 模型 (如 PluginSettings)
             from maim_db.maimconfig_models.models import create_tables as create_sa_tables
             await create_sa_tables()
@@ -0,0 +1,139 @@
+"""
+原生 asyncio 数据库读取
+热点读取（按ID获取租户/Agent/API密钥、按密钥值查询、活跃状态列表）通过 aiomysql 连接池直接执行，
+不经过数据库线程池。SQL 由同一个 Peewee 查询对象生成，结果行交给 Peewee 自身的行处理逻辑
+构建模型实例，因此与线程池路径返回完全相同的对象。
+仅在 maim_db 使用 MySQL 且已安装 aiomysql 时启用，否则各包装器回退到线程池路径；
+当前 Peewee 版本不提供所需的行处理接口时同样不启用。
+"""
+
+from typing import Dict
+
+from src.common.config import settings
+from src.common.logger import get_logger
+
+try:
+    import aiomysql
+except ImportError:
+    aiomysql = None
+
+logger = get_logger(__name__)
+
+# Peewee MySQLDatabase 的连接参数中可直接传给 aiomysql 的部分
+POOL_CONNECT_PARAMS = (
+    "host", "port", "user", "password", "unix_socket", "charset",
+    "use_unicode", "sql_mode", "connect_timeout", "ssl",
+)
+
+class _FetchedCursor:
+    """已取回结果的只读游标，供 Peewee 的 CursorWrapper 逐行处理"""
+
+    def __init__(self, description, rows):
+        self.description = description
+        self._rows = list(rows)
+        self._index = 0
+
+    def fetchone(self):
+        if self._index >= len(self._rows):
+            return None
+        row = self._rows[self._index]
+        self._index += 1
+        return row
+
+    def close(self):
+        pass
+
+
+class NativeReadPool:
+    """aiomysql 连接池"""
+
+    def __init__(self, enabled: bool = True, min_size: int = 1, max_size: int = 10):
+        self.configured = enabled
+        self.min_size = min_size
+        self.max_size = max_size
+        self._pool = None
+        self.queries = 0
+        self.errors = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self._pool is not None
+
+    async def start(self, database) -> bool:
+        """按 Peewee 数据库的连接参数创建连接池，非 MySQL 或缺少 aiomysql 时不启用"""
+        if not self.configured or aiomysql is None or self._pool is not None:
+            return self.enabled
+
+        from peewee import BaseQuery, MySQLDatabase
+
+        if not isinstance(database, MySQLDatabase):
+            return False
+        # 结果行复用 Peewee 的行处理（非公开接口），升级后接口不存在时回退到线程池
+        if not hasattr(BaseQuery, "_get_cursor_wrapper"):
+            logger.warning("当前 Peewee 版本不支持原生读取的行处理，热点读取使用线程池")
+            return False
+
+        params = {key: value for key, value in database.connect_params.items() if key in POOL_CONNECT_PARAMS}
+        if "passwd" in database.connect_params:
+            params.setdefault("password", database.connect_params["passwd"])
+        params.setdefault("charset", "utf8")
+        params.setdefault("sql_mode", "PIPES_AS_CONCAT")
+        try:
+            self._pool = await aiomysql.create_pool(
+                minsize=self.min_size,
+                maxsize=self.max_size,
+                db=database.database,
+                autocommit=True,
+                **params,
+            )
+        except Exception as e:
+            logger.warning(f"原生数据库连接池创建失败，热点读取使用线程池: {e}")
+            return False
+        return True
+
+    async def stop(self) -> None:
+        if self._pool is not None:
+            self._pool.close()
+            await self._pool.wait_closed()
+            self._pool = None
+
+    async def _execute(self, sql: str, params):
+        self.queries += 1
+        try:
+            async with self._pool.acquire() as conn:
+                async with conn.cursor() as cursor:
+                    await cursor.execute(sql, params)
+                    return cursor.description, await cursor.fetchall()
+        except Exception:
+            self.errors += 1
+            raise
+
+    async def fetch_all(self, query) -> list:
+        """执行 Peewee 查询，按查询的行类型返回全部结果"""
+        sql, params = query.sql()
+        description, rows = await self._execute(sql, params)
+        return list(query._get_cursor_wrapper(_FetchedCursor(description, rows)))
+
+    async def fetch_one(self, query):
+        """执行 Peewee 查询并返回第一行，无结果时返回None"""
+        rows = await self.fetch_all(query.limit(1))
+        return rows[0] if rows else None
+
+    def stats(self) -> Dict[str, float]:
+        """连接池统计信息"""
+        return {
+            "enabled": self.enabled,
+            "size": self._pool.size if self._pool is not None else 0,
+            "free": self._pool.freesize if self._pool is not None else 0,
+            "max_size": self.max_size,
+            "queries": self.queries,
+            "errors": self.errors,
+        }
+
+
+# 全局原生读取连接池（在服务启动时创建）
+native_reads = NativeReadPool(
+    enabled=settings.native_reads_enabled,
+    min_size=settings.native_pool_min_size,
+    max_size=settings.native_pool_max_size,
+)
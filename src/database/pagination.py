@@ -0,0 +1,96 @@
+"""
+游标分页与计数缓存
+列表按 (created_at, id) 倒序分页：游标是上一页最后一行的 (created_at, id) 编码后的不透明字符串，
+下一页以 WHERE created_at < ? OR (created_at = ? AND id < ?) 在索引上定位，深分页不再扫描前面的行。
+列表总数来自按查询条件缓存的计数，写入（创建/删除/状态变更）时按前缀失效，多 worker 间最长滞后一个 TTL。
+"""
+
+import base64
+import json
+import time
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from src.common.config import settings
+
+
+class InvalidCursor(ValueError):
+    """分页游标无法解析"""
+
+
+def encode_cursor(created_at: datetime, record_id: str) -> str:
+    """将一行的 (created_at, id) 编码为游标"""
+    payload = json.dumps([created_at.isoformat(), record_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    """解析游标，格式不正确时抛出 InvalidCursor"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, record_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(created_at), str(record_id)
+    except (ValueError, TypeError) as e:
+        raise InvalidCursor("无效的分页游标") from e
+
+
+def keyset_page(query, model, limit: int, after: Optional[str] = None) -> Tuple[List, Optional[str]]:
+    """按 (created_at, id) 倒序取一页，返回 (行, 下一页游标)；没有更多数据时游标为None"""
+    if after:
+        created_at, record_id = decode_cursor(after)
+        query = query.where(
+            (model.created_at < created_at)
+            | ((model.created_at == created_at) & (model.id < record_id))
+        )
+    rows = list(query.order_by(model.created_at.desc(), model.id.desc()).limit(limit + 1))
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].created_at, rows[-1].id)
+    return rows, next_cursor
+
+
+class CountCache:
+    """按查询条件缓存的记录数，键为元组，失效按键前缀进行"""
+
+    def __init__(self, ttl_seconds: float = 30.0):
+        self.ttl_seconds = ttl_seconds
+        self._entries: Dict[tuple, Tuple[float, int]] = {}
+        # 每次失效递增，计数查询期间发生过失效时不写入缓存
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+
+    async def get(self, key: tuple, loader: Callable[[], Awaitable[int]]) -> int:
+        """返回缓存的计数，缺失或过期时调用 loader 查询"""
+        entry = self._entries.get(key)
+        if entry is not None and time.monotonic() - entry[0] < self.ttl_seconds:
+            self.hits += 1
+            return entry[1]
+
+        self.misses += 1
+        generation = self._generation
+        value = await loader()
+        if generation == self._generation:
+            self._entries[key] = (time.monotonic(), value)
+        return value
+
+    def invalidate(self, *prefix) -> None:
+        """失效键以 prefix 开头的全部计数"""
+        self._generation += 1
+        for key in [key for key in self._entries if key[:len(prefix)] == prefix]:
+            del self._entries[key]
+
+    def stats(self) -> Dict[str, float]:
+        """计数缓存统计信息"""
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+
+# 全局计数缓存
+record_counts = CountCache(ttl_seconds=settings.count_cache_ttl_seconds)
@@ -0,0 +1,167 @@
+"""
+Peewee 数据库连接池
+maim_db 的数据库对象每个线程各自持有一个连接，且由调用方自行 connect/close。服务启动后，
+将 maim_db 模型重新绑定到按相同参数创建的连接池数据库：连接数有上限，超过 stale_timeout
+的连接在归还或取出时关闭重建，取出前先 ping 检查连接是否仍然可用（pre-ping）。
+数据库线程池在每次调用结束后归还当前线程的连接，连接不会随线程长期占用。
+仅 MySQL 与 PostgreSQL 启用连接池，SQLite 保持原有的线程连接。
+"""
+
+from typing import Dict, Iterable, Optional
+
+from src.common.config import settings
+from src.common.logger import get_logger
+
+try:
+    from peewee import DatabaseProxy, Model, MySQLDatabase, PostgresqlDatabase
+    from playhouse.pool import MaxConnectionsExceeded, PooledMySQLDatabase, PooledPostgresqlDatabase
+except ImportError:
+    Model = None
+
+logger = get_logger(__name__)
+
+
+class _PoolMetrics:
+    """为 Peewee 连接池补充预检开关与统计计数（计数在 Database 连接锁内更新）"""
+
+    pre_ping = True
+    checkouts = 0
+    ping_failures = 0
+    exhausted = 0
+
+    def _connect(self):
+        try:
+            conn = super()._connect()
+        except MaxConnectionsExceeded:
+            self.exhausted += 1
+            raise
+        self.checkouts += 1
+        return conn
+
+    def _is_closed(self, conn):
+        if not self.pre_ping:
+            return False
+        closed = super()._is_closed(conn)
+        if closed:
+            self.ping_failures += 1
+        return closed
+
+
+def _pooled_class(database):
+    """按数据库类型选择连接池实现，不支持的类型返回None"""
+    if Model is None:
+        return None
+    if isinstance(database, MySQLDatabase):
+        base = PooledMySQLDatabase
+    elif isinstance(database, PostgresqlDatabase):
+        base = PooledPostgresqlDatabase
+    else:
+        return None
+    return type(f"Monitored{base.__name__}", (_PoolMetrics, base), {})
+
+
+def _bound_models(database) -> list:
+    """找出绑定到指定数据库的全部模型"""
+    models = []
+    pending = list(Model.__subclasses__())
+    while pending:
+        model = pending.pop()
+        pending.extend(model.__subclasses__())
+        if model._meta.database is database:
+            models.append(model)
+    return models
+
+
+class DatabasePool:
+    """maim_db 模型使用的连接池数据库"""
+
+    def __init__(
+        self,
+        enabled: bool = True,
+        max_connections: int = 10,
+        stale_timeout: int = 300,
+        wait_timeout: float = 5.0,
+        pre_ping: bool = True,
+    ):
+        self.configured = enabled
+        self.max_connections = max_connections
+        self.stale_timeout = stale_timeout
+        self.wait_timeout = wait_timeout
+        self.pre_ping = pre_ping
+        self.database = None
+        self.released = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.database is not None
+
+    def install(self, models: Iterable) -> bool:
+        """按模型当前数据库的参数创建连接池，并将绑定到该数据库的全部模型改绑到连接池"""
+        if not self.configured or self.database is not None:
+            return self.enabled
+
+        models = list(models)
+        if not models:
+            return False
+        original = models[0]._meta.database
+        database = original.obj if isinstance(original, DatabaseProxy) else original
+        pooled_class = _pooled_class(database)
+        if pooled_class is None:
+            return False
+
+        pooled = pooled_class(
+            database.database,
+            max_connections=self.max_connections,
+            stale_timeout=self.stale_timeout,
+            timeout=self.wait_timeout,
+            **database.connect_params,
+        )
+        pooled.pre_ping = self.pre_ping
+        bound = set(_bound_models(original)) | set(models)
+        pooled.bind(list(bound), bind_refs=False, bind_backrefs=False)
+        if not database.is_closed():
+            database.close()
+        self.database = pooled
+        logger.info(f"数据库连接池已启用: {len(bound)} 个模型，最多 {self.max_connections} 个连接")
+        return True
+
+    def release(self) -> None:
+        """归还当前线程持有的连接（事务进行中时保留）"""
+        database = self.database
+        if database is None or database.is_closed() or database.in_transaction():
+            return
+        database.close()
+        self.released += 1
+
+    def close(self) -> None:
+        """关闭连接池中的全部连接"""
+        if self.database is not None:
+            self.database.close_all()
+
+    def stats(self) -> Dict[str, Optional[float]]:
+        """连接池统计信息"""
+        database = self.database
+        if database is None:
+            return {"enabled": False, "max_connections": self.max_connections}
+        return {
+            "enabled": True,
+            "max_connections": self.max_connections,
+            "in_use": len(database._in_use),
+            "idle": len(database._connections),
+            "stale_timeout": self.stale_timeout,
+            "pre_ping": self.pre_ping,
+            "checkouts": database.checkouts,
+            "released": self.released,
+            "ping_failures": database.ping_failures,
+            "exhausted": database.exhausted,
+        }
+
+
+# 全局连接池（在服务启动时安装）
+db_pool = DatabasePool(
+    enabled=settings.db_pool_enabled,
+    max_connections=settings.db_pool_max_connections,
+    stale_timeout=settings.db_pool_stale_timeout_seconds,
+    wait_timeout=settings.db_pool_wait_timeout_seconds,
+    pre_ping=settings.db_pool_pre_ping,
+)
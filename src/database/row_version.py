@@ -0,0 +1,41 @@
+"""
+行版本列（乐观并发控制）
+租户、Agent、API密钥各带一个整数版本号，每次更新加一。包装器只写入变化的列，
+并以 UPDATE ... WHERE id = ? AND row_version = ? 执行；影响行数为 0 说明记录已被其他请求修改或删除。
+maim_db 的模型未定义该列，这里在运行时注册字段，并在启动时补齐数据库中的列（存量行版本号为 0）。
+列带数据库默认值 0，不经过本服务（未注册该字段）的写入方插入行时无需提供该列。
+"""
+
+ROW_VERSION_FIELD = "row_version"
+
+
+class ConcurrentUpdateError(Exception):
+    """记录已被其他请求修改或删除"""
+
+    def __init__(self, record_id: str, expected_version: int):
+        super().__init__(f"记录 {record_id} 已被修改或删除（期望版本 {expected_version}）")
+        self.record_id = record_id
+        self.expected_version = expected_version
+
+
+def register_row_version_field(model) -> None:
+    """在 Peewee 模型上注册版本号字段"""
+    from peewee import SQL, IntegerField
+
+    if ROW_VERSION_FIELD in model._meta.fields:
+        return
+    model._meta.add_field(ROW_VERSION_FIELD, IntegerField(default=0, constraints=[SQL("DEFAULT 0")]))
+
+
+def ensure_row_version_column(model) -> bool:
+    """确保数据库中存在版本号列，返回是否新增了该列"""
+    from playhouse.migrate import SchemaMigrator, migrate
+
+    database = model._meta.database
+    table_name = model._meta.table_name
+    columns = {column.name for column in database.get_columns(table_name)}
+    if ROW_VERSION_FIELD in columns:
+        return False
+    migrator = SchemaMigrator.from_database(database)
+    migrate(migrator.add_column(table_name, ROW_VERSION_FIELD, model._meta.fields[ROW_VERSION_FIELD]))
+    return True
@@ -0,0 +1,60 @@
+"""
+并发读取合并（single-flight）
+同一键已有进行中的查询时，后来的调用方等待同一个 future，不再各自查询数据库；查询结束即移除，不缓存结果。
+Agent 的 Bot 批量重连时，数百个相同的 GET /agents/{id}、/agents/{id}/config 只产生一次 Agent 查询与一次配置读取。
+写入后调用 forget(key)，之后的读取不再加入写入前发起的查询。单个调用方被取消不会取消共享的查询。
+"""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+from src.common.config import settings
+
+
+class SingleFlight:
+    """按键合并并发的相同读取"""
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self.calls = 0
+        self.coalesced = 0
+
+    async def do(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> Any:
+        """执行 loader 并返回结果；同一键已有进行中的调用时直接等待其结果"""
+        if not self.enabled:
+            return await loader()
+
+        self.calls += 1
+        future = self._inflight.get(key)
+        if future is not None:
+            self.coalesced += 1
+        else:
+            future = self._inflight[key] = asyncio.ensure_future(loader())
+            future.add_done_callback(lambda done: self._finish(key, done))
+        return await asyncio.shield(future)
+
+    def forget(self, key: Hashable) -> None:
+        """写入后调用：进行中的查询继续完成，但不再有新的调用方加入"""
+        self._inflight.pop(key, None)
+
+    def _finish(self, key: Hashable, future: asyncio.Future) -> None:
+        if self._inflight.get(key) is future:
+            del self._inflight[key]
+        # 所有调用方都已取消时，避免"异常未被获取"的警告
+        if not future.cancelled():
+            future.exception()
+
+    def stats(self) -> Dict[str, float]:
+        """合并统计信息"""
+        return {
+            "enabled": self.enabled,
+            "inflight": len(self._inflight),
+            "calls": self.calls,
+            "coalesced": self.coalesced,
+            "coalesced_rate": self.coalesced / self.calls if self.calls else 0.0,
+        }
+
+
+# 全局读取合并器
+read_flights = SingleFlight(enabled=settings.single_flight_enabled)
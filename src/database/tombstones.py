@@ -0,0 +1,56 @@
+"""
+API密钥删除记录
+API密钥为物理删除，按更新时间的增量同步看不到被删除的行。本服务删除密钥（或删除租户/Agent连带其下密钥）时，
+在同一事务内写入 api_key_tombstones，各实例按 deleted_at 索引增量读取，不必逐个确认已跟踪的密钥是否仍存在。
+绕过本服务的删除不会留下记录，由定期全量同步发现。记录保留 TOMBSTONE_RETENTION 后清理。
+"""
+
+from datetime import datetime, timedelta
+from typing import Iterable, List
+
+from peewee import CharField, DateTimeField, Model
+
+TOMBSTONE_RETENTION = timedelta(days=1)
+
+
+class ApiKeyTombstone(Model):
+    api_key_id = CharField(max_length=64)
+    deleted_at = DateTimeField(default=datetime.utcnow, index=True)
+
+    class Meta:
+        table_name = "api_key_tombstones"
+
+
+def bind_tombstones(database) -> None:
+    """绑定到 maim_db 模型使用的数据库（安装连接池时随之改绑）"""
+    ApiKeyTombstone.bind(database, bind_refs=False, bind_backrefs=False)
+
+
+def ensure_tombstone_table() -> bool:
+    """确保删除记录表存在，返回是否新建了该表"""
+    database = ApiKeyTombstone._meta.database
+    if database.table_exists(ApiKeyTombstone._meta.table_name):
+        return False
+    database.create_tables([ApiKeyTombstone])
+    return True
+
+
+def record_deleted(api_key_ids: Iterable[str]) -> int:
+    """写入删除记录（在删除所在的事务中调用），返回记录数"""
+    now = datetime.utcnow()
+    rows = [{"api_key_id": api_key_id, "deleted_at": now} for api_key_id in api_key_ids]
+    if rows:
+        ApiKeyTombstone.insert_many(rows).execute()
+    return len(rows)
+
+
+def deleted_since(deleted_after: datetime) -> List[str]:
+    """返回在指定时间之后删除的密钥ID"""
+    query = ApiKeyTombstone.select(ApiKeyTombstone.api_key_id).where(ApiKeyTombstone.deleted_at >= deleted_after)
+    return [row[0] for row in query.tuples()]
+
+
+def prune_tombstones(now: datetime = None) -> int:
+    """清理超过保留期的删除记录，返回清理行数"""
+    before = (now or datetime.utcnow()) - TOMBSTONE_RETENTION
+    return ApiKeyTombstone.delete().where(ApiKeyTombstone.deleted_at < before).execute()
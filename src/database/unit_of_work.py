@@ -0,0 +1,35 @@
+"""
+请求级工作单元
+tenant_and_agent 以一条左连接查询同时取回租户与Agent，并在请求内记住结果，同一请求再次获取时不再查询；
+相互独立的查询由路由用 asyncio.gather 并发执行。
+路由通过 Depends(get_unit_of_work) 获取实例，请求结束即丢弃，不跨请求共享，也不需要失效。
+"""
+
+from typing import Dict, Optional, Tuple
+
+from .connection import AsyncAgent, AsyncTenant
+
+
+class UnitOfWork:
+    """请求级的租户/Agent读取结果"""
+
+    def __init__(self):
+        self._tenants: Dict[str, Optional[AsyncTenant]] = {}
+        self._agents: Dict[str, Optional[AsyncAgent]] = {}
+
+    async def tenant_and_agent(self, tenant_id: str, agent_id: str) -> Tuple[Optional[AsyncTenant], Optional[AsyncAgent]]:
+        """同时获取租户与Agent（一次左连接查询）；Agent 是否属于该租户由调用方判断"""
+        if tenant_id in self._tenants and agent_id in self._agents:
+            return self._tenants[tenant_id], self._agents[agent_id]
+
+        tenant, agent = await AsyncTenant.get_with_agent(tenant_id, agent_id)
+        self._tenants[tenant_id] = tenant
+        # 租户不存在时联表查询无法得知Agent是否存在，不记录Agent
+        if tenant is not None:
+            self._agents[agent_id] = agent
+        return tenant, agent
+
+
+def get_unit_of_work() -> UnitOfWork:
+    """FastAPI 依赖：为每个请求创建工作单元"""
+    return UnitOfWork()
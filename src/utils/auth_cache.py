@@ -0,0 +1,262 @@
+"""
+API密钥认证缓存
+进程内 TTL + LRU 缓存，缓存已解析的API密钥记录，避免每次验证都访问数据库；
+进程内未命中时再读取同一主机上各 worker 共享的缓存（见 src.utils.shared_auth_cache）；
+进程内命中时比对共享缓存中的失效标记，其他 worker 失效过的记录视为未命中
+"""
+
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Optional, Dict, Iterable, List
+
+from src.common.config import settings
+from src.database.enums import AgentStatus, TenantStatus
+from src.utils.permissions import compile_permission_trie, mask_has_all, permission_registry
+from src.utils.shared_auth_cache import SharedAuthTable, shared_auth_table
+
+
+def tenant_status_available(status: Optional[str]) -> bool:
+    """租户状态是否允许其密钥通过认证（None表示租户已删除）"""
+    return status is not None and status != TenantStatus.SUSPENDED.value
+
+
+def agent_status_available(status: Optional[str]) -> bool:
+    """Agent状态是否允许其密钥通过认证（None表示Agent已删除）"""
+    return status is not None and status != AgentStatus.ARCHIVED.value
+
+
+class ApiKeyAuthRecord:
+    """认证所需的API密钥记录（只读快照），冗余所属租户与Agent的状态，一次读取即可完成授权判断"""
+
+    __slots__ = (
+        "id", "tenant_id", "agent_id", "status", "expires_at",
+        "permissions", "permission_mask", "permission_trie",
+        "tenant_status", "agent_status",
+    )
+
+    def __init__(
+        self,
+        id: str,
+        tenant_id: str,
+        agent_id: str,
+        status: str,
+        expires_at: Optional[datetime] = None,
+        permissions: Optional[List[str]] = None,
+        tenant_status: Optional[str] = TenantStatus.ACTIVE.value,
+        agent_status: Optional[str] = AgentStatus.ACTIVE.value,
+    ):
+        self.id = id
+        self.tenant_id = tenant_id
+        self.agent_id = agent_id
+        self.status = status
+        self.expires_at = expires_at
+        self.permissions = permissions or []
+        # None 表示所属租户/Agent已不存在
+        self.tenant_status = tenant_status
+        self.agent_status = agent_status
+        # 加载时预编译权限位图与通配授权前缀树
+        self.permission_mask = permission_registry.compile(self.permissions)
+        self.permission_trie = compile_permission_trie(self.permissions)
+
+    @classmethod
+    def from_api_key(cls, api_key) -> "ApiKeyAuthRecord":
+        """从 AsyncApiKey 包装对象构建记录"""
+        return cls(
+            id=api_key.id,
+            tenant_id=api_key.tenant_id,
+            agent_id=api_key.agent_id,
+            status=api_key.status,
+            expires_at=api_key.expires_at,
+            permissions=list(api_key.permissions or []),
+            tenant_status=api_key.tenant_status,
+            agent_status=api_key.agent_status,
+        )
+
+    def tenant_available(self) -> bool:
+        """所属租户存在且未被暂停"""
+        return tenant_status_available(self.tenant_status)
+
+    def agent_available(self) -> bool:
+        """所属Agent存在且未被归档"""
+        return agent_status_available(self.agent_status)
+
+    def has_permission(self, permission: str) -> bool:
+        """是否拥有指定权限（精确授权走位图，通配授权走前缀树）"""
+        if mask_has_all(self.permission_mask, permission_registry.lookup((permission,))):
+            return True
+        return self.permission_trie is not None and self.permission_trie.matches(permission)
+
+    def has_permissions(self, permissions: Iterable[str]) -> bool:
+        """是否拥有全部指定权限"""
+        permissions = list(permissions)
+        if mask_has_all(self.permission_mask, permission_registry.lookup(permissions)):
+            return True
+        if self.permission_trie is None:
+            return False
+        return all(self.has_permission(permission) for permission in permissions)
+
+    def is_expired(self, now: Optional[datetime] = None) -> bool:
+        """是否已超过过期时间"""
+        if not self.expires_at:
+            return False
+        return self.expires_at < (now or datetime.utcnow())
+
+
+class ApiKeyAuthCache:
+    """按密钥值缓存认证记录，容量满时淘汰最久未使用的条目"""
+
+    def __init__(self, max_size: int = 10000, ttl_seconds: float = 60.0, shared: Optional[SharedAuthTable] = None):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        # 跨 worker 共享缓存，未打开时各操作为空操作
+        self.shared = shared
+        # key_value -> (写入时间, 记录, 共享缓存失效标记)
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        # api_key_id -> key_value，用于按ID失效
+        self._key_by_id: Dict[str, str] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.remote_invalidations = 0
+
+    def get(self, key_value: str) -> Optional[ApiKeyAuthRecord]:
+        """读取缓存记录，过期或已被其他 worker 失效的条目视为未命中"""
+        entry = self._entries.get(key_value)
+        if entry is not None and time.monotonic() - entry[0] > self.ttl_seconds:
+            self._remove(key_value)
+            self.evictions += 1
+            entry = None
+        elif entry is not None and self.shared is not None and self.shared.stamp(entry[1].id) != entry[2]:
+            self._remove(key_value)
+            self.remote_invalidations += 1
+            entry = None
+
+        if entry is None:
+            self.misses += 1
+            return self._get_shared(key_value)
+
+        self._entries.move_to_end(key_value)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, key_value: str, record: ApiKeyAuthRecord) -> None:
+        """写入缓存记录（同时写入共享缓存）"""
+        self._put_local(key_value, record)
+        if self.shared is not None:
+            self.shared.put(key_value, record)
+
+    def _put_local(self, key_value: str, record: ApiKeyAuthRecord) -> None:
+        if self.max_size <= 0:
+            return
+
+        if key_value in self._entries:
+            self._remove(key_value)
+
+        stamp = self.shared.stamp(record.id) if self.shared is not None else None
+        self._entries[key_value] = (time.monotonic(), record, stamp)
+        self._key_by_id[record.id] = key_value
+
+        while len(self._entries) > self.max_size:
+            oldest_key, _ = next(iter(self._entries.items()))
+            self._remove(oldest_key)
+            self.evictions += 1
+
+    def invalidate(self, key_value: str, api_key_id: Optional[str] = None) -> bool:
+        """按密钥值失效缓存；提供密钥ID时，其他 worker 进程内缓存中的该记录同时失效"""
+        if self.shared is not None:
+            entry = self._entries.get(key_value)
+            self.shared.invalidate(key_value, api_key_id or (entry[1].id if entry is not None else None))
+        if key_value not in self._entries:
+            return False
+        self._remove(key_value)
+        self.evictions += 1
+        return True
+
+    def invalidate_by_id(self, api_key_id: str) -> bool:
+        """按API密钥ID失效缓存"""
+        if self.shared is not None:
+            self.shared.invalidate_by_id(api_key_id)
+        key_value = self._key_by_id.get(api_key_id)
+        if key_value is None:
+            return False
+        return self.invalidate(key_value)
+
+    def invalidate_by_ids(self, api_key_ids: Iterable[str]) -> int:
+        """按API密钥ID批量失效缓存（共享缓存经ID索引直接定位槽位），返回本地失效数量"""
+        api_key_ids = set(api_key_ids)
+        if self.shared is not None:
+            self.shared.invalidate_by_ids(api_key_ids)
+        removed = 0
+        for api_key_id in api_key_ids:
+            key_value = self._key_by_id.get(api_key_id)
+            if key_value is not None and key_value in self._entries:
+                self._remove(key_value)
+                self.evictions += 1
+                removed += 1
+        return removed
+
+    def clear(self) -> None:
+        """清空缓存"""
+        self._entries.clear()
+        self._key_by_id.clear()
+        if self.shared is not None:
+            self.shared.clear()
+
+    def stats(self) -> Dict[str, float]:
+        """缓存统计信息"""
+        total = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "remote_invalidations": self.remote_invalidations,
+            "hit_rate": self.hits / total if total else 0.0,
+            "shared": self.shared.stats() if self.shared is not None else None,
+        }
+
+    def _get_shared(self, key_value: str) -> Optional[ApiKeyAuthRecord]:
+        if self.shared is None:
+            return None
+        record = self.shared.get(key_value)
+        if record is not None:
+            self._put_local(key_value, record)
+        return record
+
+    def _remove(self, key_value: str) -> None:
+        entry = self._entries.pop(key_value, None)
+        if entry is not None and self._key_by_id.get(entry[1].id) == key_value:
+            del self._key_by_id[entry[1].id]
+
+
+def invalidate_auth_keys(api_key_ids: Iterable[str]) -> None:
+    """失效指定密钥在认证缓存、认证快照与签名密钥本地校验中的状态"""
+    from src.utils.auth_snapshot import auth_snapshot
+    from src.utils.signed_keys import signed_key_registry
+
+    api_key_ids = list(api_key_ids)
+    api_key_cache.invalidate_by_ids(api_key_ids)
+    for api_key_id in api_key_ids:
+        auth_snapshot.discard(api_key_id)
+        # 下次验证回退到数据库，按最新的租户/Agent状态重新判断
+        signed_key_registry.revoke(api_key_id)
+
+
+async def invalidate_owner_keys(tenant_id: Optional[str] = None, agent_id: Optional[str] = None) -> int:
+    """租户/Agent状态变更后，失效其下全部密钥的本地认证状态，返回密钥数量"""
+    from src.database.models import ApiKey
+
+    api_key_ids = await ApiKey.list_ids_by_owner(tenant_id=tenant_id, agent_id=agent_id)
+    invalidate_auth_keys(api_key_ids)
+    return len(api_key_ids)
+
+
+# 全局缓存实例
+api_key_cache = ApiKeyAuthCache(
+    max_size=settings.auth_cache_max_size,
+    ttl_seconds=settings.auth_cache_ttl_seconds,
+    shared=shared_auth_table,
+)
@@ -0,0 +1,360 @@
+"""
+API密钥认证快照
+定期将全部 active 密钥的认证记录写入本地二进制文件；服务启动时内存映射该文件，
+在后台向数据库追赶快照之后的变更，追赶完成后的 warmup_seconds 内直接从快照提供验证，之后关闭快照。
+追赶完成前不提供任何记录；预热期内其他 worker 的变更最多陈旧 warmup_seconds，与进程内认证缓存的 TTL 相同。
+超过 max_age_seconds 的快照不会被加载。
+同一主机的多个 worker 中只有持有快照锁文件（{path}.lock，非阻塞 flock）的一个定期生成快照，其余只读取；
+持锁的 worker 退出后锁自动释放，其他 worker 在下一个周期接替。
+
+文件格式（小端，版本 2）：
+- 文件头: magic(8s) 版本(H) 保留(H) 生成时间(d) 记录数(I) 权限表偏移(I) 记录区偏移(I)
+- 索引: 记录数 × (密钥摘要(16s) 记录偏移(I))，按摘要排序，可二分查找
+- 记录: 各字段长度(HHHBBBH) 过期时间(d，-1表示永不过期)
+  后接 id/tenant_id/agent_id/status/tenant_status/agent_status/权限位（租户/Agent已删除时状态为空串）
+- 权限表: 数量(I) 后接 数量 × (长度(H) 权限字符串)，记录中的权限位按此表编号
+"""
+
+import asyncio
+import mmap
+import os
+import struct
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Set
+
+from src.common.config import settings
+from src.common.logger import get_logger
+
+try:
+    import fcntl
+except ImportError:  # 非 POSIX 平台无法选举，每个 worker 各自写入
+    fcntl = None
+
+logger = get_logger(__name__)
+
+SNAPSHOT_MAGIC = b"MMCSNAP\0"
+SNAPSHOT_VERSION = 2
+HEADER = struct.Struct("<8sHHdIII")
+INDEX_ENTRY = struct.Struct("<16sI")
+RECORD = struct.Struct("<HHHBBBHd")
+LENGTH = struct.Struct("<H")
+COUNT = struct.Struct("<I")
+EPOCH = datetime(1970, 1, 1)
+
+# 追赶变更时回看的时间，容忍快照生成与数据库之间的时钟偏差
+CATCH_UP_SLACK = timedelta(seconds=60)
+
+
+def encode_snapshot(rows, created_at: float) -> bytes:
+    """将 list_auth_rows 的结果编码为快照文件内容"""
+    permission_bits: Dict[str, int] = {}
+    entries = []
+    for api_key_id, key_digest, tenant_id, agent_id, status, expires_at, tenant_status, agent_status, permissions in rows:
+        mask = 0
+        for permission in permissions or ():
+            bit = permission_bits.setdefault(permission, len(permission_bits))
+            mask |= 1 << bit
+        mask_bytes = mask.to_bytes((mask.bit_length() + 7) // 8, "little")
+        fields = [
+            value.encode()
+            for value in (api_key_id, tenant_id, agent_id, status, tenant_status or "", agent_status or "")
+        ]
+        expires = (expires_at - EPOCH).total_seconds() if expires_at else -1.0
+        record = RECORD.pack(*(len(field) for field in fields), len(mask_bytes), expires) + b"".join(fields) + mask_bytes
+        entries.append((bytes.fromhex(key_digest), record))
+    entries.sort(key=lambda entry: entry[0])
+
+    records_offset = HEADER.size + INDEX_ENTRY.size * len(entries)
+    index = []
+    records = []
+    offset = records_offset
+    for digest, record in entries:
+        index.append(INDEX_ENTRY.pack(digest, offset))
+        records.append(record)
+        offset += len(record)
+
+    permission_table = [COUNT.pack(len(permission_bits))]
+    for permission in permission_bits:
+        encoded = permission.encode()
+        permission_table.append(LENGTH.pack(len(encoded)) + encoded)
+
+    header = HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, 0, created_at, len(entries), offset, records_offset)
+    return header + b"".join(index) + b"".join(records) + b"".join(permission_table)
+
+
+class AuthSnapshot:
+    """认证快照的写入与内存映射读取"""
+
+    def __init__(
+        self,
+        path: str,
+        interval_seconds: float = 300.0,
+        max_age_seconds: float = 900.0,
+        warmup_seconds: float = 60.0,
+    ):
+        self.path = path
+        self.interval_seconds = interval_seconds
+        self.max_age_seconds = max_age_seconds
+        self.warmup_seconds = warmup_seconds
+        self._mm: Optional[mmap.mmap] = None
+        # 追赶完成后才提供记录，到期后关闭
+        self._serve_until: Optional[float] = None
+        self._created_at = 0.0
+        self._count = 0
+        self._permissions: List[str] = []
+        # 快照生成后已变更或删除的密钥，不再从快照提供
+        self.stale_ids: Set[str] = set()
+        self._task: Optional[asyncio.Task] = None
+        # 持有快照锁文件的描述符（本 worker 负责写入）
+        self._writer_fd: Optional[int] = None
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.last_write_records = 0
+
+    @property
+    def loaded(self) -> bool:
+        return self._mm is not None
+
+    def load(self) -> bool:
+        """内存映射快照文件；文件不存在、格式不符或超过时限时忽略"""
+        try:
+            with open(self.path, "rb") as f:
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return False
+
+        try:
+            magic, version, _, created_at, count, permissions_offset, _ = HEADER.unpack_from(mm, 0)
+            if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION:
+                raise ValueError(f"不支持的快照版本: {version}")
+            age = time.time() - created_at
+            if age > self.max_age_seconds:
+                raise ValueError(f"快照已过期（{age:.0f} 秒）")
+
+            permissions = []
+            offset = permissions_offset + COUNT.size
+            for _ in range(COUNT.unpack_from(mm, permissions_offset)[0]):
+                length = LENGTH.unpack_from(mm, offset)[0]
+                permissions.append(mm[offset + LENGTH.size:offset + LENGTH.size + length].decode())
+                offset += LENGTH.size + length
+        except (ValueError, struct.error) as e:
+            mm.close()
+            logger.info(f"忽略认证快照 {self.path}: {e}")
+            return False
+
+        self._mm = mm
+        self._created_at = created_at
+        self._count = count
+        self._permissions = permissions
+        self._serve_until = None
+        self.stale_ids.clear()
+        return True
+
+    def close(self) -> None:
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
+        self._serve_until = None
+
+    def lookup(self, key_value: str):
+        """按密钥摘要二分查找，返回认证记录；快照未加载、尚未追赶完成、预热期已过或记录已变更时返回None"""
+        if self._mm is None or self._serve_until is None:
+            return None
+        if time.monotonic() >= self._serve_until:
+            self.close()
+            return None
+
+        from src.database.key_digest import compute_key_digest
+
+        digest = bytes.fromhex(compute_key_digest(key_value))
+        low, high = 0, self._count
+        while low < high:
+            middle = (low + high) // 2
+            entry_digest, offset = INDEX_ENTRY.unpack_from(self._mm, HEADER.size + middle * INDEX_ENTRY.size)
+            if entry_digest < digest:
+                low = middle + 1
+            elif entry_digest > digest:
+                high = middle
+            else:
+                record = self._decode(offset)
+                if record.id in self.stale_ids:
+                    break
+                self.hits += 1
+                return record
+
+        self.misses += 1
+        return None
+
+    def discard(self, api_key_id: str) -> None:
+        """密钥被更新或删除后不再从快照提供"""
+        if self._mm is not None:
+            self.stale_ids.add(api_key_id)
+
+    async def catch_up(self) -> None:
+        """找出快照生成后在数据库中变更或删除的密钥"""
+        from src.database.models import ApiKey
+
+        if self._mm is None:
+            return
+
+        changed_after = datetime.utcfromtimestamp(self._created_at) - CATCH_UP_SLACK
+        rows = await ApiKey.list_key_states(updated_after=changed_after)
+        self.stale_ids.update(row[0] for row in rows)
+
+        snapshot_ids = self._record_ids()
+        existing = await ApiKey.existing_ids(snapshot_ids)
+        self.stale_ids.update(api_key_id for api_key_id in snapshot_ids if api_key_id not in existing)
+        if self._mm is not None:
+            self._serve_until = time.monotonic() + self.warmup_seconds
+
+    async def write(self) -> int:
+        """从数据库生成新快照，先写临时文件再原子替换，返回记录数"""
+        from src.database.models import ApiKey
+
+        # 生成时间取查询之前，之后的变更都能被追赶覆盖
+        created_at = time.time()
+        rows = await ApiKey.list_auth_rows()
+
+        def _write():
+            data = encode_snapshot(rows, created_at)
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            temp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(temp_path, "wb") as f:
+                f.write(data)
+            os.replace(temp_path, self.path)
+
+        await asyncio.get_event_loop().run_in_executor(None, _write)
+        self.writes += 1
+        self.last_write_records = len(rows)
+        return len(rows)
+
+    async def _run(self) -> None:
+        try:
+            await self.catch_up()
+        except Exception as e:
+            logger.error(f"认证快照追赶变更失败，停用快照: {e}")
+            self.close()
+
+        # 预热期结束后关闭快照（没有查询命中快照时也释放映射）
+        if self._serve_until is not None:
+            await asyncio.sleep(self.warmup_seconds)
+            self.close()
+
+        while True:
+            await asyncio.sleep(self.interval_seconds)
+            if not self.acquire_writer():
+                continue
+            try:
+                await self.write()
+            except Exception as e:
+                logger.error(f"写入认证快照失败: {e}")
+
+    @property
+    def is_writer(self) -> bool:
+        return fcntl is None or self._writer_fd is not None
+
+    def acquire_writer(self) -> bool:
+        """尝试成为本主机负责写入快照的 worker，已持有或获得快照锁时返回True"""
+        if self.is_writer:
+            return True
+        try:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            fd = os.open(f"{self.path}.lock", os.O_RDWR | os.O_CREAT, 0o600)
+        except OSError as e:
+            logger.error(f"打开认证快照锁文件失败: {e}")
+            return False
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        self._writer_fd = fd
+        return True
+
+    def release_writer(self) -> None:
+        if self._writer_fd is not None:
+            os.close(self._writer_fd)
+            self._writer_fd = None
+
+    def start(self) -> None:
+        """启动后台追赶与定期写入任务"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """停止后台任务"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self.release_writer()
+        self.close()
+
+    def stats(self) -> Dict[str, float]:
+        """快照统计信息"""
+        return {
+            "loaded": self.loaded,
+            "serving": self.loaded and self._serve_until is not None,
+            "writer": self.is_writer,
+            "age_seconds": time.time() - self._created_at if self.loaded else None,
+            "records": self._count if self.loaded else 0,
+            "stale_keys": len(self.stale_ids),
+            "hits": self.hits,
+            "misses": self.misses,
+            "writes": self.writes,
+            "last_write_records": self.last_write_records,
+        }
+
+    def _record_ids(self) -> List[str]:
+        ids = []
+        for index in range(self._count):
+            offset = INDEX_ENTRY.unpack_from(self._mm, HEADER.size + index * INDEX_ENTRY.size)[1]
+            id_length = RECORD.unpack_from(self._mm, offset)[0]
+            start = offset + RECORD.size
+            ids.append(self._mm[start:start + id_length].decode())
+        return ids
+
+    def _decode(self, offset: int):
+        from src.utils.auth_cache import ApiKeyAuthRecord
+
+        *lengths, mask_length, expires = RECORD.unpack_from(self._mm, offset)
+        values = []
+        position = offset + RECORD.size
+        for length in lengths:
+            values.append(self._mm[position:position + length].decode())
+            position += length
+        mask = int.from_bytes(self._mm[position:position + mask_length], "little")
+        permissions = []
+        while mask:
+            lowest = mask & -mask
+            permissions.append(self._permissions[lowest.bit_length() - 1])
+            mask ^= lowest
+        api_key_id, tenant_id, agent_id, status, tenant_status, agent_status = values
+        return ApiKeyAuthRecord(
+            id=api_key_id,
+            tenant_id=tenant_id,
+            agent_id=agent_id,
+            status=status,
+            expires_at=EPOCH + timedelta(seconds=expires) if expires >= 0 else None,
+            permissions=permissions,
+            tenant_status=tenant_status or None,
+            agent_status=agent_status or None,
+        )
+
+
+# 全局快照实例
+auth_snapshot = AuthSnapshot(
+    path=settings.auth_snapshot_path,
+    interval_seconds=settings.auth_snapshot_interval_seconds,
+    max_age_seconds=settings.auth_snapshot_max_age_seconds,
+    warmup_seconds=settings.auth_snapshot_warmup_seconds,
+)
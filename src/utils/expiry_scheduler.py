@@ -0,0 +1,158 @@
+"""
+API密钥过期调度
+用最小堆维护即将到期的密钥，到期时批量将状态更新为 expired 并清除认证缓存，
+验证请求只读取过期时间，不再在请求内写库
+"""
+
+import asyncio
+import heapq
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+from src.common.config import settings
+from src.common.logger import get_logger
+
+logger = get_logger(__name__)
+
+# 写库失败后的重试间隔
+RETRY_DELAY = timedelta(seconds=5)
+
+
+def to_naive_utc(value: datetime) -> datetime:
+    """统一为不带时区的UTC时间，与数据库中的存储方式一致"""
+    if value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+class ApiKeyExpiryScheduler:
+    """按过期时间排序的最小堆，到期后批量标记并失效缓存"""
+
+    def __init__(self, refresh_interval_seconds: float = 60.0):
+        self.refresh_interval_seconds = refresh_interval_seconds
+        # 每次从数据库加载 2 个刷新周期内到期的密钥
+        self.horizon = timedelta(seconds=refresh_interval_seconds * 2)
+        self._heap: List[Tuple[datetime, str]] = []
+        self._loaded_until: Optional[datetime] = None
+        self._refreshed_at: Optional[datetime] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self.expired_total = 0
+        self.batches = 0
+
+    def schedule(self, api_key_id: str, expires_at: Optional[datetime]) -> None:
+        """登记新建或修改了过期时间的密钥"""
+        if not expires_at:
+            return
+        expires_at = to_naive_utc(expires_at)
+        if self._loaded_until is not None and expires_at > self._loaded_until:
+            # 超出已加载范围，由后续刷新加载
+            return
+        heapq.heappush(self._heap, (expires_at, api_key_id))
+        if self._wakeup is not None and self._heap[0][1] == api_key_id:
+            self._wakeup.set()
+
+    async def refresh(self) -> None:
+        """从数据库重新加载即将到期的活跃密钥"""
+        from src.database.models import ApiKey
+
+        now = datetime.utcnow()
+        loaded_until = now + self.horizon
+        rows = await ApiKey.list_expiring(before=loaded_until)
+        heap = [(to_naive_utc(expires_at), api_key_id) for api_key_id, expires_at in rows]
+        heapq.heapify(heap)
+        self._heap = heap
+        self._loaded_until = loaded_until
+        self._refreshed_at = now
+
+    async def expire_due(self) -> int:
+        """批量处理已到期的密钥，返回本次实际标记为过期的数量"""
+        from src.database.models import ApiKey
+        from src.utils.auth_cache import api_key_cache
+        from src.utils.signed_keys import signed_key_registry
+
+        now = datetime.utcnow()
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            due.append(heapq.heappop(self._heap)[1])
+        if not due:
+            return 0
+
+        due = list(dict.fromkeys(due))
+        try:
+            expired = await ApiKey.mark_expired(due, expired_before=now)
+        except Exception:
+            # 写库失败时放回堆中，下次重试
+            for api_key_id in due:
+                heapq.heappush(self._heap, (now + RETRY_DELAY, api_key_id))
+            raise
+
+        api_key_cache.invalidate_by_ids(due)
+        for api_key_id in due:
+            signed_key_registry.revoke(api_key_id)
+
+        # 已被删除、停用或延长有效期的密钥不会被标记，只统计实际更新的行数
+        self.expired_total += expired
+        self.batches += 1
+        return expired
+
+    def _next_delay(self) -> float:
+        delay = self.refresh_interval_seconds
+        if self._heap:
+            until_next = (self._heap[0][0] - datetime.utcnow()).total_seconds()
+            delay = min(delay, max(until_next, 0.0))
+        if self._refreshed_at is not None:
+            until_refresh = (
+                self._refreshed_at + timedelta(seconds=self.refresh_interval_seconds) - datetime.utcnow()
+            ).total_seconds()
+            delay = min(delay, max(until_refresh, 0.0))
+        return delay
+
+    async def _run(self) -> None:
+        self._wakeup = asyncio.Event()
+        while True:
+            try:
+                if (
+                    self._refreshed_at is None
+                    or datetime.utcnow() - self._refreshed_at >= timedelta(seconds=self.refresh_interval_seconds)
+                ):
+                    await self.refresh()
+                await self.expire_due()
+            except Exception as e:
+                logger.error(f"处理API密钥过期失败: {e}")
+
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self._next_delay())
+            except asyncio.TimeoutError:
+                pass
+
+    def start(self) -> None:
+        """启动后台调度任务"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """停止后台调度任务"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> Dict[str, float]:
+        """调度统计信息"""
+        return {
+            "scheduled": len(self._heap),
+            "next_expiry": self._heap[0][0].isoformat() if self._heap else None,
+            "expired_total": self.expired_total,
+            "batches": self.batches,
+        }
+
+
+# 全局调度实例
+expiry_scheduler = ApiKeyExpiryScheduler(
+    refresh_interval_seconds=settings.expiry_scheduler_refresh_seconds,
+)
@@ -0,0 +1,280 @@
+"""
+API密钥存在性过滤
+负缓存记录近期查询未命中的密钥，可在进程内直接拒绝；布隆过滤器记录全部已存在的密钥。
+布隆未命中的密钥可能是其他 worker 刚创建、尚未同步的密钥：等待一次在未命中之后开始的增量同步
+（并发的未命中共享同一次同步，两次同步至少间隔 confirm_interval_seconds），同步后仍未命中才拒绝，
+不再逐个查询数据库。增量同步只按创建时间索引读取最近创建的密钥。
+"""
+
+import asyncio
+import hashlib
+import math
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+from src.common.config import settings
+from src.common.logger import get_logger
+
+logger = get_logger(__name__)
+
+# 增量同步时回看的时间，容忍各实例之间的时钟偏差
+SYNC_SLACK = timedelta(seconds=60)
+
+
+class NegativeKeyCache:
+    """短TTL负缓存，记录数据库中不存在的密钥值"""
+
+    def __init__(self, max_size: int = 100000, ttl_seconds: float = 30.0):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, float]" = OrderedDict()
+
+    def __contains__(self, key_value: str) -> bool:
+        stored_at = self._entries.get(key_value)
+        if stored_at is None:
+            return False
+        if time.monotonic() - stored_at > self.ttl_seconds:
+            del self._entries[key_value]
+            return False
+        return True
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def add(self, key_value: str) -> None:
+        if self.max_size <= 0:
+            return
+        self._entries[key_value] = time.monotonic()
+        self._entries.move_to_end(key_value)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def discard(self, key_value: str) -> None:
+        self._entries.pop(key_value, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+class BloomFilter:
+    """基于双重哈希的布隆过滤器"""
+
+    def __init__(self, capacity: int, false_positive_rate: float = 0.01):
+        capacity = max(capacity, 1)
+        self.size = max(int(-capacity * math.log(false_positive_rate) / (math.log(2) ** 2)), 8)
+        self.hash_count = max(int(round(self.size / capacity * math.log(2))), 1)
+        self.count = 0
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, value: str):
+        digest = hashlib.blake2b(value.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        for i in range(self.hash_count):
+            yield (h1 + i * h2) % self.size
+
+    def add(self, value: str) -> None:
+        for pos in self._positions(value):
+            self._bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, value: str) -> bool:
+        bits = self._bits
+        for pos in self._positions(value):
+            if not bits[pos >> 3] & (1 << (pos & 7)):
+                return False
+        return True
+
+
+class ApiKeyFilter:
+    """组合负缓存与布隆过滤器，并在后台定期同步布隆过滤器"""
+
+    def __init__(
+        self,
+        negative_cache: NegativeKeyCache,
+        bloom_enabled: bool = True,
+        false_positive_rate: float = 0.01,
+        sync_interval_seconds: float = 5.0,
+        rebuild_interval_seconds: float = 600.0,
+        confirm_interval_seconds: float = 0.1,
+    ):
+        self.negative_cache = negative_cache
+        self.bloom_enabled = bloom_enabled
+        self.false_positive_rate = false_positive_rate
+        self.sync_interval_seconds = sync_interval_seconds
+        self.rebuild_interval_seconds = rebuild_interval_seconds
+        self.confirm_interval_seconds = confirm_interval_seconds
+        # 首次完整构建前不使用布隆过滤器拒绝请求
+        self._bloom: Optional[BloomFilter] = None
+        # 已同步密钥中最大的创建时间（取自数据库，不依赖本机时钟）
+        self._watermark: Optional[datetime] = None
+        self._rebuilt_at = 0.0
+        self._task: Optional[asyncio.Task] = None
+        # 等待下一次确认同步的调用方共享的结果（同步是否成功）
+        self._confirm_waiters: Optional[asyncio.Future] = None
+        self._confirm_task: Optional[asyncio.Task] = None
+        self._confirmed_at = -math.inf
+        self.negative_cache_rejections = 0
+        self.bloom_misses = 0
+        self.bloom_rejections = 0
+        self.bloom_lagged = 0
+        self.confirm_syncs = 0
+
+    async def might_exist(self, key_value: str) -> bool:
+        """返回False表示密钥确认不存在，可直接拒绝；返回True时需查询数据库"""
+        if key_value in self.negative_cache:
+            self.negative_cache_rejections += 1
+            return False
+        bloom = self._bloom
+        if bloom is None or key_value in bloom:
+            return True
+
+        self.bloom_misses += 1
+        # 同步失败时无法确认，回退到数据库
+        if not await self._confirm() or key_value in self._bloom:
+            return True
+        self.bloom_rejections += 1
+        self.negative_cache.add(key_value)
+        return False
+
+    async def _confirm(self) -> bool:
+        """等待一次在调用之后开始的增量同步，返回同步是否成功"""
+        if self._confirm_waiters is None:
+            self._confirm_waiters = asyncio.get_running_loop().create_future()
+            if self._confirm_task is None or self._confirm_task.done():
+                self._confirm_task = asyncio.ensure_future(self._run_confirm())
+        # 单个调用方被取消不影响共享的同步
+        return await asyncio.shield(self._confirm_waiters)
+
+    async def _run_confirm(self) -> None:
+        while self._confirm_waiters is not None:
+            delay = self._confirmed_at + self.confirm_interval_seconds - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            # 此后到达的未命中等待下一次同步：本次查询可能早于其密钥的创建
+            waiters, self._confirm_waiters = self._confirm_waiters, None
+            self._confirmed_at = time.monotonic()
+            self.confirm_syncs += 1
+            try:
+                await self.sync()
+                synced = True
+            except Exception as e:
+                logger.error(f"确认布隆过滤器未命中时同步失败: {e}")
+                synced = False
+            waiters.set_result(synced)
+
+    def record_miss(self, key_value: str) -> None:
+        """记录一次数据库未命中"""
+        self.negative_cache.add(key_value)
+
+    def record_found(self, key_value: str) -> None:
+        """数据库命中时调用，补登尚未同步到布隆过滤器的密钥"""
+        bloom = self._bloom
+        if bloom is not None and key_value not in bloom:
+            bloom.add(key_value)
+            self.bloom_lagged += 1
+
+    def add(self, key_value: str) -> None:
+        """登记新创建的密钥"""
+        self.negative_cache.discard(key_value)
+        if self._bloom is not None:
+            self._bloom.add(key_value)
+
+    async def rebuild(self) -> None:
+        """从数据库完整重建布隆过滤器"""
+        from src.database.models import ApiKey
+
+        rows = await ApiKey.list_key_values()
+
+        def _build():
+            bloom = BloomFilter(max(len(rows) * 2, 1024), self.false_positive_rate)
+            for key_value, _ in rows:
+                bloom.add(key_value)
+            return bloom
+
+        self._bloom = await asyncio.get_event_loop().run_in_executor(None, _build)
+        self._watermark = max((created_at for _, created_at in rows if created_at), default=None)
+        self._rebuilt_at = time.monotonic()
+        # 补齐构建期间新建的密钥
+        await self.sync()
+
+    async def sync(self) -> None:
+        """增量同步上次同步后新建的密钥"""
+        from src.database.models import ApiKey
+
+        if self._bloom is None:
+            return
+
+        # 从已见过的最大创建时间回看，覆盖同一时刻稍后才提交的写入
+        rows = await ApiKey.list_key_values(
+            created_after=self._watermark - SYNC_SLACK if self._watermark else None
+        )
+        for key_value, created_at in rows:
+            self._bloom.add(key_value)
+            self.negative_cache.discard(key_value)
+            if created_at and (self._watermark is None or created_at > self._watermark):
+                self._watermark = created_at
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                if self._bloom is None or time.monotonic() - self._rebuilt_at >= self.rebuild_interval_seconds:
+                    await self.rebuild()
+                else:
+                    await self.sync()
+            except Exception as e:
+                logger.error(f"同步API密钥布隆过滤器失败: {e}")
+            await asyncio.sleep(self.sync_interval_seconds)
+
+    def start(self) -> None:
+        """启动后台同步任务"""
+        if self.bloom_enabled and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """停止后台同步任务"""
+        for task in (self._task, self._confirm_task):
+            if task is not None:
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        self._task = None
+        self._confirm_task = None
+        if self._confirm_waiters is not None:
+            self._confirm_waiters.set_result(False)
+            self._confirm_waiters = None
+
+    def stats(self) -> Dict[str, float]:
+        """过滤器统计信息"""
+        bloom = self._bloom
+        return {
+            "negative_cache_size": len(self.negative_cache),
+            "negative_cache_rejections": self.negative_cache_rejections,
+            "bloom_enabled": self.bloom_enabled,
+            "bloom_ready": bloom is not None,
+            "bloom_insertions": bloom.count if bloom else 0,
+            "bloom_bits": bloom.size if bloom else 0,
+            "bloom_misses": self.bloom_misses,
+            "bloom_rejections": self.bloom_rejections,
+            "bloom_lagged": self.bloom_lagged,
+            "confirm_syncs": self.confirm_syncs,
+            "rejections": self.negative_cache_rejections + self.bloom_rejections,
+        }
+
+
+# 全局过滤器实例
+api_key_filter = ApiKeyFilter(
+    negative_cache=NegativeKeyCache(
+        max_size=settings.auth_negative_cache_max_size,
+        ttl_seconds=settings.auth_negative_cache_ttl_seconds,
+    ),
+    bloom_enabled=settings.auth_bloom_filter_enabled,
+    false_positive_rate=settings.auth_bloom_false_positive_rate,
+    sync_interval_seconds=settings.auth_bloom_sync_interval_seconds,
+    rebuild_interval_seconds=settings.auth_bloom_rebuild_interval_seconds,
+    confirm_interval_seconds=settings.auth_bloom_confirm_interval_seconds,
+)
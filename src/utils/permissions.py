@@ -0,0 +1,141 @@
+"""
+权限位图与通配权限匹配
+为每个权限字符串分配一个固定的位，密钥的权限列表在加载时预编译为整数位图，
+单个权限检查为一次按位与，多个权限检查为子集判断。
+
+权限按 ":" 分段（如 chat:send），授权中的 "*" 为通配段：
+- 位于末尾时匹配其后一个或多个段（"chat:*" 匹配 chat:send、chat:send:text，"*" 匹配全部权限）
+- 位于中间时匹配恰好一个段（"*:read" 匹配 config:read）
+含通配段的授权编译为前缀树，匹配代价与权限的段数成正比，与授权数量无关
+"""
+
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+PERMISSION_SEPARATOR = ":"
+WILDCARD = "*"
+
+
+class PermissionRegistry:
+    """进程内权限字符串到位的映射"""
+
+    def __init__(self):
+        self._bits: Dict[str, int] = {}
+
+    def intern(self, permission: str) -> int:
+        """返回权限对应的位，不存在时分配新位"""
+        bit = self._bits.get(permission)
+        if bit is None:
+            bit = 1 << len(self._bits)
+            self._bits[permission] = bit
+        return bit
+
+    def compile(self, permissions: Optional[Iterable[str]]) -> int:
+        """将权限列表编译为位图"""
+        mask = 0
+        for permission in permissions or ():
+            mask |= self.intern(permission)
+        return mask
+
+    def lookup(self, permissions: Iterable[str]) -> Optional[int]:
+        """返回所需权限的位图；存在未登记的权限时返回None（任何密钥都不可能拥有）"""
+        mask = 0
+        for permission in permissions:
+            bit = self._bits.get(permission)
+            if bit is None:
+                return None
+            mask |= bit
+        return mask
+
+    def __len__(self) -> int:
+        return len(self._bits)
+
+
+class PermissionTrie:
+    """通配授权编译后的前缀树"""
+
+    __slots__ = ("children", "terminal", "match_rest")
+
+    def __init__(self):
+        self.children: Dict[str, "PermissionTrie"] = {}
+        # 授权在此结束（精确匹配到此为止的权限）
+        self.terminal = False
+        # 授权以 "*" 结尾，匹配其后任意一个或多个段
+        self.match_rest = False
+
+    def add(self, grant: str) -> None:
+        node = self
+        segments = grant.split(PERMISSION_SEPARATOR)
+        for index, segment in enumerate(segments):
+            if segment == WILDCARD and index == len(segments) - 1:
+                node.match_rest = True
+                return
+            node = node.children.setdefault(segment, PermissionTrie())
+        node.terminal = True
+
+    def matches(self, permission: str) -> bool:
+        return self._match(permission.split(PERMISSION_SEPARATOR), 0)
+
+    def _match(self, segments, index: int) -> bool:
+        if index == len(segments):
+            return self.terminal
+        if self.match_rest:
+            return True
+        child = self.children.get(segments[index])
+        if child is not None and child._match(segments, index + 1):
+            return True
+        wildcard = self.children.get(WILDCARD)
+        return wildcard is not None and wildcard._match(segments, index + 1)
+
+
+def is_wildcard_grant(permission: str) -> bool:
+    return WILDCARD in permission.split(PERMISSION_SEPARATOR)
+
+
+@lru_cache(maxsize=4096)
+def _compile_trie(grants: Tuple[str, ...]) -> PermissionTrie:
+    trie = PermissionTrie()
+    for grant in grants:
+        trie.add(grant)
+    return trie
+
+
+def compile_permission_trie(permissions: Optional[Iterable[str]]) -> Optional[PermissionTrie]:
+    """编译密钥中的通配授权，无通配授权时返回None；相同的授权集合共享同一棵树"""
+    grants = tuple(sorted({p for p in permissions or () if is_wildcard_grant(p)}))
+    if not grants:
+        return None
+    return _compile_trie(grants)
+
+
+def mask_has_all(mask: int, required: Optional[int]) -> bool:
+    """位图是否包含全部所需权限"""
+    return required is not None and mask & required == required
+
+
+def permission_matrix(
+    grants: Iterable[Tuple[int, Optional[PermissionTrie]]],
+    permissions: Sequence[str],
+) -> List[List[bool]]:
+    """计算 授权×权限 的布尔矩阵，grants 为每行的 (权限位图, 通配前缀树)
+
+    每列的权限位只查找一次，每行为一组按位与；通配前缀树的匹配结果按树缓存，
+    共享同一授权集合的行只匹配一次
+    """
+    bits = [permission_registry.lookup((permission,)) or 0 for permission in permissions]
+    trie_rows: Dict[int, List[bool]] = {}
+    matrix = []
+    for mask, trie in grants:
+        row = [mask & bit != 0 for bit in bits]
+        if trie is not None:
+            matched = trie_rows.get(id(trie))
+            if matched is None:
+                matched = [trie.matches(permission) for permission in permissions]
+                trie_rows[id(trie)] = matched
+            row = [exact or wildcard for exact, wildcard in zip(row, matched)]
+        matrix.append(row)
+    return matrix
+
+
+# 全局权限注册表
+permission_registry = PermissionRegistry()
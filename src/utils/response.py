@@ -42,6 +42,15 @@ class PaginatedResponse(BaseModel):
     execution_time: Optional[float] = None
 
 
+class BulkItemResult(BaseModel):
+    """批量操作的单项结果"""
+    index: int
+    success: bool
+    data: Optional[Any] = None
+    error: Optional[str] = None
+    error_code: Optional[str] = None
+
+
 def create_success_response(
     message: str,
     data: Any = None,
@@ -119,4 +128,26 @@ def calculate_pagination(
         total_pages=total_pages,
         has_next=page < total_pages,
         has_prev=page > 1
-    )
\ No newline at end of file
+    )
+
+
+def create_bulk_response(
+    message: str,
+    results: List[BulkItemResult],
+    tenant_id: Optional[str] = None,
+    execution_time: Optional[float] = None,
+    request_id: Optional[str] = None
+) -> ApiResponse:
+    """创建批量操作响应，data 含逐项结果（按请求顺序）与成功/失败数"""
+    succeeded = sum(1 for result in results if result.success)
+    return create_success_response(
+        message=message,
+        data={
+            "items": [result.model_dump() for result in results],
+            "succeeded": succeeded,
+            "failed": len(results) - succeeded
+        },
+        tenant_id=tenant_id,
+        execution_time=execution_time,
+        request_id=request_id
+    )
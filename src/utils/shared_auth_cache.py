@@ -0,0 +1,391 @@
+"""
+跨 worker 共享的API密钥认证缓存
+同一主机上的多个 uvicorn worker 通过内存映射文件共享一张固定槽位的哈希表，
+一个 worker 查询数据库后写入的记录可被其他 worker 直接读取。
+
+- 读无锁：每个槽位带序列号（seqlock），写入期间为奇数，读取前后序列号一致且为偶数时数据有效
+- 写互斥：写入与失效通过文件锁串行化
+- 失效：单条失效清空槽位；按ID失效经 ID 索引（ID摘要 -> 密钥摘要）直接定位槽位；
+  全量失效递增文件头中的代数，代数不一致的槽位视为空
+- 失效纪元：每次失效递增该ID所在分桶的纪元，各 worker 的进程内缓存命中时比对纪元，
+  其他 worker 失效过的记录不再从进程内缓存提供
+- 文件布局变化时写入新文件并原子替换，已映射旧文件的进程不受影响
+
+文件布局: 文件头 | 槽位 × slots | ID索引 × slots | 纪元分桶 × EPOCH_BUCKETS
+"""
+
+import hashlib
+import json
+import mmap
+import os
+import struct
+import tempfile
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+from src.common.config import settings
+from src.common.logger import get_logger
+
+try:
+    import fcntl
+except ImportError:  # 非 POSIX 平台不支持共享缓存
+    fcntl = None
+
+logger = get_logger(__name__)
+
+MAGIC = b"MMCAUTH3"
+# 文件头: magic, 槽位数, 槽位大小, 代数
+HEADER = struct.Struct("<8sIIQ")
+HEADER_SIZE = 64
+GENERATION_OFFSET = 16
+# 槽位头: 序列号, 代数, 密钥摘要, ID摘要, 写入时间, 数据长度
+SLOT = struct.Struct("<IQ16s8sdH")
+SLOT_HEADER_SIZE = 48
+SEQ = struct.Struct("<I")
+GENERATION = struct.Struct("<Q")
+# ID索引项: ID摘要, 密钥摘要
+ID_ENTRY = struct.Struct("<8s16s")
+# 失效纪元分桶（按ID摘要分桶，每桶一个计数）
+EPOCH_BUCKETS = 65536
+ID_EPOCH = struct.Struct("<I")
+# 线性探测的最大槽位数
+PROBE_LIMIT = 4
+EMPTY_DIGEST = b"\0" * 16
+EMPTY_ID_DIGEST = b"\0" * 8
+EPOCH = datetime(1970, 1, 1)
+
+
+def _key_digest(key_value: str) -> bytes:
+    return hashlib.blake2b(key_value.encode(), digest_size=16).digest()
+
+
+def _id_digest(api_key_id: str) -> bytes:
+    return hashlib.blake2b(api_key_id.encode(), digest_size=8).digest()
+
+
+def default_shared_cache_path() -> str:
+    """默认放在 /dev/shm（不存在时使用临时目录），按端口区分同一主机上的不同服务"""
+    directory = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+    return os.path.join(directory, f"maimconfig_auth_{settings.port}.cache")
+
+
+class SharedAuthTable:
+    """内存映射的固定槽位哈希表"""
+
+    def __init__(self, path: str, slots: int = 16384, slot_size: int = 512, ttl_seconds: float = 60.0):
+        self.path = path
+        self.slots = slots
+        self.slot_size = slot_size
+        self.ttl_seconds = ttl_seconds
+        self._index_offset = HEADER_SIZE + slots * slot_size
+        self._epoch_offset = self._index_offset + slots * ID_ENTRY.size
+        self._size = self._epoch_offset + EPOCH_BUCKETS * ID_EPOCH.size
+        self._fd: Optional[int] = None
+        self._mm: Optional[mmap.mmap] = None
+        self.hits = 0
+        self.misses = 0
+        self.torn_reads = 0
+        self.writes = 0
+        self.oversized = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self._mm is not None
+
+    def open(self) -> bool:
+        """打开（必要时创建）共享文件，失败时禁用共享缓存"""
+        if self._mm is not None:
+            return True
+        if fcntl is None or self.slots <= 0:
+            return False
+
+        try:
+            # 检查与创建由独立的锁文件串行化，避免多个 worker 各自替换文件
+            lock_fd = os.open(f"{self.path}.lock", os.O_RDWR | os.O_CREAT, 0o600)
+            try:
+                fcntl.flock(lock_fd, fcntl.LOCK_EX)
+                fd = self._open_existing()
+                if fd is None:
+                    self._create()
+                    fd = self._open_existing()
+                if fd is None:
+                    raise OSError(f"无法初始化共享缓存文件 {self.path}")
+            finally:
+                os.close(lock_fd)
+            self._mm = mmap.mmap(fd, self._size)
+            self._fd = fd
+            return True
+        except OSError as e:
+            logger.warning(f"共享认证缓存不可用，仅使用进程内缓存: {e}")
+            return False
+
+    def _open_existing(self) -> Optional[int]:
+        """打开布局一致的现有文件，不存在或布局不一致时返回None"""
+        try:
+            fd = os.open(self.path, os.O_RDWR)
+        except FileNotFoundError:
+            return None
+        header = os.pread(fd, HEADER.size, 0)
+        if (
+            os.fstat(fd).st_size == self._size
+            and len(header) == HEADER.size
+            and HEADER.unpack(header)[:3] == (MAGIC, self.slots, self.slot_size)
+        ):
+            return fd
+        os.close(fd)
+        return None
+
+    def _create(self) -> None:
+        """写入新的空文件并原子替换；已映射旧文件的进程继续使用旧文件，不会读到被截断的映射"""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temp_path = f"{self.path}.{os.getpid()}.tmp"
+        fd = os.open(temp_path, os.O_RDWR | os.O_CREAT | os.O_TRUNC, 0o600)
+        try:
+            os.ftruncate(fd, self._size)
+            os.pwrite(fd, HEADER.pack(MAGIC, self.slots, self.slot_size, 1), 0)
+        finally:
+            os.close(fd)
+        os.replace(temp_path, self.path)
+
+    def close(self) -> None:
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    def get(self, key_value: str):
+        """无锁读取，返回认证记录；槽位正在写入或已过期时视为未命中"""
+        if self._mm is None:
+            return None
+
+        digest = _key_digest(key_value)
+        generation = self._generation()
+        now = time.time()
+        for offset in self._probe(digest):
+            seq, slot_generation, slot_digest, _, stored_at, length = SLOT.unpack_from(self._mm, offset)
+            if slot_digest != digest:
+                continue
+            if seq & 1:
+                self.torn_reads += 1
+                break
+            payload = self._mm[offset + SLOT_HEADER_SIZE:offset + SLOT_HEADER_SIZE + length]
+            if SEQ.unpack_from(self._mm, offset)[0] != seq:
+                self.torn_reads += 1
+                break
+            if slot_generation != generation or now - stored_at > self.ttl_seconds:
+                break
+            self.hits += 1
+            return self._decode(payload)
+
+        self.misses += 1
+        return None
+
+    def put(self, key_value: str, record) -> None:
+        """写入记录；探测范围内无空位时覆盖最早写入的槽位"""
+        if self._mm is None:
+            return
+
+        payload = self._encode(record)
+        if len(payload) > self.slot_size - SLOT_HEADER_SIZE:
+            self.oversized += 1
+            return
+
+        digest = _key_digest(key_value)
+        with self._locked():
+            generation = self._generation()
+            now = time.time()
+            target = None
+            oldest = None
+            for offset in self._probe(digest):
+                _, slot_generation, slot_digest, _, stored_at, _ = SLOT.unpack_from(self._mm, offset)
+                if slot_digest == digest:
+                    target = offset
+                    break
+                if (
+                    target is None
+                    and (slot_digest == EMPTY_DIGEST or slot_generation != generation or now - stored_at > self.ttl_seconds)
+                ):
+                    target = offset
+                if oldest is None or stored_at < oldest[0]:
+                    oldest = (stored_at, offset)
+            if target is None:
+                target = oldest[1]
+
+            id_digest = _id_digest(record.id)
+            self._write_slot(target, generation, digest, id_digest, now, payload)
+            self._index_put(id_digest, digest)
+        self.writes += 1
+
+    def stamp(self, api_key_id: str) -> Optional[tuple]:
+        """进程内缓存写入时记录的失效标记（代数, 该ID所在分桶的纪元）；标记变化说明已被某个 worker 失效"""
+        if self._mm is None:
+            return None
+        return self._generation(), ID_EPOCH.unpack_from(self._mm, self._epoch_slot(_id_digest(api_key_id)))[0]
+
+    def invalidate(self, key_value: str, api_key_id: Optional[str] = None) -> None:
+        """按密钥值失效，同时递增该密钥ID的失效纪元（未提供ID时取槽位中记录的ID）"""
+        if self._mm is None:
+            return
+        digest = _key_digest(key_value)
+        with self._locked():
+            id_digests = {_id_digest(api_key_id)} if api_key_id else set()
+            for offset in self._probe(digest):
+                slot = SLOT.unpack_from(self._mm, offset)
+                if slot[2] == digest:
+                    id_digests.add(slot[3])
+                    self._clear_slot(offset)
+            for id_digest in id_digests:
+                self._bump_epoch(id_digest)
+
+    def invalidate_by_id(self, api_key_id: str) -> None:
+        """按API密钥ID失效"""
+        self.invalidate_by_ids((api_key_id,))
+
+    def invalidate_by_ids(self, api_key_ids) -> None:
+        """按API密钥ID批量失效，经ID索引直接定位槽位"""
+        if self._mm is None:
+            return
+        id_digests = {_id_digest(api_key_id) for api_key_id in api_key_ids}
+        if not id_digests:
+            return
+        with self._locked():
+            for id_digest in id_digests:
+                self._bump_epoch(id_digest)
+                for index_offset in self._index_probe(id_digest):
+                    entry_id, key_digest = ID_ENTRY.unpack_from(self._mm, index_offset)
+                    if entry_id != id_digest:
+                        continue
+                    self._clear_key_slot(key_digest, id_digest)
+                    ID_ENTRY.pack_into(self._mm, index_offset, EMPTY_ID_DIGEST, EMPTY_DIGEST)
+
+    def clear(self) -> None:
+        """递增代数，使全部槽位失效"""
+        if self._mm is None:
+            return
+        with self._locked():
+            GENERATION.pack_into(self._mm, GENERATION_OFFSET, self._generation() + 1)
+
+    def stats(self) -> Dict[str, float]:
+        """共享缓存统计信息（计数为本进程）"""
+        total = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "slots": self.slots,
+            "generation": self._generation() if self._mm is not None else 0,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "torn_reads": self.torn_reads,
+            "writes": self.writes,
+            "oversized": self.oversized,
+        }
+
+    def _generation(self) -> int:
+        return GENERATION.unpack_from(self._mm, GENERATION_OFFSET)[0]
+
+    def _probe(self, digest: bytes):
+        start = int.from_bytes(digest[:8], "little") % self.slots
+        for step in range(min(PROBE_LIMIT, self.slots)):
+            yield HEADER_SIZE + ((start + step) % self.slots) * self.slot_size
+
+    def _index_probe(self, id_digest: bytes):
+        start = int.from_bytes(id_digest, "little") % self.slots
+        for step in range(min(PROBE_LIMIT, self.slots)):
+            yield self._index_offset + ((start + step) % self.slots) * ID_ENTRY.size
+
+    def _epoch_slot(self, id_digest: bytes) -> int:
+        return self._epoch_offset + (int.from_bytes(id_digest, "little") % EPOCH_BUCKETS) * ID_EPOCH.size
+
+    def _bump_epoch(self, id_digest: bytes) -> None:
+        offset = self._epoch_slot(id_digest)
+        ID_EPOCH.pack_into(self._mm, offset, (ID_EPOCH.unpack_from(self._mm, offset)[0] + 1) & 0xFFFFFFFF)
+
+    def _index_put(self, id_digest: bytes, key_digest: bytes) -> None:
+        """记录ID到密钥摘要的映射；探测范围内无空位时挤出第一项，并清除其指向的槽位，保证有记录的槽位都能按ID找到"""
+        target = None
+        for offset in self._index_probe(id_digest):
+            entry_id = ID_ENTRY.unpack_from(self._mm, offset)[0]
+            if entry_id == id_digest:
+                target = offset
+                break
+            if target is None and entry_id == EMPTY_ID_DIGEST:
+                target = offset
+        if target is None:
+            target = next(self._index_probe(id_digest))
+            evicted_id, evicted_key = ID_ENTRY.unpack_from(self._mm, target)
+            self._clear_key_slot(evicted_key, evicted_id)
+        ID_ENTRY.pack_into(self._mm, target, id_digest, key_digest)
+
+    def _clear_key_slot(self, key_digest: bytes, id_digest: bytes) -> None:
+        for offset in self._probe(key_digest):
+            _, _, slot_digest, slot_id, _, _ = SLOT.unpack_from(self._mm, offset)
+            if slot_digest == key_digest and slot_id == id_digest:
+                self._clear_slot(offset)
+
+    def _clear_slot(self, offset: int) -> None:
+        self._write_slot(offset, 0, EMPTY_DIGEST, EMPTY_ID_DIGEST, 0.0, b"")
+
+    def _write_slot(self, offset: int, generation: int, digest: bytes, id_digest: bytes, stored_at: float, payload: bytes) -> None:
+        seq = SEQ.unpack_from(self._mm, offset)[0]
+        # 奇数序列号表示写入中，读者会放弃该槽位
+        SEQ.pack_into(self._mm, offset, (seq + 1) & 0xFFFFFFFF)
+        self._mm[offset + SLOT_HEADER_SIZE:offset + SLOT_HEADER_SIZE + len(payload)] = payload
+        SLOT.pack_into(self._mm, offset, (seq + 1) & 0xFFFFFFFF, generation, digest, id_digest, stored_at, len(payload))
+        SEQ.pack_into(self._mm, offset, (seq + 2) & 0xFFFFFFFF)
+
+    def _locked(self):
+        return _FileLock(self._fd)
+
+    @staticmethod
+    def _encode(record) -> bytes:
+        expires_at = (record.expires_at - EPOCH).total_seconds() if record.expires_at else None
+        return json.dumps(
+            [
+                record.id, record.tenant_id, record.agent_id, record.status, expires_at,
+                record.permissions, record.tenant_status, record.agent_status,
+            ],
+            separators=(",", ":"),
+        ).encode()
+
+    @staticmethod
+    def _decode(payload: bytes):
+        from src.utils.auth_cache import ApiKeyAuthRecord
+
+        api_key_id, tenant_id, agent_id, status, expires_at, permissions, tenant_status, agent_status = json.loads(payload)
+        return ApiKeyAuthRecord(
+            id=api_key_id,
+            tenant_id=tenant_id,
+            agent_id=agent_id,
+            status=status,
+            expires_at=EPOCH + timedelta(seconds=expires_at) if expires_at is not None else None,
+            permissions=permissions,
+            tenant_status=tenant_status,
+            agent_status=agent_status,
+        )
+
+
+class _FileLock:
+    """写入方之间的文件锁"""
+
+    def __init__(self, fd: int):
+        self.fd = fd
+
+    def __enter__(self):
+        fcntl.flock(self.fd, fcntl.LOCK_EX)
+
+    def __exit__(self, *exc):
+        fcntl.flock(self.fd, fcntl.LOCK_UN)
+
+
+# 全局共享缓存实例（在服务启动时打开）
+shared_auth_table = SharedAuthTable(
+    path=settings.auth_shared_cache_path or default_shared_cache_path(),
+    slots=settings.auth_shared_cache_slots if settings.auth_shared_cache_enabled else 0,
+    slot_size=settings.auth_shared_cache_slot_size,
+    ttl_seconds=settings.auth_cache_ttl_seconds,
+)
@@ -0,0 +1,302 @@
+"""
+自校验API密钥（v2格式）
+密钥格式: mmc2.{base64url(payload)}.{base64url(signature)}
+payload: {tenant_id}|{agent_id}|{key_id}|{expires_at}|{permission_digest}|{random}
+签名为 HMAC-SHA256，覆盖整个 payload，密钥为 API_KEY_SIGNING_SECRET；未配置时不签发也不接受v2密钥。
+签名有效、未过期、已从数据库确认存在且仍可用的密钥可在进程内直接通过验证
+"""
+
+import asyncio
+import base64
+import calendar
+import hashlib
+import hmac
+import json
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Set
+
+from src.common.config import settings
+from src.common.logger import get_logger
+
+logger = get_logger(__name__)
+
+SIGNED_KEY_PREFIX = "mmc2."
+SIGNED_KEY_VERSION = "v2"
+SIGNATURE_BYTES = 16
+
+# 增量同步时回看的时间，容忍各实例之间的时钟偏差
+SYNC_SLACK = timedelta(seconds=60)
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).decode().rstrip("=")
+
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+class SigningSecretMissing(RuntimeError):
+    """未配置 API_KEY_SIGNING_SECRET"""
+
+
+def signing_enabled() -> bool:
+    """是否配置了专用签名密钥"""
+    return bool(settings.api_key_signing_secret)
+
+
+def _signing_secret() -> bytes:
+    # 不回退到 SECRET_KEY：其默认值是公开的模板值，用它签名等于任何人都能伪造密钥
+    if not signing_enabled():
+        raise SigningSecretMissing("未配置 API_KEY_SIGNING_SECRET，无法签发或校验v2密钥")
+    return settings.api_key_signing_secret.encode()
+
+
+def issue_format_version() -> str:
+    """新密钥使用的格式版本：配置为v2但未配置签名密钥时签发v1"""
+    if settings.api_key_format_version == SIGNED_KEY_VERSION and not signing_enabled():
+        return "v1"
+    return settings.api_key_format_version
+
+
+def _sign(payload: str) -> bytes:
+    return hmac.new(_signing_secret(), payload.encode(), hashlib.sha256).digest()[:SIGNATURE_BYTES]
+
+
+def permission_digest(permissions: Optional[List[str]]) -> str:
+    """权限列表摘要，与顺序和重复项无关"""
+    canonical = json.dumps(sorted(set(permissions or [])), separators=(",", ":"))
+    return hashlib.sha256(canonical.encode()).hexdigest()[:16]
+
+
+def expires_at_to_epoch(expires_at: Optional[datetime]) -> int:
+    """过期时间（UTC）转换为秒级时间戳，0表示永不过期"""
+    if not expires_at:
+        return 0
+    return calendar.timegm(expires_at.utctimetuple())
+
+
+def is_signed_api_key(api_key: str) -> bool:
+    return api_key.startswith(SIGNED_KEY_PREFIX)
+
+
+def generate_signed_api_key(
+    tenant_id: str,
+    agent_id: str,
+    key_id: str,
+    expires_at: Optional[datetime] = None,
+    permissions: Optional[List[str]] = None,
+) -> str:
+    """生成v2签名密钥"""
+    payload = "|".join([
+        tenant_id,
+        agent_id,
+        key_id,
+        str(expires_at_to_epoch(expires_at)),
+        permission_digest(permissions),
+        uuid.uuid4().hex[:16],
+    ])
+    encoded_payload = _b64encode(payload.encode())
+    return f"{SIGNED_KEY_PREFIX}{encoded_payload}.{_b64encode(_sign(encoded_payload))}"
+
+
+def decode_signed_api_key(api_key: str, verify: bool = True) -> Optional[dict]:
+    """解码v2签名密钥，verify为True时签名不匹配返回None"""
+    try:
+        if not is_signed_api_key(api_key):
+            return None
+
+        encoded_payload, encoded_signature = api_key[len(SIGNED_KEY_PREFIX):].split(".")
+        # 比较规范编码而非解码后的字节：末字符的填充位不参与解码，否则同一密钥有多种写法都能通过验签
+        if verify and not hmac.compare_digest(encoded_signature, _b64encode(_sign(encoded_payload))):
+            return None
+
+        tenant_id, agent_id, key_id, expires_at, digest, random_hash = _b64decode(encoded_payload).decode().split("|")
+        expires_epoch = int(expires_at)
+        return {
+            "tenant_id": tenant_id,
+            "agent_id": agent_id,
+            "key_id": key_id,
+            "expires_at": datetime.utcfromtimestamp(expires_epoch) if expires_epoch else None,
+            "expires_epoch": expires_epoch,
+            "permission_digest": digest,
+            "random_hash": random_hash,
+            "version": SIGNED_KEY_VERSION,
+            "format_valid": True,
+        }
+    except Exception:
+        return None
+
+
+class SignedKeyRegistry:
+    """v2密钥的本地校验状态
+
+    - tracked_ids: 已从数据库（同步或数据库校验）确认可用的密钥ID，只有这些密钥可在本地放行；
+      状态非active、所属租户/Agent不可用、权限/过期时间已与签名内容不一致或已删除的密钥移出该集合，走数据库校验
+    - permissions_by_digest: 权限摘要到权限列表的映射，用于在本地还原密钥权限
+    - _revoked_at: 本地吊销的时间，仅保留到下一次同步完成，避免吊销前发出的同步查询把密钥重新加入 tracked_ids
+    """
+
+    def __init__(
+        self,
+        sync_interval_seconds: float = 10.0,
+        rebuild_interval_seconds: float = 600.0,
+        max_tracked_keys: int = 100000,
+    ):
+        self.sync_interval_seconds = sync_interval_seconds
+        self.rebuild_interval_seconds = rebuild_interval_seconds
+        self.max_tracked_keys = max_tracked_keys
+        self._revoked_at: Dict[str, float] = {}
+        self.permissions_by_digest: Dict[str, List[str]] = {}
+        self.tracked_ids: Set[str] = set()
+        self._synced_at: Optional[datetime] = None
+        self._rebuilt_at = 0.0
+        self._task: Optional[asyncio.Task] = None
+        self.local_accepts = 0
+        self.signature_rejects = 0
+        self.fallbacks = 0
+
+    def verify(self, api_key: str) -> Optional[dict]:
+        """验证v2密钥签名，返回声明；签名无效返回None"""
+        claims = decode_signed_api_key(api_key)
+        if claims is None:
+            self.signature_rejects += 1
+        return claims
+
+    def resolve(self, claims: dict):
+        """根据已验签的声明在本地构建认证记录，无法确定时返回None（需查询数据库）"""
+        from src.utils.auth_cache import ApiKeyAuthRecord
+
+        key_id = claims["key_id"]
+        permissions = self.permissions_by_digest.get(claims["permission_digest"])
+        # 签名有效但未从数据库见过的密钥（可能已删除或尚未同步）走数据库校验
+        if (
+            self._synced_at is None
+            or key_id not in self.tracked_ids
+            or permissions is None
+        ):
+            self.fallbacks += 1
+            return None
+
+        self.local_accepts += 1
+        # 所属租户/Agent不可用的密钥不在 tracked_ids 中，这里按可用构建
+        return ApiKeyAuthRecord(
+            id=key_id,
+            tenant_id=claims["tenant_id"],
+            agent_id=claims["agent_id"],
+            status="active",
+            expires_at=claims["expires_at"],
+            permissions=list(permissions),
+        )
+
+    def observe(
+        self, api_key: str, api_key_id: str, status: str, expires_at, permissions, owners_available: bool = True
+    ) -> None:
+        """根据数据库中的密钥状态（及所属租户/Agent是否可用）更新已确认集合与权限映射"""
+        claims = decode_signed_api_key(api_key, verify=False)
+        if claims is None:
+            return
+
+        digest = permission_digest(permissions)
+        self.permissions_by_digest.setdefault(digest, sorted(set(permissions or [])))
+        if (
+            status != "active"
+            or not owners_available
+            or digest != claims["permission_digest"]
+            or expires_at_to_epoch(expires_at) != claims["expires_epoch"]
+        ):
+            self.tracked_ids.discard(api_key_id)
+        else:
+            if api_key_id in self.tracked_ids or len(self.tracked_ids) < self.max_tracked_keys:
+                self.tracked_ids.add(api_key_id)
+
+    def revoke(self, api_key_id: str) -> None:
+        """本地立即吊销（密钥被更新或删除时调用）"""
+        self._revoked_at[api_key_id] = time.monotonic()
+        self.tracked_ids.discard(api_key_id)
+
+    async def sync(self) -> None:
+        """从数据库同步：定期全量，其余时间按更新时间与删除记录增量"""
+        from src.database.models import ApiKey
+        from src.utils.auth_cache import agent_status_available, tenant_status_available
+
+        full = self._synced_at is None or time.monotonic() - self._rebuilt_at >= self.rebuild_interval_seconds
+        started = time.monotonic()
+        started_at = datetime.utcnow()
+        changed_after = None if full else self._synced_at - SYNC_SLACK
+        rows = await ApiKey.list_key_states(key_prefix=SIGNED_KEY_PREFIX, updated_after=changed_after)
+        deleted = [] if full else await ApiKey.deleted_ids(changed_after)
+
+        # 全量同步时重建已确认集合，已删除的密钥不会出现在结果中（包括绕过本服务的删除）
+        if full:
+            self.tracked_ids = set()
+
+        for api_key_id, api_key, status, expires_at, permissions, tenant_status, agent_status in rows:
+            # 查询期间本地吊销的密钥，查询结果可能早于吊销
+            if self._revoked_at.get(api_key_id, -1.0) >= started:
+                continue
+            self.observe(
+                api_key, api_key_id, status, expires_at, permissions,
+                owners_available=tenant_status_available(tenant_status) and agent_status_available(agent_status),
+            )
+        for api_key_id in deleted:
+            self.tracked_ids.discard(api_key_id)
+
+        # 查询开始前的本地吊销已反映在本次结果中
+        self._revoked_at = {
+            api_key_id: revoked_at for api_key_id, revoked_at in self._revoked_at.items() if revoked_at >= started
+        }
+        self._synced_at = started_at
+        if full:
+            self._rebuilt_at = time.monotonic()
+            try:
+                await ApiKey.prune_deleted()
+            except Exception as e:
+                logger.error(f"清理API密钥删除记录失败: {e}")
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.sync()
+            except Exception as e:
+                logger.error(f"同步签名密钥本地校验状态失败: {e}")
+            await asyncio.sleep(self.sync_interval_seconds)
+
+    def start(self) -> None:
+        """启动后台同步任务"""
+        if settings.api_key_format_version == SIGNED_KEY_VERSION and not signing_enabled():
+            logger.warning("API_KEY_FORMAT_VERSION=v2 但未配置 API_KEY_SIGNING_SECRET，新密钥按v1签发，v2密钥一律拒绝")
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """停止后台同步任务"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> Dict[str, float]:
+        """本地校验统计信息"""
+        return {
+            "synced": self._synced_at is not None,
+            "pending_revocations": len(self._revoked_at),
+            "tracked_keys": len(self.tracked_ids),
+            "permission_sets": len(self.permissions_by_digest),
+            "local_accepts": self.local_accepts,
+            "signature_rejects": self.signature_rejects,
+            "fallbacks": self.fallbacks,
+        }
+
+
+# 全局注册表实例
+signed_key_registry = SignedKeyRegistry(
+    sync_interval_seconds=settings.signed_key_sync_interval_seconds,
+    rebuild_interval_seconds=settings.signed_key_rebuild_interval_seconds,
+    max_tracked_keys=settings.signed_key_max_tracked,
+)
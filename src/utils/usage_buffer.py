@@ -0,0 +1,172 @@
+"""
+API密钥使用统计写回缓冲
+验证请求只在内存中累加使用次数，由后台任务定期批量写回数据库。
+同一时刻只有一次刷新在进行；数据库不可用时缓冲区最多保留 PENDING_LIMIT_FACTOR 倍上限的密钥，
+超出部分的新密钥使用次数被丢弃并计数（已在缓冲区中的密钥继续累加）。
+刷新被取消（停止服务）时已发出的写回继续完成，失败时合并回缓冲区，不会丢失或重复计数。
+"""
+
+import asyncio
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+from src.common.config import settings
+from src.common.logger import get_logger
+
+logger = get_logger(__name__)
+
+# 缓冲区中密钥数的硬上限（相对于触发提前刷新的 max_pending_keys）
+PENDING_LIMIT_FACTOR = 2
+
+
+class ApiKeyUsageBuffer:
+    """按API密钥ID累加使用次数，定期或在缓冲区满时批量刷新"""
+
+    def __init__(self, flush_interval_seconds: float = 5.0, max_pending_keys: int = 10000):
+        self.flush_interval_seconds = flush_interval_seconds
+        self.max_pending_keys = max_pending_keys
+        # api_key_id -> (累计次数, 最后使用时间)
+        self._pending: Dict[str, Tuple[int, datetime]] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._early_flush: Optional[asyncio.Future] = None
+        self._flush_lock: Optional[asyncio.Lock] = None
+        # 最近一次发出的写回
+        self._write: Optional[asyncio.Future] = None
+        # 上次刷新失败后，等到下一次定期刷新再重试，不由缓冲区满提前触发
+        self._failing = False
+        self.flushed_increments = 0
+        self.flush_count = 0
+        self.flush_errors = 0
+        self.dropped_increments = 0
+
+    @property
+    def pending_limit(self) -> int:
+        return self.max_pending_keys * PENDING_LIMIT_FACTOR
+
+    def record(self, api_key_id: str, used_at: Optional[datetime] = None) -> None:
+        """记录一次使用"""
+        used_at = used_at or datetime.utcnow()
+        entry = self._pending.get(api_key_id)
+        if entry is None:
+            if len(self._pending) >= self.pending_limit:
+                self.dropped_increments += 1
+                return
+            entry = (0, used_at)
+        count, last_used_at = entry
+        self._pending[api_key_id] = (count + 1, max(last_used_at, used_at))
+
+        # 缓冲区达到上限时提前刷新（已有刷新进行中或上次刷新失败时不再触发）
+        if (
+            len(self._pending) >= self.max_pending_keys
+            and self._task is not None
+            and not self._failing
+            and not (self._flush_lock is not None and self._flush_lock.locked())
+        ):
+            self._early_flush = asyncio.ensure_future(self.flush())
+
+    async def flush(self) -> int:
+        """将累计的使用统计写回数据库，返回写回的次数"""
+        from src.database.models import ApiKey
+
+        if self._flush_lock is None:
+            self._flush_lock = asyncio.Lock()
+
+        if self._flush_lock.locked():
+            # 已有刷新进行中，本次跳过，剩余统计由下一次刷新写回
+            return 0
+
+        async with self._flush_lock:
+            if not self._pending:
+                return 0
+
+            batch, self._pending = self._pending, {}
+            # 写回在线程池中执行，调用方被取消也无法中止已发出的 UPDATE，因此屏蔽取消，让写回完成后再结算
+            write = self._write = asyncio.ensure_future(ApiKey.bulk_record_usage(batch))
+            try:
+                await asyncio.shield(write)
+            except asyncio.CancelledError:
+                # 若在写回完成前把批次合并回缓冲区，写回成功时会重复计数；改为写回结束后再结算
+                write.add_done_callback(lambda done: self._settle(batch, done))
+                raise
+            except Exception as e:
+                logger.error(f"写回API密钥使用统计失败: {e}")
+                self._merge_back(batch)
+                return 0
+
+            return self._flushed(batch)
+
+    def _flushed(self, batch: Dict[str, Tuple[int, datetime]]) -> int:
+        self._failing = False
+        increments = sum(count for count, _ in batch.values())
+        self.flushed_increments += increments
+        self.flush_count += 1
+        return increments
+
+    def _merge_back(self, batch: Dict[str, Tuple[int, datetime]]) -> None:
+        """写回失败时在上限内合并回缓冲区，等待下次定期刷新"""
+        self.flush_errors += 1
+        self._failing = True
+        for api_key_id, (count, used_at) in batch.items():
+            pending = self._pending.get(api_key_id)
+            if pending is None and len(self._pending) >= self.pending_limit:
+                self.dropped_increments += count
+                continue
+            pending_count, pending_used_at = pending or (0, used_at)
+            self._pending[api_key_id] = (pending_count + count, max(pending_used_at, used_at))
+
+    def _settle(self, batch: Dict[str, Tuple[int, datetime]], write: asyncio.Future) -> None:
+        """刷新被取消后，已发出的写回结束时结算"""
+        if write.cancelled() or write.exception() is not None:
+            if not write.cancelled():
+                logger.error(f"写回API密钥使用统计失败: {write.exception()}")
+            self._merge_back(batch)
+        else:
+            self._flushed(batch)
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval_seconds)
+            await self.flush()
+
+    def start(self) -> None:
+        """启动后台刷新任务"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """停止后台任务并刷新剩余统计"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        # 等待进行中的刷新（包括刷新被取消后仍在执行的写回）结束，再写回剩余统计
+        if self._flush_lock is not None:
+            async with self._flush_lock:
+                pass
+        if self._write is not None:
+            # 结算回调先于等待方执行，失败的批次已合并回缓冲区，随下面的刷新一并写回
+            await asyncio.wait([self._write])
+        await self.flush()
+
+    def stats(self) -> Dict[str, float]:
+        """缓冲区统计信息"""
+        return {
+            "pending_keys": len(self._pending),
+            "pending_increments": sum(count for count, _ in self._pending.values()),
+            "max_pending_keys": self.max_pending_keys,
+            "flush_interval_seconds": self.flush_interval_seconds,
+            "flushed_increments": self.flushed_increments,
+            "flush_count": self.flush_count,
+            "flush_errors": self.flush_errors,
+            "dropped_increments": self.dropped_increments,
+        }
+
+
+# 全局缓冲实例
+usage_buffer = ApiKeyUsageBuffer(
+    flush_interval_seconds=settings.usage_flush_interval_seconds,
+    max_pending_keys=settings.usage_buffer_max_keys,
+)
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""
+认证路由的密钥解析单元测试（需要 fastapi）
+"""
+
+import pytest
+
+pytest.importorskip("fastapi")
+
+from src.api.routes import auth_api  # noqa: E402
+from src.common.config import settings  # noqa: E402
+from src.utils.signed_keys import generate_signed_api_key, signed_key_registry  # noqa: E402
+
+
+@pytest.fixture
+def signing_secret(monkeypatch):
+    monkeypatch.setattr(settings, "api_key_signing_secret", "unit-test-signing-secret")
+
+
+def test_signed_key_verified_once(signing_secret, monkeypatch):
+    """缓存未命中的v2密钥只验签一次，声明同时用于解析与本地校验"""
+    verified = []
+    verify = signed_key_registry.verify
+    monkeypatch.setattr(signed_key_registry, "verify", lambda api_key: verified.append(api_key) or verify(api_key))
+
+    api_key = generate_signed_api_key("tenant_a", "agent_a", "key_a")
+    record, parsed_info = auth_api.parse_uncached_api_key(api_key)
+    assert record is None
+    assert parsed_info["tenant_id"] == "tenant_a"
+    assert parsed_info["api_key_id"] == "key_a"
+    assert verified == [api_key]
+
+
+def test_bad_signature_counted_once(signing_secret):
+    rejects = signed_key_registry.signature_rejects
+    api_key = generate_signed_api_key("tenant_a", "agent_a", "key_a")
+    tampered = api_key[:-3] + ("AAA" if not api_key.endswith("AAA") else "BBB")
+    assert auth_api.parse_uncached_api_key(tampered) == (None, None)
+    assert signed_key_registry.signature_rejects == rejects + 1
+
+
+def test_legacy_key_parsed_without_signature_check():
+    import base64
+
+    api_key = "mmc_" + base64.b64encode(b"tenant_f42de8499dd7_agent_ff1678bfa633_54cb0fc31423_v1").decode()
+    record, parsed_info = auth_api.parse_uncached_api_key(api_key)
+    assert record is None
+    assert parsed_info["tenant_id"] == "tenant_f42de8499dd7"
+    assert parsed_info["agent_id"] == "agent_ff1678bfa633"
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+认证快照单元测试：编码/内存映射解码、按摘要二分查找与追赶前后的服务窗口
+"""
+
+import time
+from datetime import datetime
+
+from src.database.key_digest import compute_key_digest
+from src.utils.auth_snapshot import AuthSnapshot, encode_snapshot
+
+
+def make_rows(count):
+    rows = []
+    for i in range(count):
+        rows.append((
+            f"key_{i}",
+            compute_key_digest(f"mk_value_{i}"),
+            f"tenant_{i % 3}",
+            f"agent_{i}",
+            "active",
+            datetime(2030, 1, 1, 0, 0, i % 60) if i % 2 else None,
+            "active",
+            "archived" if i == 5 else ("active" if i != 6 else None),
+            ["chat:send", f"scope:{i % 4}"] if i % 5 else [],
+        ))
+    return rows
+
+
+def open_snapshot(tmp_path, rows, created_at=None, **kwargs):
+    path = tmp_path / "auth_snapshot.bin"
+    path.write_bytes(encode_snapshot(rows, created_at if created_at is not None else time.time()))
+    snapshot = AuthSnapshot(str(path), **kwargs)
+    return snapshot
+
+
+def serve(snapshot, seconds=60.0):
+    # 等同于 catch_up 完成后的状态
+    snapshot._serve_until = time.monotonic() + seconds
+
+
+def test_encode_decode_and_binary_search(tmp_path):
+    """每个密钥都能经二分查找取回，字段与写入时一致"""
+    rows = make_rows(200)
+    snapshot = open_snapshot(tmp_path, rows)
+    assert snapshot.load()
+    serve(snapshot)
+
+    for i, (api_key_id, _, tenant_id, agent_id, status, expires_at, tenant_status, agent_status, permissions) in enumerate(rows):
+        record = snapshot.lookup(f"mk_value_{i}")
+        assert record is not None
+        assert record.id == api_key_id
+        assert record.tenant_id == tenant_id
+        assert record.agent_id == agent_id
+        assert record.status == status
+        assert record.expires_at == expires_at
+        assert record.tenant_status == tenant_status
+        assert record.agent_status == agent_status
+        assert sorted(record.permissions) == sorted(permissions)
+
+    assert snapshot.lookup("mk_not_in_snapshot") is None
+    assert snapshot.hits == len(rows)
+    assert snapshot.misses == 1
+    assert sorted(snapshot._record_ids()) == sorted(row[0] for row in rows)
+    snapshot.close()
+
+
+def test_empty_snapshot(tmp_path):
+    snapshot = open_snapshot(tmp_path, [])
+    assert snapshot.load()
+    serve(snapshot)
+    assert snapshot.lookup("mk_value_0") is None
+    snapshot.close()
+
+
+def test_not_served_before_catch_up_or_after_warmup(tmp_path):
+    """追赶完成前不提供记录，预热期结束后关闭快照"""
+    snapshot = open_snapshot(tmp_path, make_rows(3))
+    assert snapshot.load()
+    assert snapshot.lookup("mk_value_1") is None
+
+    serve(snapshot)
+    assert snapshot.lookup("mk_value_1") is not None
+
+    serve(snapshot, seconds=-1)
+    assert snapshot.lookup("mk_value_1") is None
+    assert not snapshot.loaded
+
+
+def test_discarded_keys_not_served(tmp_path):
+    snapshot = open_snapshot(tmp_path, make_rows(3))
+    assert snapshot.load()
+    serve(snapshot)
+    snapshot.discard("key_1")
+    assert snapshot.lookup("mk_value_1") is None
+    assert snapshot.lookup("mk_value_2") is not None
+    snapshot.close()
+
+
+def test_stale_or_invalid_file_ignored(tmp_path):
+    """超过时限或格式不符的快照不加载"""
+    snapshot = open_snapshot(tmp_path, make_rows(3), created_at=time.time() - 1000, max_age_seconds=900)
+    assert not snapshot.load()
+
+    path = tmp_path / "garbage.bin"
+    path.write_bytes(b"not a snapshot" * 10)
+    assert not AuthSnapshot(str(path)).load()
+    assert not AuthSnapshot(str(tmp_path / "missing.bin")).load()
+
+
+def test_single_writer_per_host(tmp_path):
+    """同一快照路径只有一个实例持有写入锁，释放后由其他实例接替"""
+    path = str(tmp_path / "auth_snapshot.bin")
+    first, second = AuthSnapshot(path), AuthSnapshot(path)
+    assert first.acquire_writer()
+    assert first.acquire_writer()
+    assert not second.acquire_writer()
+    assert first.stats()["writer"] and not second.stats()["writer"]
+
+    first.release_writer()
+    assert second.acquire_writer()
+    assert not first.acquire_writer()
+    second.release_writer()
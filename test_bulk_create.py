@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+批量创建单元测试：upsert_rows 与 /agents:bulk 的逐项结果（路由部分需要 fastapi）
+"""
+
+import asyncio
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+from peewee import CharField, DateTimeField, IntegerField, Model, SqliteDatabase
+
+from src.database.bulk import upsert_rows
+
+
+class ActiveState(Model):
+    tenant_id = CharField()
+    agent_id = CharField()
+    expires_at = DateTimeField()
+    ttl_seconds = IntegerField()
+
+    class Meta:
+        table_name = "test_active_states"
+        indexes = ((("tenant_id", "agent_id"), True),)
+
+
+def test_upsert_rows_updates_preserved_fields(tmp_path):
+    database = SqliteDatabase(str(tmp_path / "bulk.db"))
+    database.bind([ActiveState])
+    database.create_tables([ActiveState])
+
+    first = datetime(2026, 1, 1)
+    assert upsert_rows(ActiveState, [
+        {"tenant_id": "t1", "agent_id": f"a{i}", "expires_at": first, "ttl_seconds": 60} for i in range(3)
+    ], ["expires_at", "ttl_seconds"], batch_size=2) == 3
+
+    later = datetime(2026, 1, 2)
+    upsert_rows(ActiveState, [
+        {"tenant_id": "t1", "agent_id": "a1", "expires_at": later, "ttl_seconds": 120},
+        {"tenant_id": "t1", "agent_id": "a3", "expires_at": later, "ttl_seconds": 120},
+    ], ["expires_at", "ttl_seconds"])
+
+    rows = {row.agent_id: (row.expires_at, row.ttl_seconds) for row in ActiveState.select()}
+    assert rows == {
+        "a0": (first, 60),
+        "a1": (later, 120),
+        "a2": (first, 60),
+        "a3": (later, 120),
+    }
+    database.close()
+
+
+@pytest.fixture
+def agent_api(monkeypatch):
+    pytest.importorskip("fastapi")
+    from src.api.routes import agent_api
+
+    class FakeTenant:
+        @staticmethod
+        async def get_many(tenant_ids):
+            return {tenant_id: object() for tenant_id in tenant_ids if tenant_id != "missing"}
+
+    class FakeAgent:
+        created = []
+        failures = {}
+
+        @staticmethod
+        def name_key(tenant_id, name):
+            # 模拟 MySQL 不区分大小写的排序规则
+            return tenant_id.casefold(), name.casefold()
+
+        @classmethod
+        async def names_taken(cls, pairs):
+            return {cls.name_key(*pair) for pair in pairs if pair[1].casefold() == "taken"}
+
+        @classmethod
+        async def bulk_create_with_setup(cls, records, active_ttl_seconds, configs):
+            cls.created.append((records, active_ttl_seconds, configs))
+            agents = [
+                SimpleNamespace(
+                    row_version=0, created_at=None, updated_at=None,
+                    **{key: record[key] for key in ("id", "tenant_id", "name", "description", "template_id", "status")}
+                )
+                for record in records
+            ]
+            return agents, {agents[index].id: failure for index, failure in cls.failures.items()}
+
+    monkeypatch.setattr(agent_api, "Tenant", FakeTenant)
+    monkeypatch.setattr(agent_api, "AsyncAgent", FakeAgent)
+    monkeypatch.setattr(agent_api, "AgentStatus", SimpleNamespace(ACTIVE=SimpleNamespace(value="active")))
+    return agent_api, FakeAgent
+
+
+def _bulk(agent_api, items):
+    request = agent_api.AgentBulkCreateRequest(items=[agent_api.AgentCreateRequest(**item) for item in items])
+    response = asyncio.run(agent_api.bulk_create_agents(request))
+    data = response.data
+    return [item if isinstance(item, dict) else item.model_dump() for item in data["items"]], data
+
+
+def test_bulk_agents_per_item_results(agent_api):
+    agent_api, fake_agent = agent_api
+    # 第二个创建的Agent配置保存失败，第三个仅活跃状态写入失败
+    fake_agent.failures = {1: {"config": "bad config"}, 2: {"active_state": "db down"}}
+    items, data = _bulk(agent_api, [
+        {"tenant_id": "t1", "name": "a", "config": {"persona": {}}},
+        {"tenant_id": "missing", "name": "b"},
+        {"tenant_id": "t1", "name": "taken"},
+        {"tenant_id": "t1", "name": "a"},
+        {"tenant_id": "t1", "name": "c", "config": {"persona": {}}},
+        {"tenant_id": "t1", "name": "d"},
+    ])
+
+    assert [item["index"] for item in items] == list(range(6))
+    assert [item["success"] for item in items] == [True, False, False, False, True, True]
+    assert [item["error_code"] for item in items] == [None, "AGENT_001", "AGENT_002", "AGENT_002", "AGENT_015", "AGENT_016"]
+    assert "bad config" in items[4]["error"] and "db down" in items[5]["error"]
+    assert (data["succeeded"], data["failed"]) == (3, 3)
+
+    # 只有通过校验的项进入同一次批量写入，配置按新Agent的ID传入
+    (records, ttl_seconds, configs), = fake_agent.created
+    assert [record["name"] for record in records] == ["a", "c", "d"]
+    assert ttl_seconds == 12 * 3600
+    assert set(configs) == {records[0]["id"], records[1]["id"]}
+
+
+def test_bulk_agents_duplicate_names_follow_collation(agent_api):
+    """批内查重与已占用名称均按 name_key 比较，大小写不同也视为重名"""
+    agent_api, fake_agent = agent_api
+    fake_agent.failures = {}
+    items, _ = _bulk(agent_api, [
+        {"tenant_id": "t1", "name": "Bot"},
+        {"tenant_id": "t1", "name": "bot"},
+        {"tenant_id": "t1", "name": "TAKEN"},
+        {"tenant_id": "t2", "name": "BOT"},
+    ])
+    assert [item["error_code"] for item in items] == [None, "AGENT_002", "AGENT_002", None]
+    assert [record["name"] for record in fake_agent.created[-1][0]] == ["Bot", "BOT"]
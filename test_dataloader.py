@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+主键查询微批（BatchLoader）单元测试
+"""
+
+import asyncio
+
+import pytest
+from peewee import MySQLDatabase, SqliteDatabase
+
+from src.database.connection import _collation_key
+from src.database.dataloader import BatchLoader
+
+
+def make_loader(rows, **kwargs):
+    batches = []
+
+    async def load_many(keys):
+        batches.append(sorted(keys))
+        await asyncio.sleep(0)
+        return {key: rows[key] for key in keys if key in rows}
+
+    return BatchLoader(load_many, enabled=True, **kwargs), batches
+
+
+def test_loads_batched_within_window():
+    """窗口内的点查询合并为一次批量查询，缺失的键返回None"""
+    loader, batches = make_loader({"a": 1, "b": 2, "c": 3}, window_seconds=0.01)
+
+    async def scenario():
+        return await asyncio.gather(*(loader.load(key) for key in ["a", "b", "a", "missing", "c"]))
+
+    assert asyncio.run(scenario()) == [1, 2, 1, None, 3]
+    assert batches == [["a", "b", "c", "missing"]]
+    assert loader.loads == 5
+    assert loader.batches == 1
+
+
+def test_max_batch_dispatches_immediately():
+    loader, batches = make_loader({str(i): i for i in range(10)}, window_seconds=10, max_batch=4)
+
+    async def scenario():
+        return await asyncio.wait_for(asyncio.gather(*(loader.load(str(i)) for i in range(8))), timeout=1)
+
+    assert asyncio.run(scenario()) == list(range(8))
+    assert batches == [["0", "1", "2", "3"], ["4", "5", "6", "7"]]
+
+
+def test_normalize_matches_database_comparison():
+    """结果按 normalize 后的键分发（如 MySQL 主键比较不区分大小写）"""
+    loader, _ = make_loader({"ABC": "row"}, normalize=lambda key: key.casefold())
+
+    async def scenario():
+        return await asyncio.gather(loader.load("ABC"), loader.load("abc"))
+
+    assert asyncio.run(scenario()) == ["row", "row"]
+
+
+def test_error_propagates_to_whole_batch():
+    async def load_many(keys):
+        raise RuntimeError("database unavailable")
+
+    loader = BatchLoader(load_many, enabled=True)
+
+    async def scenario():
+        results = await asyncio.gather(loader.load("a"), loader.load("b"), return_exceptions=True)
+        assert all(isinstance(result, RuntimeError) for result in results)
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_batch_cancels_callers():
+    """批量查询被取消时，同批次的调用方不会一直等待"""
+    started = None
+
+    async def load_many(keys):
+        started.set()
+        await asyncio.sleep(10)
+
+    loader = BatchLoader(load_many, enabled=True, window_seconds=0)
+
+    async def scenario():
+        nonlocal started
+        started = asyncio.Event()
+        callers = [asyncio.ensure_future(loader.load(key)) for key in ["a", "b"]]
+        await started.wait()
+        for task in list(loader._tasks):
+            task.cancel()
+        for caller in callers:
+            with pytest.raises(asyncio.CancelledError):
+                await asyncio.wait_for(caller, timeout=1)
+
+    asyncio.run(scenario())
+
+
+class _Meta:
+    def __init__(self, database):
+        self.database = database
+
+
+class _Model:
+    def __init__(self, database):
+        self._meta = _Meta(database)
+
+
+def test_collation_key():
+    """MySQL 上按 utf8mb4_0900_ai_ci 比较：不区分大小写与重音，尾部空格有效（NO PAD）"""
+    mysql = _Model(MySQLDatabase("unit_test"))
+    assert _collation_key(mysql, "Agent_ABC") == _collation_key(mysql, "agent_abc")
+    assert _collation_key(mysql, "café") == _collation_key(mysql, "CAFE")
+    assert _collation_key(mysql, "agent_abc ") != _collation_key(mysql, "agent_abc")
+    assert _collation_key(mysql, 42) == 42
+
+    sqlite = _Model(SqliteDatabase(":memory:"))
+    assert _collation_key(sqlite, "Agent_ABC") == "Agent_ABC"
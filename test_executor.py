@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+数据库线程池饱和策略单元测试
+"""
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from src.database.executor import DatabaseExecutor, DatabasePoolSaturated
+
+
+def blocking(gate: threading.Event, result=None):
+    def _call():
+        gate.wait(5)
+        return result
+    return _call
+
+
+def test_queue_policy_rejects_beyond_max_queue():
+    executor = DatabaseExecutor(max_workers=1, max_queue=1, queue_timeout_seconds=0, policy="queue")
+    gate = threading.Event()
+
+    async def scenario():
+        running = asyncio.ensure_future(executor.run(blocking(gate, "first")))
+        queued = asyncio.ensure_future(executor.run(lambda: "second"))
+        await asyncio.sleep(0.05)
+        with pytest.raises(DatabasePoolSaturated):
+            await executor.run(lambda: "third")
+        assert executor.stats()["queued"] == 1
+        gate.set()
+        return await asyncio.gather(running, queued)
+
+    assert asyncio.run(scenario()) == ["first", "second"]
+    stats = executor.stats()
+    assert (stats["submitted"], stats["completed"], stats["rejected"], stats["peak_queued"]) == (2, 2, 1, 1)
+    executor.shutdown()
+
+
+def test_fail_fast_rejects_without_idle_thread():
+    executor = DatabaseExecutor(max_workers=1, max_queue=100, queue_timeout_seconds=0, policy="fail_fast")
+    gate = threading.Event()
+
+    async def scenario():
+        running = asyncio.ensure_future(executor.run(blocking(gate, "first")))
+        await asyncio.sleep(0.05)
+        with pytest.raises(DatabasePoolSaturated):
+            await executor.run(lambda: "second")
+        gate.set()
+        return await running
+
+    assert asyncio.run(scenario()) == "first"
+    assert executor.rejected == 1
+    executor.shutdown()
+
+
+def test_queue_timeout_skips_stale_calls():
+    executor = DatabaseExecutor(max_workers=1, max_queue=10, queue_timeout_seconds=0.05, policy="queue")
+    called = []
+
+    async def scenario():
+        running = asyncio.ensure_future(executor.run(lambda: time.sleep(0.15)))
+        stale = asyncio.ensure_future(executor.run(lambda: called.append("stale")))
+        await running
+        with pytest.raises(DatabasePoolSaturated):
+            await stale
+
+    asyncio.run(scenario())
+    # 排队超时的调用不执行
+    assert called == []
+    assert executor.timed_out == 1
+    assert executor.stats()["max_wait_ms"] >= 50
+    executor.shutdown()
+
+
+def test_release_after_every_call():
+    released = []
+    executor = DatabaseExecutor(max_workers=2, queue_timeout_seconds=0, release=lambda: released.append(1))
+
+    def fail():
+        raise RuntimeError("query failed")
+
+    async def scenario():
+        assert await executor.run(lambda: 42) == 42
+        with pytest.raises(RuntimeError):
+            await executor.run(fail)
+
+    asyncio.run(scenario())
+    assert len(released) == 2
+    assert executor.stats()["active"] == 0
+    executor.shutdown()
+
+
+def test_unknown_policy():
+    with pytest.raises(ValueError):
+        DatabaseExecutor(policy="drop")
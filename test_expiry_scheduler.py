@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+API密钥过期调度单元测试
+"""
+
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from src.database.models import ApiKey
+from src.utils import expiry_scheduler as expiry_module
+from src.utils.auth_cache import api_key_cache
+from src.utils.expiry_scheduler import ApiKeyExpiryScheduler
+from src.utils.signed_keys import signed_key_registry
+
+
+class FakeKeys:
+    """mark_expired 只标记 active 集合中的密钥，可模拟写库失败"""
+
+    def __init__(self, active):
+        self.active = set(active)
+        self.fail = False
+        self.calls = []
+
+    async def mark_expired(self, api_key_ids, expired_before):
+        self.calls.append(list(api_key_ids))
+        if self.fail:
+            raise RuntimeError("db down")
+        marked = self.active & set(api_key_ids)
+        self.active -= marked
+        return len(marked)
+
+
+@pytest.fixture
+def keys(monkeypatch):
+    keys = FakeKeys(["k1", "k2", "k3"])
+    invalidated, revoked = [], []
+    monkeypatch.setattr(ApiKey, "mark_expired", keys.mark_expired)
+    monkeypatch.setattr(api_key_cache, "invalidate_by_ids", lambda ids: invalidated.extend(ids))
+    monkeypatch.setattr(signed_key_registry, "revoke", revoked.append)
+    keys.invalidated, keys.revoked = invalidated, revoked
+    return keys
+
+
+def test_expire_due_marks_only_due_keys(keys):
+    scheduler = ApiKeyExpiryScheduler(refresh_interval_seconds=60)
+    now = datetime.utcnow()
+    scheduler.schedule("k1", now - timedelta(seconds=1))
+    scheduler.schedule("k1", now - timedelta(seconds=2))
+    # 已被删除或停用的密钥不会被标记
+    scheduler.schedule("gone", now - timedelta(seconds=1))
+    scheduler.schedule("k2", now + timedelta(hours=1))
+
+    assert asyncio.run(scheduler.expire_due()) == 1
+    assert keys.calls == [["k1", "gone"]]
+    assert keys.invalidated == ["k1", "gone"] and keys.revoked == ["k1", "gone"]
+    assert scheduler.stats()["scheduled"] == 1
+    assert scheduler.stats()["expired_total"] == 1 and scheduler.batches == 1
+
+    # 没有到期的密钥时不访问数据库
+    assert asyncio.run(scheduler.expire_due()) == 0
+    assert len(keys.calls) == 1
+
+
+def test_expire_due_retries_after_failure(keys):
+    scheduler = ApiKeyExpiryScheduler(refresh_interval_seconds=60)
+    scheduler.schedule("k1", datetime.utcnow() - timedelta(seconds=1))
+    keys.fail = True
+    with pytest.raises(RuntimeError):
+        asyncio.run(scheduler.expire_due())
+    assert keys.invalidated == []
+
+    # 放回堆中，RETRY_DELAY 之后重试
+    retry_at, api_key_id = scheduler._heap[0]
+    assert api_key_id == "k1"
+    assert retry_at > datetime.utcnow() + expiry_module.RETRY_DELAY - timedelta(seconds=1)
+
+
+def test_refresh_and_schedule_horizon(monkeypatch):
+    scheduler = ApiKeyExpiryScheduler(refresh_interval_seconds=60)
+    now = datetime.utcnow()
+
+    async def list_expiring(before):
+        assert before >= now + scheduler.horizon
+        return [("k2", (now + timedelta(seconds=30)).replace(tzinfo=timezone.utc)), ("k1", now)]
+
+    monkeypatch.setattr(ApiKey, "list_expiring", list_expiring)
+    asyncio.run(scheduler.refresh())
+    assert [api_key_id for _, api_key_id in sorted(scheduler._heap)] == ["k1", "k2"]
+    assert all(expires_at.tzinfo is None for expires_at, _ in scheduler._heap)
+
+    # 超出已加载范围的由下次刷新加载；带时区的时间统一为UTC
+    scheduler.schedule("later", now + timedelta(hours=1))
+    soon = (now + timedelta(seconds=10)).replace(tzinfo=timezone.utc)
+    scheduler.schedule("soon", soon.astimezone(timezone(timedelta(hours=8))))
+    assert (soon.replace(tzinfo=None), "soon") in scheduler._heap
+    assert {api_key_id for _, api_key_id in scheduler._heap} == {"k1", "k2", "soon"}
+    assert min(scheduler._heap)[1] == "k1"
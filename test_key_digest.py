@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+API密钥摘要列单元测试：摘要为空的行按明文回退查询并回填，后台回填
+在 SQLite 上以与 maim_db 相同的列建表，替换连接模块使用的模型
+"""
+
+import asyncio
+import json
+
+import pytest
+from peewee import CharField, DateTimeField, IntegerField, Model, SqliteDatabase, TextField
+
+import src.database.connection as connection
+from src.database.connection import AsyncApiKey
+from src.database.key_digest import KEY_DIGEST_FIELD, backfill_key_digests, compute_key_digest, register_key_digest_field
+
+database = SqliteDatabase(None, check_same_thread=False)
+
+
+class Tenant(Model):
+    id = CharField(primary_key=True)
+    status = CharField(default="active")
+
+    class Meta:
+        database = database
+        table_name = "tenants"
+
+
+class Agent(Model):
+    id = CharField(primary_key=True)
+    status = CharField(default="active")
+
+    class Meta:
+        database = database
+        table_name = "agents"
+
+
+class ApiKey(Model):
+    id = CharField(primary_key=True)
+    tenant_id = CharField()
+    agent_id = CharField()
+    name = CharField(null=True)
+    description = TextField(null=True)
+    api_key = CharField(unique=True)
+    permissions = TextField(default="[]")
+    status = CharField(default="active")
+    expires_at = DateTimeField(null=True)
+    last_used_at = DateTimeField(null=True)
+    usage_count = IntegerField(default=0)
+    created_at = DateTimeField(null=True)
+    updated_at = DateTimeField(null=True)
+
+    class Meta:
+        database = database
+        table_name = "api_keys"
+
+
+register_key_digest_field(ApiKey)
+
+
+@pytest.fixture(scope="module")
+def database_file(tmp_path_factory):
+    # 数据库线程池中的线程各自保持连接，同一模块内使用同一个文件，每个测试重建表
+    database.init(str(tmp_path_factory.mktemp("keys") / "keys.db"))
+    yield
+    database.close()
+
+
+@pytest.fixture
+def keys(database_file, monkeypatch):
+    database.drop_tables([Tenant, Agent, ApiKey])
+    database.create_tables([Tenant, Agent, ApiKey])
+    monkeypatch.setattr(connection, "MaimDbTenant", Tenant)
+    monkeypatch.setattr(connection, "MaimDbAgent", Agent)
+    monkeypatch.setattr(connection, "MaimDbApiKey", ApiKey)
+    Tenant.create(id="tenant_a")
+    Agent.create(id="agent_a")
+    # 本服务写入的行带摘要，其他写入方写入的行没有
+    for i, with_digest in enumerate([True, False, False]):
+        ApiKey.create(
+            id=f"key_{i}",
+            tenant_id="tenant_a",
+            agent_id="agent_a",
+            api_key=f"mk_value_{i}",
+            permissions=json.dumps(["chat:send"]),
+            key_digest=compute_key_digest(f"mk_value_{i}") if with_digest else None,
+        )
+
+
+def digest_of(api_key_id):
+    return getattr(ApiKey.get_by_id(api_key_id), KEY_DIGEST_FIELD)
+
+
+def test_lookup_falls_back_and_backfills(keys):
+    """摘要为空的行按明文查到，并回填摘要"""
+    record = asyncio.run(AsyncApiKey.get_by_key_value("mk_value_1", tenant_id="tenant_a", agent_id="agent_a"))
+    assert record is not None
+    assert record.id == "key_1"
+    assert record.tenant_status == "active"
+    assert digest_of("key_1") == compute_key_digest("mk_value_1")
+
+    assert asyncio.run(AsyncApiKey.get_by_key_value("mk_value_0")).id == "key_0"
+    assert asyncio.run(AsyncApiKey.get_by_key_value("mk_value_1", tenant_id="tenant_b")) is None
+    assert asyncio.run(AsyncApiKey.get_by_key_value("mk_missing")) is None
+
+
+def test_batch_lookup_falls_back_and_backfills(keys):
+    found = asyncio.run(AsyncApiKey.get_by_key_values(["mk_value_0", "mk_value_2", "mk_missing"]))
+    assert {key: record.id for key, record in found.items()} == {"mk_value_0": "key_0", "mk_value_2": "key_2"}
+    assert digest_of("key_2") == compute_key_digest("mk_value_2")
+    assert digest_of("key_1") is None
+
+
+def test_backfill(keys):
+    assert backfill_key_digests(ApiKey) == 2
+    assert all(digest_of(f"key_{i}") == compute_key_digest(f"mk_value_{i}") for i in range(3))
+    assert backfill_key_digests(ApiKey) == 0
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+API密钥存在性过滤单元测试：布隆过滤器无假阴性、负缓存与布隆未命中的确认同步
+"""
+
+import asyncio
+import uuid
+from datetime import datetime
+
+import pytest
+
+from src.database.models import ApiKey
+from src.utils.key_filter import ApiKeyFilter, BloomFilter, NegativeKeyCache
+
+
+def test_bloom_no_false_negatives():
+    """已加入的值一定命中，未加入的值误判率接近配置值"""
+    bloom = BloomFilter(10000, 0.01)
+    added = [f"mk_{uuid.uuid4().hex}" for _ in range(10000)]
+    for value in added:
+        bloom.add(value)
+
+    assert all(value in bloom for value in added)
+    assert bloom.count == len(added)
+
+    false_positives = sum(f"absent_{i}" in bloom for i in range(10000))
+    assert false_positives < 300
+
+
+def test_negative_cache_ttl_and_size(monkeypatch):
+    """负缓存按容量淘汰最旧条目，超过TTL后不再命中"""
+    now = [1000.0]
+    monkeypatch.setattr("src.utils.key_filter.time.monotonic", lambda: now[0])
+    cache = NegativeKeyCache(max_size=2, ttl_seconds=30)
+    cache.add("a")
+    cache.add("b")
+    cache.add("c")
+    assert "a" not in cache
+    assert "b" in cache and "c" in cache
+
+    now[0] += 31
+    assert "b" not in cache
+    assert len(cache) == 1
+
+
+class FakeKeyStore:
+    """替代 ApiKey.list_key_values，按创建时间返回密钥"""
+
+    def __init__(self):
+        self.rows = []
+        self.queries = 0
+        self.fail = False
+
+    async def list_key_values(self, created_after=None):
+        self.queries += 1
+        await asyncio.sleep(0)
+        if self.fail:
+            raise RuntimeError("database unavailable")
+        return [(key, created_at) for key, created_at in self.rows if created_after is None or created_at >= created_after]
+
+
+@pytest.fixture
+def store(monkeypatch):
+    store = FakeKeyStore()
+    monkeypatch.setattr(ApiKey, "list_key_values", store.list_key_values)
+    return store
+
+
+def make_filter(store, keys=("mk_known",)):
+    store.rows = [(key, datetime(2024, 1, 1)) for key in keys]
+    key_filter = ApiKeyFilter(NegativeKeyCache(), confirm_interval_seconds=0)
+    asyncio.run(key_filter.rebuild())
+    store.queries = 0
+    return key_filter
+
+
+def test_negative_cache_rejects_without_sync(store):
+    key_filter = make_filter(store)
+    key_filter.record_miss("mk_missing")
+    assert not asyncio.run(key_filter.might_exist("mk_missing"))
+    assert store.queries == 0
+    assert asyncio.run(key_filter.might_exist("mk_known"))
+    assert store.queries == 0
+
+    # 新建的密钥从负缓存中移除
+    key_filter.add("mk_missing")
+    assert asyncio.run(key_filter.might_exist("mk_missing"))
+
+
+def test_bloom_miss_rejected_after_confirm_sync(store):
+    """布隆未命中的密钥经一次增量同步确认后拒绝，并写入负缓存"""
+    key_filter = make_filter(store)
+    assert not asyncio.run(key_filter.might_exist("mk_unknown"))
+    assert store.queries == 1
+    assert key_filter.stats()["bloom_rejections"] == 1
+
+    assert not asyncio.run(key_filter.might_exist("mk_unknown"))
+    assert store.queries == 1
+    assert key_filter.stats()["rejections"] == 2
+
+
+def test_key_created_by_other_worker_accepted(store):
+    """其他 worker 刚创建、尚未同步的密钥在确认同步后通过"""
+    key_filter = make_filter(store)
+    store.rows.append(("mk_new", datetime(2024, 1, 1, 0, 0, 30)))
+    assert asyncio.run(key_filter.might_exist("mk_new"))
+    assert key_filter.bloom_rejections == 0
+
+
+def test_concurrent_misses_share_one_sync(store):
+    key_filter = make_filter(store)
+
+    async def scenario():
+        return await asyncio.gather(*(key_filter.might_exist(f"mk_unknown_{i}") for i in range(50)))
+
+    assert asyncio.run(scenario()) == [False] * 50
+    assert store.queries == 1
+
+
+def test_sync_failure_falls_back_to_database(store):
+    """同步失败时无法确认，不拒绝"""
+    key_filter = make_filter(store)
+    store.fail = True
+    assert asyncio.run(key_filter.might_exist("mk_unknown"))
+    assert key_filter.bloom_rejections == 0
+
+
+def test_filter_disabled_until_built():
+    key_filter = ApiKeyFilter(NegativeKeyCache())
+    assert asyncio.run(key_filter.might_exist("mk_any"))
+
+
+def test_record_found_adds_lagged_key(store):
+    key_filter = make_filter(store)
+    key_filter.record_found("mk_lagged")
+    assert "mk_lagged" in key_filter._bloom
+    assert key_filter.bloom_lagged == 1
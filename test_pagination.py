@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+游标分页单元测试：游标编码/解析与计数缓存失效
+"""
+
+import asyncio
+from datetime import datetime
+
+import pytest
+
+from src.database.pagination import CountCache, InvalidCursor, decode_cursor, encode_cursor
+
+
+def test_cursor_round_trip():
+    """游标还原为原始的 (created_at, id)，且不含填充字符"""
+    created_at = datetime(2024, 5, 6, 7, 8, 9, 123456)
+    cursor = encode_cursor(created_at, "agent_0123456789ab")
+    assert "=" not in cursor
+    assert decode_cursor(cursor) == (created_at, "agent_0123456789ab")
+
+
+@pytest.mark.parametrize("cursor", ["", "not-base64!", "bm90LWpzb24", "WzFd", "WyJub3QtYS1kYXRlIiwiaWQiXQ"])
+def test_invalid_cursor(cursor):
+    """格式不正确的游标抛出 InvalidCursor（ValueError 子类）"""
+    with pytest.raises(InvalidCursor):
+        decode_cursor(cursor)
+    assert issubclass(InvalidCursor, ValueError)
+
+
+def test_count_cache_invalidate_by_prefix():
+    """计数按键前缀失效，查询期间发生失效时不写入缓存"""
+    cache = CountCache(ttl_seconds=60)
+    calls = []
+
+    async def load(value):
+        calls.append(value)
+        return value
+
+    async def scenario():
+        assert await cache.get(("agents", "tenant_a"), lambda: load(1)) == 1
+        assert await cache.get(("agents", "tenant_a"), lambda: load(2)) == 1
+        await cache.get(("agents", "tenant_b"), lambda: load(3))
+        await cache.get(("tenants",), lambda: load(4))
+
+        cache.invalidate("agents")
+        assert await cache.get(("agents", "tenant_a"), lambda: load(5)) == 5
+        assert await cache.get(("tenants",), lambda: load(6)) == 4
+
+        async def load_during_invalidation():
+            cache.invalidate("keys")
+            return 7
+
+        assert await cache.get(("keys", "tenant_a"), load_during_invalidation) == 7
+        assert await cache.get(("keys", "tenant_a"), lambda: load(8)) == 8
+
+    asyncio.run(scenario())
+    assert calls == [1, 3, 4, 5, 8]
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+权限位图与通配前缀树单元测试
+"""
+
+from src.utils.permissions import (
+    PermissionRegistry,
+    compile_permission_trie,
+    mask_has_all,
+    permission_matrix,
+    permission_registry,
+)
+
+
+def test_registry_bitset():
+    """每个权限分配固定的位，子集判断等价于逐个检查"""
+    registry = PermissionRegistry()
+    assert registry.intern("chat:send") == registry.intern("chat:send")
+    assert registry.intern("chat:send") != registry.intern("config:read")
+
+    mask = registry.compile(["chat:send", "config:read"])
+    assert mask_has_all(mask, registry.lookup(["chat:send"]))
+    assert mask_has_all(mask, registry.lookup(["chat:send", "config:read"]))
+    assert not mask_has_all(registry.compile(["chat:send"]), registry.lookup(["chat:send", "config:read"]))
+    assert registry.compile(None) == 0
+    assert len(registry) == 2
+
+
+def test_registry_unknown_permission():
+    """未登记的权限任何密钥都不可能拥有，lookup 不分配新位"""
+    registry = PermissionRegistry()
+    mask = registry.compile(["chat:send"])
+    assert registry.lookup(["config:write"]) is None
+    assert not mask_has_all(mask, registry.lookup(["chat:send", "config:write"]))
+    assert len(registry) == 1
+
+
+def test_trie_wildcards():
+    """末尾通配匹配一个或多个段，中间通配匹配恰好一个段"""
+    trie = compile_permission_trie(["chat:*", "*:read", "admin:users:list"])
+    assert trie.matches("chat:send")
+    assert trie.matches("chat:send:text")
+    assert not trie.matches("chat")
+    assert trie.matches("config:read")
+    assert not trie.matches("config:write")
+    assert not trie.matches("config:read:all")
+    # 精确授权走位图，不进入前缀树
+    assert not trie.matches("admin:users:list")
+
+    everything = compile_permission_trie(["*"])
+    assert everything.matches("chat:send")
+    assert everything.matches("config")
+
+
+def test_trie_compiled_only_for_wildcards():
+    """无通配授权时不构建前缀树，相同的授权集合共享同一棵树"""
+    assert compile_permission_trie(["chat:send", "config:read"]) is None
+    assert compile_permission_trie(None) is None
+    assert compile_permission_trie(["chat:*", "chat:send"]) is compile_permission_trie(["chat:send", "chat:*", "chat:*"])
+
+
+def test_permission_matrix():
+    """矩阵结果与逐项检查一致"""
+    permissions = ["chat:send", "config:read", "config:write"]
+    grants = [
+        (permission_registry.compile(["chat:send"]), None),
+        (permission_registry.compile([]), compile_permission_trie(["*:read"])),
+        (permission_registry.compile(["config:write"]), compile_permission_trie(["chat:*"])),
+    ]
+    assert permission_matrix(grants, permissions) == [
+        [True, False, False],
+        [False, True, False],
+        [True, False, True],
+    ]
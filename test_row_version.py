@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+乐观并发单元测试：只写入变化的列，版本号不一致时拒绝更新
+在 SQLite 上以与 maim_db 相同的列建表，替换连接模块使用的模型
+"""
+
+import asyncio
+import json
+from datetime import datetime
+
+import pytest
+from peewee import CharField, DateTimeField, Model, SqliteDatabase, TextField
+
+import src.database.connection as connection
+from src.database.connection import AsyncAgent, _changed_fields, _versioned_update
+from src.database.row_version import (
+    ROW_VERSION_FIELD,
+    ConcurrentUpdateError,
+    ensure_row_version_column,
+    register_row_version_field,
+)
+
+database = SqliteDatabase(None, check_same_thread=False)
+
+
+class Agent(Model):
+    id = CharField(primary_key=True)
+    tenant_id = CharField()
+    name = CharField()
+    description = TextField(null=True)
+    template_id = CharField(null=True)
+    config = TextField(default="{}")
+    status = CharField(default="active")
+    created_at = DateTimeField(default=datetime.utcnow)
+    updated_at = DateTimeField(default=datetime.utcnow)
+
+    class Meta:
+        database = database
+        table_name = "agents"
+
+
+@pytest.fixture(scope="module")
+def database_file(tmp_path_factory):
+    # 数据库线程池中的线程各自保持连接，同一模块内使用同一个文件，每个测试重建表
+    database.init(str(tmp_path_factory.mktemp("agents") / "agents.db"))
+    yield
+    database.close()
+
+
+@pytest.fixture
+def agents(database_file, monkeypatch):
+    # 先按 maim_db 的列建表（没有版本号列），再注册字段并补齐列，与启动流程一致
+    database.drop_tables([Agent])
+    if ROW_VERSION_FIELD in Agent._meta.fields:
+        Agent._meta.remove_field(ROW_VERSION_FIELD)
+    database.create_tables([Agent])
+    Agent.create(id="agent_a", tenant_id="tenant_a", name="bot", config=json.dumps({"persona": {}}))
+    register_row_version_field(Agent)
+    assert ensure_row_version_column(Agent)
+    assert not ensure_row_version_column(Agent)
+    monkeypatch.setattr(connection, "MaimDbAgent", Agent)
+
+
+def load(agent_id="agent_a"):
+    return AsyncAgent(Agent.get_by_id(agent_id))
+
+
+def test_existing_rows_start_at_version_zero(agents):
+    assert load().row_version == 0
+
+
+def test_changed_fields_skips_unchanged_and_unknown(agents):
+    agent = load()
+    changes = _changed_fields(agent, Agent, {"name": "bot", "description": "new", "unknown": 1})
+    assert changes == {"description": "new"}
+
+
+def test_versioned_update_writes_only_given_columns(agents):
+    # 其他请求修改了 description，但没有递增版本号（不经过本服务的写入）
+    Agent.update(description="external").where(Agent.id == "agent_a").execute()
+    _versioned_update(Agent, "agent_a", 0, {"name": "renamed"})
+
+    row = Agent.get_by_id("agent_a")
+    assert (row.name, row.description, getattr(row, ROW_VERSION_FIELD)) == ("renamed", "external", 1)
+
+    # 版本号已变化或记录已删除时拒绝
+    with pytest.raises(ConcurrentUpdateError):
+        _versioned_update(Agent, "agent_a", 0, {"name": "stale"})
+    with pytest.raises(ConcurrentUpdateError):
+        _versioned_update(Agent, "agent_missing", 0, {"name": "gone"})
+    assert Agent.get_by_id("agent_a").name == "renamed"
+
+
+def test_concurrent_wrappers_conflict(agents):
+    first, second = load(), load()
+    asyncio.run(first.update(name="first"))
+    assert first.row_version == 1
+
+    # 第二个请求读取时的版本已过期
+    with pytest.raises(ConcurrentUpdateError):
+        asyncio.run(second.update(description="second"))
+    # 客户端带的版本与读取到的版本不一致时不访问数据库
+    with pytest.raises(ConcurrentUpdateError):
+        asyncio.run(load().update(expected_version=0, description="second"))
+
+    row = Agent.get_by_id("agent_a")
+    assert (row.name, row.description, getattr(row, ROW_VERSION_FIELD)) == ("first", None, 1)
+
+
+def test_unchanged_update_keeps_version(agents):
+    agent = load()
+    updated_at = agent.updated_at
+    assert asyncio.run(agent.update(name="bot", config={"persona": {}})) is agent
+    assert agent.row_version == 0
+    assert Agent.get_by_id("agent_a").updated_at == updated_at
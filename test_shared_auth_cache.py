@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+跨 worker 共享认证缓存单元测试（两个 SharedAuthTable 实例映射同一文件，模拟两个 worker）
+"""
+
+from datetime import datetime
+
+import pytest
+
+from src.utils import shared_auth_cache
+from src.utils.auth_cache import ApiKeyAuthCache, ApiKeyAuthRecord
+from src.utils.shared_auth_cache import SLOT, SharedAuthTable, _key_digest
+
+pytestmark = pytest.mark.skipif(shared_auth_cache.fcntl is None, reason="共享缓存需要 POSIX 文件锁")
+
+
+def make_record(api_key_id="key_1", **kwargs):
+    return ApiKeyAuthRecord(
+        id=api_key_id,
+        tenant_id="tenant_1",
+        agent_id="agent_1",
+        status="active",
+        expires_at=kwargs.pop("expires_at", datetime(2030, 1, 1, 12, 30)),
+        permissions=["chat:read"],
+        **kwargs,
+    )
+
+
+@pytest.fixture
+def workers(tmp_path):
+    path = str(tmp_path / "auth.cache")
+    tables = [SharedAuthTable(path, slots=64, slot_size=512, ttl_seconds=60) for _ in range(2)]
+    assert all(table.open() for table in tables)
+    yield tables
+    for table in tables:
+        table.close()
+
+
+def test_record_shared_between_workers(workers):
+    first, second = workers
+    first.put("mmc_value_1", make_record())
+
+    record = second.get("mmc_value_1")
+    assert (record.id, record.tenant_id, record.status, record.expires_at) == (
+        "key_1", "tenant_1", "active", datetime(2030, 1, 1, 12, 30)
+    )
+    assert record.permissions == ["chat:read"]
+    assert second.get("mmc_other") is None
+    assert (second.hits, second.misses) == (1, 1)
+
+
+def test_invalidate_by_key_and_id(workers):
+    first, second = workers
+    first.put("mmc_value_1", make_record("key_1"))
+    first.put("mmc_value_2", make_record("key_2"))
+
+    second.invalidate("mmc_value_1")
+    assert first.get("mmc_value_1") is None
+
+    # 按ID失效经ID索引定位槽位
+    second.invalidate_by_ids(["key_2"])
+    assert first.get("mmc_value_2") is None
+
+
+def test_clear_bumps_generation(workers):
+    first, second = workers
+    first.put("mmc_value_1", make_record())
+    generation = first.stats()["generation"]
+    second.clear()
+    assert first.stats()["generation"] == generation + 1
+    assert first.get("mmc_value_1") is None
+
+
+def test_torn_and_expired_slots_are_misses(workers, monkeypatch):
+    first, second = workers
+    first.put("mmc_value_1", make_record())
+    offset = next(
+        offset for offset in first._probe(_key_digest("mmc_value_1"))
+        if SLOT.unpack_from(first._mm, offset)[2] == _key_digest("mmc_value_1")
+    )
+
+    # 序列号为奇数表示另一个 worker 正在写入该槽位
+    seq = SLOT.unpack_from(first._mm, offset)[0]
+    shared_auth_cache.SEQ.pack_into(first._mm, offset, seq + 1)
+    assert second.get("mmc_value_1") is None
+    assert second.torn_reads == 1
+    shared_auth_cache.SEQ.pack_into(first._mm, offset, seq)
+    assert second.get("mmc_value_1") is not None
+
+    monkeypatch.setattr(second, "ttl_seconds", -1)
+    assert second.get("mmc_value_1") is None
+
+
+def test_oversized_record_not_stored(workers):
+    first, _ = workers
+    record = make_record()
+    record.permissions = [f"scope:{i}" for i in range(100)]
+    first.put("mmc_value_1", record)
+    assert first.oversized == 1
+    assert first.get("mmc_value_1") is None
+
+
+def test_epoch_invalidates_other_workers_local_cache(workers):
+    """一个 worker 失效后，其他 worker 的进程内缓存不再提供该记录"""
+    first, second = workers
+    local_a = ApiKeyAuthCache(max_size=10, ttl_seconds=60, shared=first)
+    local_b = ApiKeyAuthCache(max_size=10, ttl_seconds=60, shared=second)
+    local_a.put("mmc_value_1", make_record("key_1"))
+    local_a.put("mmc_value_2", make_record("key_2"))
+    assert local_b.get("mmc_value_1") is not None
+
+    local_b.invalidate_by_id("key_1")
+    assert local_a.get("mmc_value_1") is None
+    assert local_a.remote_invalidations == 1
+    # 其他ID的纪元不变，仍由进程内缓存提供
+    assert local_a.get("mmc_value_2") is not None
+    assert local_a.remote_invalidations == 1
+
+
+def test_layout_change_replaces_file(workers):
+    first, _ = workers
+    first.put("mmc_value_1", make_record())
+
+    resized = SharedAuthTable(first.path, slots=128, slot_size=512, ttl_seconds=60)
+    assert resized.open()
+    assert resized.get("mmc_value_1") is None
+    # 已映射旧文件的 worker 不受影响
+    assert first.get("mmc_value_1") is not None
+    resized.close()
@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+"""
+v2签名密钥单元测试：编码/验签、篡改拒绝、未配置签名密钥时的行为与本地解析回退
+"""
+
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from peewee import SqliteDatabase
+
+from src.common.config import settings
+from src.database.models import ApiKey
+from src.database.tombstones import bind_tombstones, deleted_since, ensure_tombstone_table, prune_tombstones, record_deleted
+from src.utils.signed_keys import (
+    SignedKeyRegistry,
+    SigningSecretMissing,
+    decode_signed_api_key,
+    generate_signed_api_key,
+    issue_format_version,
+)
+
+
+@pytest.fixture
+def signing_secret(monkeypatch):
+    monkeypatch.setattr(settings, "api_key_signing_secret", "unit-test-signing-secret")
+    monkeypatch.setattr(settings, "api_key_format_version", "v2")
+
+
+def test_encode_and_verify(signing_secret):
+    """签发的密钥可验签并还原声明"""
+    expires_at = datetime(2030, 1, 2, 3, 4, 5)
+    api_key = generate_signed_api_key("tenant_a", "agent_a", "key_a", expires_at, ["chat:send", "config:read"])
+
+    claims = decode_signed_api_key(api_key)
+    assert claims is not None
+    assert claims["tenant_id"] == "tenant_a"
+    assert claims["agent_id"] == "agent_a"
+    assert claims["key_id"] == "key_a"
+    assert claims["expires_at"] == expires_at
+    assert claims["version"] == "v2"
+
+    # 权限摘要与顺序和重复项无关
+    other = generate_signed_api_key("tenant_a", "agent_a", "key_b", expires_at, ["config:read", "chat:send", "chat:send"])
+    assert decode_signed_api_key(other)["permission_digest"] == claims["permission_digest"]
+
+
+def flip(text, index):
+    """替换指定位置的字符为另一个 base64url 字符"""
+    return text[:index] + ("A" if text[index] != "A" else "B") + text[index + 1:]
+
+
+def test_tampered_key_rejected(signing_secret, monkeypatch):
+    """载荷或签名被改动、或用其他签名密钥签发的密钥验签失败"""
+    api_key = generate_signed_api_key("tenant_a", "agent_a", "key_a")
+    payload, signature = api_key[len("mmc2."):].split(".")
+
+    assert decode_signed_api_key(f"mmc2.{flip(payload, 3)}.{signature}") is None
+    assert decode_signed_api_key(f"mmc2.{payload}.{flip(signature, 3)}") is None
+    assert decode_signed_api_key(f"mmc2.{payload}.{signature}=") is None
+    assert decode_signed_api_key("mmc2.not-a-key") is None
+    assert decode_signed_api_key("mk_plain_v1_key") is None
+
+    monkeypatch.setattr(settings, "api_key_signing_secret", "another-secret")
+    assert decode_signed_api_key(api_key) is None
+
+
+def test_non_canonical_signature_rejected(signing_secret):
+    """签名末字符中不参与解码的填充位被改动时同样验签失败（每个密钥只有一种有效写法）"""
+    alphabet = "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789-_"
+    api_key = generate_signed_api_key("tenant_a", "agent_a", "key_a")
+    prefix, last = api_key[:-1], alphabet.index(api_key[-1])
+
+    # 16字节签名编码为22个字符，末字符只有高2位有效，低4位为填充位
+    variants = [alphabet[(last & 0b110000) | low] for low in range(16)]
+    assert api_key[-1] in variants
+    for variant in variants:
+        if variant != api_key[-1]:
+            assert decode_signed_api_key(prefix + variant) is None
+    assert decode_signed_api_key(api_key) is not None
+
+
+def test_missing_secret(monkeypatch):
+    """未配置签名密钥时不签发v2密钥，已有v2密钥也不能通过本地验签"""
+    monkeypatch.setattr(settings, "api_key_signing_secret", "unit-test-signing-secret")
+    api_key = generate_signed_api_key("tenant_a", "agent_a", "key_a")
+
+    monkeypatch.setattr(settings, "api_key_signing_secret", "")
+    monkeypatch.setattr(settings, "api_key_format_version", "v2")
+    assert issue_format_version() == "v1"
+    with pytest.raises(SigningSecretMissing):
+        generate_signed_api_key("tenant_a", "agent_a", "key_b")
+    assert decode_signed_api_key(api_key) is None
+
+
+def test_resolve_falls_back_until_observed(signing_secret):
+    """只有从数据库确认过的密钥才在本地放行，吊销后回退到数据库"""
+    permissions = ["chat:send"]
+    api_key = generate_signed_api_key("tenant_a", "agent_a", "key_a", permissions=permissions)
+    registry = SignedKeyRegistry()
+    claims = registry.verify(api_key)
+    assert claims is not None
+
+    # 尚未同步
+    assert registry.resolve(claims) is None
+
+    registry._synced_at = datetime.utcnow()
+    # 已同步但未见过该密钥（可能已被删除）
+    assert registry.resolve(claims) is None
+
+    registry.observe(api_key, "key_a", "active", None, permissions)
+    record = registry.resolve(claims)
+    assert record is not None
+    assert record.id == "key_a"
+    assert record.tenant_id == "tenant_a"
+    assert record.has_permission("chat:send")
+
+    registry.revoke("key_a")
+    assert registry.resolve(claims) is None
+    assert registry.fallbacks == 3
+    assert registry.local_accepts == 1
+
+
+def test_observe_revokes_changed_keys(signing_secret):
+    """数据库中权限或状态与签名内容不一致的密钥不在本地放行"""
+    api_key = generate_signed_api_key("tenant_a", "agent_a", "key_a", permissions=["chat:send"])
+    registry = SignedKeyRegistry()
+    registry._synced_at = datetime.utcnow()
+    claims = registry.verify(api_key)
+
+    registry.observe(api_key, "key_a", "active", None, ["chat:send", "config:write"])
+    assert registry.resolve(claims) is None
+
+    registry.observe(api_key, "key_a", "active", None, ["chat:send"])
+    assert registry.resolve(claims) is not None
+
+    registry.observe(api_key, "key_a", "disabled", None, ["chat:send"])
+    assert registry.resolve(claims) is None
+
+    registry.observe(api_key, "key_a", "active", None, ["chat:send"], owners_available=False)
+    assert registry.resolve(claims) is None
+
+
+def test_tracked_keys_bounded(signing_secret):
+    """超过跟踪上限的密钥不在本地放行"""
+    registry = SignedKeyRegistry(max_tracked_keys=1)
+    registry._synced_at = datetime.utcnow()
+    first = generate_signed_api_key("tenant_a", "agent_a", "key_a")
+    second = generate_signed_api_key("tenant_a", "agent_a", "key_b")
+    registry.observe(first, "key_a", "active", None, [])
+    registry.observe(second, "key_b", "active", None, [])
+
+    assert registry.resolve(registry.verify(first)) is not None
+    assert registry.resolve(registry.verify(second)) is None
+
+
+class FakeKeyStates:
+    """替代 ApiKey 的同步查询，记录调用"""
+
+    def __init__(self):
+        self.rows = []
+        self.deleted = []
+        self.calls = []
+        self.on_query = None
+
+    async def list_key_states(self, key_prefix=None, updated_after=None):
+        self.calls.append(("states", updated_after))
+        if self.on_query:
+            self.on_query()
+        return list(self.rows)
+
+    async def deleted_ids(self, deleted_after):
+        self.calls.append(("deleted", deleted_after))
+        return list(self.deleted)
+
+    async def prune_deleted(self):
+        self.calls.append(("prune", None))
+        return 0
+
+    async def existing_ids(self, api_key_ids):
+        raise AssertionError("同步不应逐个确认已跟踪的密钥")
+
+
+@pytest.fixture
+def key_states(monkeypatch):
+    states = FakeKeyStates()
+    for name in ("list_key_states", "deleted_ids", "prune_deleted", "existing_ids"):
+        monkeypatch.setattr(ApiKey, name, getattr(states, name))
+    return states
+
+
+def state_row(api_key, api_key_id, status="active"):
+    return (api_key_id, api_key, status, None, [], "active", "active")
+
+
+def test_sync_uses_change_feed(signing_secret, key_states):
+    """增量同步读取变更与删除记录，不逐个确认已跟踪的密钥"""
+    first = generate_signed_api_key("tenant_a", "agent_a", "key_a")
+    second = generate_signed_api_key("tenant_a", "agent_a", "key_b")
+    registry = SignedKeyRegistry()
+    key_states.rows = [state_row(first, "key_a"), state_row(second, "key_b")]
+    asyncio.run(registry.sync())
+    assert registry.tracked_ids == {"key_a", "key_b"}
+    assert [call[0] for call in key_states.calls] == ["states", "prune"]
+
+    key_states.calls.clear()
+    key_states.rows = [state_row(second, "key_b", status="disabled")]
+    key_states.deleted = ["key_a"]
+    asyncio.run(registry.sync())
+    assert registry.tracked_ids == set()
+    assert [call[0] for call in key_states.calls] == ["states", "deleted"]
+    assert key_states.calls[0][1] == key_states.calls[1][1] is not None
+
+
+def test_revocation_during_sync_not_undone(signing_secret, key_states):
+    """同步查询期间本地吊销的密钥不会被查询结果重新放行，吊销记录在之后的同步中清理"""
+    api_key = generate_signed_api_key("tenant_a", "agent_a", "key_a")
+    registry = SignedKeyRegistry()
+    key_states.rows = [state_row(api_key, "key_a")]
+    key_states.on_query = lambda: registry.revoke("key_a")
+    asyncio.run(registry.sync())
+    assert "key_a" not in registry.tracked_ids
+    assert registry.stats()["pending_revocations"] == 1
+
+    key_states.on_query = None
+    key_states.rows = []
+    asyncio.run(registry.sync())
+    assert registry.stats()["pending_revocations"] == 0
+
+
+def test_tombstones(tmp_path):
+    """删除记录按时间读取并按保留期清理"""
+    database = SqliteDatabase(str(tmp_path / "tombstones.db"))
+    bind_tombstones(database)
+    assert ensure_tombstone_table()
+    assert not ensure_tombstone_table()
+
+    before = datetime.utcnow() - timedelta(seconds=1)
+    assert record_deleted(["key_a", "key_b"]) == 2
+    assert record_deleted([]) == 0
+    assert sorted(deleted_since(before)) == ["key_a", "key_b"]
+    assert deleted_since(datetime.utcnow() + timedelta(seconds=1)) == []
+
+    assert prune_tombstones() == 0
+    assert prune_tombstones(now=datetime.utcnow() + timedelta(days=2)) == 2
+    database.close()
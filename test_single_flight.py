@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+并发读取合并（single-flight）单元测试
+"""
+
+import asyncio
+
+import pytest
+
+from src.database.single_flight import SingleFlight
+
+
+def test_concurrent_calls_coalesced():
+    """同一键的并发调用只执行一次 loader，不同键各自执行"""
+    flights = SingleFlight()
+    calls = []
+
+    async def load(key):
+        calls.append(key)
+        await asyncio.sleep(0.01)
+        return f"value_{key}"
+
+    async def scenario():
+        results = await asyncio.gather(
+            *(flights.do("a", lambda: load("a")) for _ in range(50)),
+            flights.do("b", lambda: load("b")),
+        )
+        assert results == ["value_a"] * 50 + ["value_b"]
+        # 查询结束后不缓存结果
+        assert await flights.do("a", lambda: load("a")) == "value_a"
+
+    asyncio.run(scenario())
+    assert calls == ["a", "b", "a"]
+    assert flights.coalesced == 49
+    assert flights.stats()["inflight"] == 0
+
+
+def test_errors_shared_and_not_cached():
+    flights = SingleFlight()
+    attempts = []
+
+    async def failing():
+        attempts.append(1)
+        await asyncio.sleep(0.01)
+        raise RuntimeError("boom")
+
+    async def scenario():
+        results = await asyncio.gather(*(flights.do("a", failing) for _ in range(3)), return_exceptions=True)
+        assert all(isinstance(result, RuntimeError) for result in results)
+        with pytest.raises(RuntimeError):
+            await flights.do("a", failing)
+
+    asyncio.run(scenario())
+    assert len(attempts) == 2
+
+
+def test_cancelled_caller_does_not_cancel_shared_load():
+    """单个调用方被取消时，其他调用方仍得到结果"""
+    flights = SingleFlight()
+
+    async def load():
+        await asyncio.sleep(0.02)
+        return "value"
+
+    async def scenario():
+        first = asyncio.ensure_future(flights.do("a", load))
+        second = asyncio.ensure_future(flights.do("a", load))
+        await asyncio.sleep(0)
+        first.cancel()
+        assert await second == "value"
+        assert first.cancelled()
+
+    asyncio.run(scenario())
+
+
+def test_forget_starts_new_load():
+    """forget 之后的调用不再加入之前发起的查询"""
+    flights = SingleFlight()
+    versions = iter(["old", "new"])
+
+    async def load():
+        value = next(versions)
+        await asyncio.sleep(0.01)
+        return value
+
+    async def scenario():
+        before = asyncio.ensure_future(flights.do("a", load))
+        await asyncio.sleep(0)
+        flights.forget("a")
+        after = asyncio.ensure_future(flights.do("a", load))
+        assert await before == "old"
+        assert await after == "new"
+
+    asyncio.run(scenario())
+
+
+def test_disabled_runs_every_call():
+    flights = SingleFlight(enabled=False)
+    calls = []
+
+    async def load():
+        calls.append(1)
+        await asyncio.sleep(0)
+        return len(calls)
+
+    async def scenario():
+        await asyncio.gather(*(flights.do("a", load) for _ in range(5)))
+
+    asyncio.run(scenario())
+    assert len(calls) == 5
+    assert flights.coalesced == 0
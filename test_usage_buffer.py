@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+API密钥使用统计写回缓冲单元测试：批量写回、失败合并、缓冲区上限与取消时的结算
+"""
+
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+from src.database.models import ApiKey
+from src.utils.usage_buffer import ApiKeyUsageBuffer
+
+
+class FakeUsageStore:
+    """替代 ApiKey.bulk_record_usage，记录写回的批次"""
+
+    def __init__(self):
+        self.batches = []
+        self.fail = False
+        self.delay = 0.0
+
+    async def bulk_record_usage(self, usage):
+        # 是否失败在调用时确定
+        fail = self.fail
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        if fail:
+            raise RuntimeError("database unavailable")
+        self.batches.append(dict(usage))
+        return len(usage)
+
+
+@pytest.fixture
+def store(monkeypatch):
+    store = FakeUsageStore()
+    monkeypatch.setattr(ApiKey, "bulk_record_usage", store.bulk_record_usage)
+    return store
+
+
+T0 = datetime(2024, 1, 1, 12, 0, 0)
+
+
+def test_flush_writes_aggregated_counts(store):
+    """同一密钥的多次使用合并为一条，最后使用时间取最大值"""
+    buffer = ApiKeyUsageBuffer()
+    buffer.record("key_a", T0 + timedelta(seconds=5))
+    buffer.record("key_a", T0)
+    buffer.record("key_b", T0)
+
+    assert asyncio.run(buffer.flush()) == 3
+    assert store.batches == [{"key_a": (2, T0 + timedelta(seconds=5)), "key_b": (1, T0)}]
+    assert buffer.stats()["pending_keys"] == 0
+    assert asyncio.run(buffer.flush()) == 0
+
+
+def test_failed_flush_merges_back(store):
+    """写回失败时批次合并回缓冲区，与之后的使用累加，下次刷新一并写回"""
+    buffer = ApiKeyUsageBuffer()
+    buffer.record("key_a", T0)
+    store.fail = True
+    assert asyncio.run(buffer.flush()) == 0
+    assert buffer.flush_errors == 1
+    assert buffer._failing
+
+    buffer.record("key_a", T0 + timedelta(seconds=1))
+    buffer.record("key_b", T0)
+    store.fail = False
+    assert asyncio.run(buffer.flush()) == 3
+    assert store.batches == [{"key_a": (2, T0 + timedelta(seconds=1)), "key_b": (1, T0)}]
+    assert not buffer._failing
+
+
+def test_pending_limit(store):
+    """缓冲区超过上限后新密钥的使用被丢弃，已有密钥继续累加；合并回缓冲区同样受上限约束"""
+    buffer = ApiKeyUsageBuffer(max_pending_keys=2)
+    for i in range(6):
+        buffer.record(f"key_{i}", T0)
+    assert len(buffer._pending) == buffer.pending_limit == 4
+    assert buffer.dropped_increments == 2
+    buffer.record("key_0", T0)
+    assert buffer._pending["key_0"][0] == 2
+
+    store.fail = True
+
+    async def scenario():
+        flush = asyncio.ensure_future(buffer.flush())
+        await asyncio.sleep(0)
+        # 写回期间写入的新密钥占满缓冲区
+        for i in range(10, 14):
+            buffer.record(f"key_{i}", T0)
+        await flush
+
+    asyncio.run(scenario())
+    assert len(buffer._pending) == 4
+    assert buffer.dropped_increments == 2 + 5
+
+
+def test_single_flush_in_flight(store):
+    """已有刷新进行中时，再次刷新直接返回"""
+    buffer = ApiKeyUsageBuffer()
+    buffer.record("key_a", T0)
+    store.delay = 0.01
+
+    async def scenario():
+        return await asyncio.gather(buffer.flush(), buffer.flush())
+
+    assert sorted(asyncio.run(scenario())) == [0, 1]
+    assert len(store.batches) == 1
+
+
+@pytest.mark.parametrize("fail", [False, True])
+def test_cancelled_flush_settles_after_write(store, fail):
+    """刷新被取消时已发出的写回继续完成：成功不重复计数，失败合并回缓冲区由 stop() 写回"""
+    buffer = ApiKeyUsageBuffer()
+    buffer.record("key_a", T0)
+    store.delay = 0.02
+    store.fail = fail
+
+    async def scenario():
+        flush = asyncio.ensure_future(buffer.flush())
+        await asyncio.sleep(0.005)
+        flush.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await flush
+        # 写回尚未结束，批次不在缓冲区中
+        assert buffer.stats()["pending_keys"] == 0
+        store.fail = False
+        await buffer.stop()
+
+    asyncio.run(scenario())
+    assert store.batches == [{"key_a": (1, T0)}]
+    assert buffer.flushed_increments == 1
+    assert buffer.flush_errors == (1 if fail else 0)